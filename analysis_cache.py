@@ -0,0 +1,115 @@
+"""
+引擎分析结果缓存
+按局面、走棋方缓存分析结果，较深的结果可以满足较浅的请求
+"""
+
+import threading
+from collections import OrderedDict
+
+
+def normalize_board(fen):
+    """
+    规范化FEN中的棋盘部分，去掉走棋方等附加字段，合并连续的空位数字
+
+    例如 "4k4/9/.../4K4 w - - 0 1" -> "4k4/9/.../4K4"
+    """
+    board = fen.split()[0] if fen and fen.split() else ''
+    rows = []
+    for row in board.split('/'):
+        result = []
+        empty = 0
+        for char in row:
+            if char.isdigit():
+                empty += int(char)
+            else:
+                if empty:
+                    result.append(str(empty))
+                    empty = 0
+                result.append(char)
+        if empty:
+            result.append(str(empty))
+        rows.append(''.join(result))
+    return '/'.join(rows)
+
+
+class AnalysisCache:
+    """
+    有界LRU分析缓存（线程安全）
+
+    每个(局面, 走棋方)只保留搜索最深的一条结果，
+    查询时缓存深度不小于请求深度即视为命中
+    """
+
+    def __init__(self, max_size=256):
+        """
+        Args:
+            max_size: 最多缓存的局面数
+        """
+        self.max_size = max(1, int(max_size))
+        self._entries = OrderedDict()  # (局面, 走棋方) -> (深度, 结果)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, fen, side_to_move, depth):
+        """
+        查询缓存
+
+        Args:
+            fen: FEN字符串（只使用棋盘部分）
+            side_to_move: 'w' 或 'b'
+            depth: 请求的搜索深度
+
+        Returns:
+            缓存的结果，未命中返回None
+        """
+        key = (normalize_board(fen), side_to_move)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < depth:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, fen, side_to_move, depth, result):
+        """
+        写入缓存，已有更深的结果时保留原结果
+
+        Args:
+            fen: FEN字符串
+            side_to_move: 'w' 或 'b'
+            depth: 结果对应的搜索深度
+            result: 分析结果
+        """
+        key = (normalize_board(fen), side_to_move)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= depth:
+                self._entries[key] = (depth, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """清空缓存和统计"""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        """返回命中统计，用于评估缓存大小是否合适"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+            }
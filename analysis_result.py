@@ -0,0 +1,121 @@
+"""
+引擎分析结果
+用结构化对象代替"未找到最佳走法"之类的字符串，缓存、统计和界面直接读取字段
+"""
+
+from enum import Enum
+
+from pikafish_engine import extract_candidates
+
+
+class AnalysisError(Enum):
+    """分析失败的原因，value为显示给用户的中文说明"""
+    ENGINE_NOT_READY = "引擎未就绪，请先下载Pikafish引擎"
+    INVALID_FEN = "FEN格式无效"
+    ILLEGAL_POSITION = "局面不合法"
+    NO_BESTMOVE = "未找到最佳走法"
+    TIMEOUT = "分析超时"
+    ENGINE_FAILURE = "引擎错误"
+
+
+class AnalysisResult:
+    """
+    一次分析的结果
+
+    成功时 bestmove 为UCI走法，其余字段取自最后一条（最深的）主变info行；
+    失败时 error 为 AnalysisError，detail 为附加说明（如异常信息）
+    """
+
+    __slots__ = ('bestmove', 'ponder', 'score_cp', 'score_mate', 'wdl', 'pv', 'depth', 'seldepth',
+                 'nodes', 'nps', 'hashfull', 'elapsed', 'error', 'detail')
+
+    def __init__(self, bestmove=None, ponder=None, score_cp=None, score_mate=None, wdl=None, pv=(),
+                 depth=0, seldepth=0, nodes=0, nps=0, hashfull=0, elapsed=0.0, error=None, detail=None):
+        self.bestmove = bestmove
+        self.ponder = ponder
+        self.score_cp = score_cp  # 厘兵，走棋方视角
+        self.score_mate = score_mate  # 几步杀，负数表示被杀
+        self.wdl = wdl  # (胜, 和, 负) 千分比
+        self.pv = list(pv)
+        self.depth = depth
+        self.seldepth = seldepth
+        self.nodes = nodes
+        self.nps = nps
+        self.hashfull = hashfull
+        self.elapsed = elapsed  # 秒
+        self.error = error
+        self.detail = detail
+
+    @classmethod
+    def from_lines(cls, lines, elapsed=0.0):
+        """
+        从一次搜索的引擎输出行构造结果，没有bestmove时为NO_BESTMOVE错误
+
+        Args:
+            lines: 引擎输出行（含bestmove行）
+            elapsed: 搜索耗时（秒）
+        """
+        result = cls(elapsed=elapsed)
+        for line in reversed(lines):
+            if line.startswith('bestmove'):
+                tokens = line.split()
+                if len(tokens) >= 2 and tokens[1] != '(none)':
+                    result.bestmove = tokens[1]
+                if len(tokens) >= 4 and tokens[2] == 'ponder':
+                    result.ponder = tokens[3]
+                break
+
+        candidates = extract_candidates(lines)
+        if candidates:
+            best = candidates[0]
+            for name in ('score_cp', 'score_mate', 'wdl', 'pv', 'depth', 'seldepth', 'nodes', 'nps', 'hashfull'):
+                if name in best:
+                    setattr(result, name, best[name])
+
+        if result.bestmove is None:
+            result.error = AnalysisError.NO_BESTMOVE
+        return result
+
+    @classmethod
+    def failure(cls, error, detail=None, elapsed=0.0):
+        """构造失败结果"""
+        return cls(error=error, detail=detail, elapsed=elapsed)
+
+    @property
+    def ok(self):
+        """是否得到了最佳走法"""
+        return self.error is None
+
+    @property
+    def message(self):
+        """成功时为走法，失败时为中文错误说明"""
+        if self.ok:
+            return self.bestmove
+        if self.detail:
+            return f"{self.error.value}: {self.detail}"
+        return self.error.value
+
+    def to_dict(self):
+        """转换为可JSON序列化的字典，省略空字段"""
+        data = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if value is None or value == []:
+                continue
+            if name == 'error':
+                value = value.name
+            elif name == 'wdl':
+                value = list(value)
+            elif name == 'elapsed':
+                value = round(value, 4)
+            data[name] = value
+        return data
+
+    def __str__(self):
+        return self.message
+
+    def __repr__(self):
+        if self.ok:
+            return f"AnalysisResult(bestmove={self.bestmove!r}, depth={self.depth}, score_cp={self.score_cp!r}, " \
+                   f"score_mate={self.score_mate!r})"
+        return f"AnalysisResult(error={self.error.name}, detail={self.detail!r})"
@@ -0,0 +1,372 @@
+"""
+基于asyncio的Pikafish引擎客户端
+多个引擎、多个搜索在同一个事件循环中复用，不需要为每个管道开读取线程；
+等待搜索的任务被取消时自动向引擎发送stop
+"""
+
+import sys
+import asyncio
+import threading
+from pathlib import Path
+from contextlib import asynccontextmanager
+
+from pikafish_engine import (EngineError, EngineTimeout, GameHistory, SearchWatchdog, build_go_command,
+                             parse_info_line, default_engine_options, pick_idle_engine, take_spare, STOP_GRACE)
+
+
+class AsyncPikafishEngine:
+    """
+    asyncio版的单个常驻引擎进程
+
+    用法:
+        engine = await AsyncPikafishEngine.start(engine_path)
+        lines = await engine.analyse(fen, depth=8)
+        await engine.quit()
+    """
+
+    def __init__(self, engine_path, process):
+        self.engine_path = engine_path
+        self.process = process
+        self.name = None  # 引擎在 "id name" 中报告的名称
+        self.options = {}
+        self.broken = False  # 进程状态异常，不应再复用
+        self.history = GameHistory()  # 已发送给引擎的对局记录
+        self.heartbeat = None  # 搜索中无输出多少秒后发送isready探测
+        self.probe_timeout = 1.0  # 等待readyok的时间，超时即结束进程
+        self._search_lock = asyncio.Lock()  # 同一引擎同时只进行一次搜索
+        self._searching = False
+
+    @classmethod
+    async def start(cls, engine_path, engine_args=(), options=None, handshake_timeout=10, heartbeat=None,
+                    probe_timeout=1.0):
+        """
+        启动引擎进程并完成UCI握手
+
+        Args:
+            engine_path: 引擎可执行文件路径（.py脚本会用当前Python解释器运行）
+            engine_args: 附加的命令行参数
+            options: 启动时通过setoption设置的UCI选项
+            handshake_timeout: UCI握手的最长等待时间（秒）
+            heartbeat: 搜索中引擎超过这么多秒没有输出时发送isready探测，None表示不探测
+            probe_timeout: 探测后等待readyok的时间（秒），超时即判定引擎卡死并结束进程
+        """
+        engine_path = str(Path(engine_path).absolute())
+        command = [engine_path]
+        if engine_path.endswith('.py'):
+            command.insert(0, sys.executable)
+
+        process = await asyncio.create_subprocess_exec(
+            *command, *engine_args,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            cwd=str(Path(engine_path).parent),
+        )
+        engine = cls(engine_path, process)
+        engine.heartbeat = heartbeat
+        engine.probe_timeout = probe_timeout
+        try:
+            await engine.send("uci")
+            for line in await engine.wait_for("uciok", handshake_timeout):
+                if line.startswith("id name "):
+                    engine.name = line[len("id name "):]
+            for name, value in (options or {}).items():
+                await engine.set_option(name, value)
+            await engine.is_ready(handshake_timeout)
+        except BaseException:
+            await engine.quit()
+            raise
+        return engine
+
+    def is_alive(self):
+        """引擎进程是否仍可用"""
+        return self.process.returncode is None and not self.broken
+
+    def kill(self):
+        """强制结束无响应的引擎进程"""
+        self.broken = True
+        if self.process.returncode is None:
+            self.process.kill()
+
+    async def send(self, command):
+        """向引擎发送一条命令"""
+        self.process.stdin.write((command + '\n').encode())
+        await self.process.stdin.drain()
+
+    async def _read_until(self, prefix, on_line):
+        lines = []
+        while True:
+            raw = await self.process.stdout.readline()
+            if not raw:
+                self.broken = True
+                raise EngineError("引擎进程已退出")
+            line = raw.decode('utf-8', errors='ignore').rstrip('\r\n')
+            lines.append(line)
+            if on_line is not None:
+                on_line(line)
+            if line.startswith(prefix):
+                return lines
+
+    async def wait_for(self, prefix, timeout=None, on_line=None):
+        """
+        读取引擎输出直到出现以prefix开头的行
+
+        Returns:
+            收到的全部输出行（包含结束行）
+        """
+        try:
+            return await asyncio.wait_for(self._read_until(prefix, on_line), timeout)
+        except asyncio.TimeoutError:
+            raise EngineTimeout(f"等待 {prefix} 超时（{timeout}秒）")
+
+    async def is_ready(self, timeout=5):
+        """发送isready并等待readyok"""
+        await self.send("isready")
+        await self.wait_for("readyok", timeout)
+
+    async def set_option(self, name, value):
+        """设置UCI选项，值未变化时不重复发送"""
+        if self.options.get(name) == value:
+            return
+        await self.send(f"setoption name {name} value {value}")
+        self.options[name] = value
+
+    async def set_position(self, fen):
+        """设置局面：与上一局面只差一步时作为走法延续发送，新对局时先发送ucinewgame"""
+        for command in self.history.position_commands(fen):
+            await self.send(command)
+
+    async def analyse(self, fen, depth=None, movetime=None, nodes=None, multipv=1,
+                      on_info=None, timeout=None):
+        """
+        分析局面，收到bestmove即返回本次分析的全部引擎输出行
+
+        等待中的任务被取消时，向引擎发送stop并读完bestmove，引擎可立即用于下一次搜索
+
+        Args:
+            fen: 带走棋方的FEN，如 "<局面> w"
+            depth/movetime/nodes: 搜索限制，见 build_go_command
+            multipv: 同时搜索的候选走法数
+            on_info: 可选回调 on_info(info)，每完成一层搜索即调用
+            timeout: 等待bestmove的最长时间（秒），超时后发送stop
+        """
+        if timeout is None:
+            timeout = movetime / 1000 + STOP_GRACE if movetime else 60
+
+        lines = []
+
+        def on_line(line):
+            lines.append(line)
+            if on_info is not None:
+                info = parse_info_line(line, require_pv=True)
+                if info and 'depth' in info:
+                    on_info(info)
+
+        async with self._search_lock:
+            await self.set_option('MultiPV', max(1, int(multipv)))
+            await self.set_position(fen)
+            await self.send(build_go_command(depth, movetime, nodes))
+            self._searching = True
+            try:
+                await self._wait_bestmove(timeout, on_line)
+            except asyncio.CancelledError:
+                # 被更新的局面取代：停止搜索并丢弃结果，不再回调on_info
+                await self._stop_and_drain(None)
+                raise
+            except EngineTimeout:
+                if not self.is_alive():
+                    raise
+                # 超时：要求引擎立即给出当前最佳走法，仍无响应则结束该进程
+                await self._stop_and_drain(on_line)
+                if self.broken:
+                    self.kill()
+                    raise
+            finally:
+                self._searching = False
+        return lines
+
+    async def _wait_bestmove(self, timeout, on_line):
+        """
+        等待bestmove；设置了heartbeat时，引擎长时间没有输出就发送isready探测，
+        探测无响应则结束进程并抛出EngineHung，不必等到搜索期限
+        """
+        loop = asyncio.get_running_loop()
+        watchdog = SearchWatchdog(timeout, self.heartbeat, self.probe_timeout, loop.time())
+
+        def on_search_line(line):
+            if not watchdog.consume(line):
+                on_line(line)
+
+        while True:
+            try:
+                await self.wait_for("bestmove", watchdog.next_wait(loop.time()), on_search_line)
+                if watchdog.probing:
+                    # 读掉尚未到达的readyok，免得留给下一条命令
+                    try:
+                        await self.wait_for("readyok", self.probe_timeout)
+                    except EngineError:
+                        self.kill()
+                return
+            except EngineTimeout:
+                if watchdog.expired(loop.time(), self.kill):
+                    await self.send("isready")
+
+    async def _stop_and_drain(self, on_line):
+        """发送stop并读完本次搜索的bestmove，失败时标记进程不可复用"""
+        try:
+            await self.send("stop")
+            await self.wait_for("bestmove", 1, on_line)
+        except BaseException:
+            self.broken = True
+
+    async def stop(self):
+        """停止当前搜索（搜索任务会随后收到bestmove并返回）"""
+        if self._searching and self.is_alive():
+            await self.send("stop")
+
+    async def quit(self):
+        """关闭引擎进程"""
+        if self.process.returncode is not None:
+            return
+        try:
+            await self.send("quit")
+            await asyncio.wait_for(self.process.wait(), 3)
+        except BaseException:
+            self.process.kill()
+            await self.process.wait()
+
+
+class AsyncEnginePool:
+    """
+    asyncio引擎进程池
+    搜索中引擎无响应时由心跳探测结束进程，借出时换上预先启动的备用进程并在后台补充
+    """
+
+    def __init__(self, engine_path, size=2, engine_args=(), options=None, standby=1, heartbeat=1.0,
+                 probe_timeout=1.0):
+        """
+        Args:
+            engine_path: 引擎可执行文件路径
+            size: 进程池大小
+            engine_args: 附加的引擎命令行参数
+            options: 覆盖默认值的UCI选项，默认值见 default_engine_options
+            standby: 预先启动的备用进程数
+            heartbeat: 搜索中引擎超过这么多秒没有输出时发送isready探测，None表示不探测
+            probe_timeout: 等待readyok的时间（秒），超时即结束该引擎进程
+        """
+        self.engine_path = engine_path
+        self.engine_args = list(engine_args)
+        self.size = max(1, int(size))
+        self.options = default_engine_options(engine_path, self.size)
+        self.options.update(options or {})
+        self.standby_size = max(0, int(standby))
+        self.heartbeat = heartbeat
+        self.probe_timeout = probe_timeout
+        self.restarts = 0  # 因失效被替换的引擎数
+        self._idle = []  # 空闲引擎，最近归还的在末尾
+        self._standby = []  # 备用引擎
+        self._available = asyncio.Condition()
+        self._engines = []
+        self._refilling = None  # 补充备用进程的任务
+
+    async def start(self):
+        """并行启动全部引擎进程和备用进程"""
+        engines = await asyncio.gather(*(self._spawn() for _ in range(self.size + self.standby_size)))
+        self._idle.extend(engines[:self.size])
+        self._standby.extend(engines[self.size:])
+        return self
+
+    async def _spawn(self):
+        engine = await AsyncPikafishEngine.start(self.engine_path, self.engine_args, self.options,
+                                                 heartbeat=self.heartbeat, probe_timeout=self.probe_timeout)
+        self._engines.append(engine)
+        return engine
+
+    async def _replace(self, engine):
+        """结束失效的引擎，换上备用进程（没有备用时现场启动），并在后台补充备用进程"""
+        engine.kill()
+        await engine.quit()
+        if engine in self._engines:
+            self._engines.remove(engine)
+        self.restarts += 1
+        spare, dead = take_spare(self._standby)
+        for dead_engine in dead:
+            await dead_engine.quit()
+        if spare is None:
+            spare = await self._spawn()
+        if self.standby_size and (self._refilling is None or self._refilling.done()):
+            self._refilling = asyncio.ensure_future(self._refill_standby())
+        return spare
+
+    async def _refill_standby(self):
+        """补足备用进程"""
+        while len(self._standby) < self.standby_size:
+            try:
+                self._standby.append(await self._spawn())
+            except Exception:
+                return
+
+    @asynccontextmanager
+    async def checkout(self, fen=None):
+        """
+        借出一个可用的引擎，已失效的引擎会被替换
+
+        Args:
+            fen: 将要分析的局面，优先借出能以走法延续到该局面的引擎
+        """
+        async with self._available:
+            await self._available.wait_for(lambda: self._idle)
+            engine = self._idle.pop(pick_idle_engine(self._idle, fen))
+
+        try:
+            if not engine.is_alive():
+                engine = await self._replace(engine)
+            yield engine
+        finally:
+            # 重启失败时归还旧引擎保持池大小，下次借出时再尝试
+            async with self._available:
+                self._idle.append(engine)
+                self._available.notify()
+
+    async def close(self):
+        """关闭全部引擎进程"""
+        if self._refilling is not None:
+            self._refilling.cancel()
+        await asyncio.gather(*(engine.quit() for engine in self._engines), return_exceptions=True)
+        self._engines.clear()
+
+
+class AsyncEngineService:
+    """
+    在后台线程中运行事件循环和asyncio引擎池，供同步代码（如Tk界面）提交分析协程
+
+    用法:
+        service = AsyncEngineService(engine_path)
+        future = service.submit(some_coroutine(service.pool))
+        future.cancel()  # 取消搜索，引擎收到stop
+    """
+
+    def __init__(self, engine_path, size=2, engine_args=(), options=None, standby=1):
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self._thread.start()
+        self.pool = AsyncEnginePool(engine_path, size, engine_args, options, standby)
+        self.run(self.pool.start())
+
+    def submit(self, coroutine):
+        """提交协程，返回 concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def run(self, coroutine, timeout=None):
+        """提交协程并等待结果"""
+        return self.submit(coroutine).result(timeout)
+
+    def close(self):
+        """关闭引擎池并停止事件循环"""
+        if not self.loop.is_running():
+            return
+        try:
+            self.run(self.pool.close(), timeout=5)
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self._thread.join(timeout=5)
@@ -0,0 +1,251 @@
+"""
+批量局面分析
+从文件或标准输入读取FEN或图片路径（每行一个），分发到引擎进程池并行分析，
+每个局面输出一行JSON（JSONL），便于后续用脚本统计或导入表格
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+
+from pikafish_engine import EnginePool, default_engine_path
+from analysis_result import AnalysisResult
+from xiangqi_rules import validate_position
+
+
+def iter_inputs(stream):
+    """
+    逐行读取输入，跳过空行和#开头的注释
+
+    Yields:
+        (序号, 原始输入) 序号从0开始
+    """
+    index = 0
+    for raw in stream:
+        line = raw.strip()
+        if not line or line.startswith('#'):
+            continue
+        yield index, line
+        index += 1
+
+
+def is_fen(text):
+    """输入是FEN而不是图片路径（FEN的棋盘部分有9个/分隔的10行）"""
+    return text.split()[0].count('/') == 9
+
+
+class BatchAnalyzer:
+    """
+    批量分析器：FEN直接分析，图片攒够一批后一起识别再分析
+    """
+
+    def __init__(self, pool, depth=None, movetime=None, nodes=None, side='w', recognizer_options=None,
+                 debug_images='off', image_batch=8):
+        """
+        Args:
+            pool: 引擎进程池，并行度等于池大小
+            depth/movetime/nodes: 每个局面的搜索限制
+            side: FEN中没有走棋方（或输入为图片）时使用的走棋方
+            recognizer_options: 识别模型的ONNX Runtime会话参数
+            debug_images: 识别图片时的调试图像保存方式（见 DebugSink.from_spec）
+            image_batch: 一次批量识别的图片数，每批对每个模型只调用一次推理
+        """
+        self.pool = pool
+        self.limits = {'depth': depth, 'movetime': movetime, 'nodes': nodes}
+        self.side = side
+        self.recognizer_options = recognizer_options
+        self.debug_images = debug_images
+        self.image_batch = max(1, int(image_batch))
+        self._recognizer = None
+        self._recognizer_lock = threading.Lock()
+
+    def get_recognizer(self):
+        """首次遇到图片时才加载识别模型"""
+        with self._recognizer_lock:
+            if self._recognizer is None:
+                from cchess_deep_recognizer import CChessDeepRecognizer
+                from debug_sink import DebugSink
+                self._recognizer = CChessDeepRecognizer(session_options=self.recognizer_options,
+                                                        debug_sink=DebugSink.from_spec(self.debug_images))
+            return self._recognizer
+
+    def to_fen(self, text):
+        """FEN输入规范为 "<局面> <走棋方>"，没有走棋方时使用 side"""
+        parts = text.split()
+        side = parts[1] if len(parts) > 1 and parts[1] in ('w', 'b') else self.side
+        return f"{parts[0]} {side}"
+
+    def recognize_images(self, paths):
+        """
+        批量识别图片，每个模型对整批只推理一次
+
+        Returns:
+            与paths一一对应的 (FEN, 错误) 列表，FEN为 "<局面> <走棋方>"，失败时FEN为None
+        """
+        import cv2
+        results = [(None, "识别失败")] * len(paths)
+        images, slots = [], []
+        for slot, path in enumerate(paths):
+            image = cv2.imread(path)
+            if image is None:
+                results[slot] = (None, f"无法读取图片: {path}")
+                continue
+            images.append(image)
+            slots.append(slot)
+        if not images:
+            return results
+
+        try:
+            fens = self.get_recognizer().recognize_batch(images)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            for slot in slots:
+                results[slot] = (None, error)
+            return results
+        for slot, fen in zip(slots, fens):
+            if fen:
+                results[slot] = (f"{fen.split()[0]} {self.side}", None)
+        return results
+
+    def analyze(self, index, text, fen=None, error=None):
+        """
+        分析一个输入
+
+        Args:
+            index: 输入序号
+            text: FEN或图片路径
+            fen/error: 图片已经批量识别过时传入识别结果，否则在这里单独识别
+
+        Returns:
+            输出记录字典：input、fen、time_ms 和 AnalysisResult 的非空字段
+            （bestmove、score_cp/score_mate、pv、depth、nodes等），失败时带有error字段
+        """
+        record = {'index': index, 'input': text}
+        start = time.perf_counter()
+        try:
+            if fen is None and error is None:
+                fen, error = (self.to_fen(text), None) if is_fen(text) else self.recognize_images([text])[0]
+            if error is not None:
+                record['error'] = error
+                return record
+            record['fen'] = fen
+            problems = validate_position(fen, fen.split()[1])
+            if problems:
+                record['error'] = f"局面不合法: {'；'.join(problems)}"
+                return record
+
+            with self.pool.checkout(fen=fen) as engine:
+                lines = engine.analyze(fen, **self.limits)
+
+            result = AnalysisResult.from_lines(lines)
+            record.update((name, value) for name, value in result.to_dict().items() if name != 'elapsed')
+            if not result.ok:
+                record['error'] = result.message
+        except Exception as e:
+            record['error'] = f"{type(e).__name__}: {e}"
+        finally:
+            record['time_ms'] = round((time.perf_counter() - start) * 1000, 1)
+        return record
+
+    def run(self, inputs, output):
+        """
+        并行分析全部输入，每完成一个局面立即写出一行JSON（按完成顺序，用index对应输入）
+        同时在途的局面数有上限，输入来自管道时边读边分析；
+        图片攒够 image_batch 张（或输入结束）时批量识别，识别出的局面再交给引擎
+
+        Returns:
+            (局面数, 失败数)
+        """
+        counts = {'total': 0, 'failed': 0}
+
+        def write(futures):
+            for future in futures:
+                record = future.result()
+                counts['total'] += 1
+                counts['failed'] += 'error' in record
+                output.write(json.dumps(record, ensure_ascii=False) + '\n')
+            output.flush()
+
+        with ThreadPoolExecutor(max_workers=self.pool.size) as executor:
+            pending = set()
+            images = []  # 等待批量识别的 (序号, 图片路径)
+
+            def submit(*args):
+                nonlocal pending
+                pending.add(executor.submit(self.analyze, *args))
+                if len(pending) >= self.pool.size * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    write(done)
+
+            def flush_images():
+                recognized = self.recognize_images([text for _, text in images])
+                for (index, text), (fen, error) in zip(images, recognized):
+                    submit(index, text, fen, error)
+                images.clear()
+
+            for index, text in inputs:
+                if is_fen(text):
+                    submit(index, text)
+                    continue
+                images.append((index, text))
+                if len(images) >= self.image_batch:
+                    flush_images()
+            if images:
+                flush_images()
+            write(as_completed(pending))
+        if self._recognizer is not None:
+            self._recognizer.debug_sink.flush()  # 等待调试图像写完
+        return counts['total'], counts['failed']
+
+
+def main(argv=None):
+    """主函数"""
+    parser = argparse.ArgumentParser(description='批量局面分析，输出JSONL')
+    parser.add_argument('input', nargs='?', default='-', help='输入文件，每行一个FEN或图片路径（默认读取标准输入）')
+    parser.add_argument('-o', '--output', help='输出文件（默认标准输出）')
+    parser.add_argument('--engine', default=default_engine_path(), help='引擎可执行文件路径')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='并行引擎进程数（默认CPU核数）')
+    parser.add_argument('--threads', type=int, help='每个引擎的搜索线程数（默认按核数平分）')
+    parser.add_argument('--depth', type=int, help='搜索深度（默认8）')
+    parser.add_argument('--movetime', type=int, help='每个局面的限时（毫秒）')
+    parser.add_argument('--nodes', type=int, help='每个局面的节点数限制')
+    parser.add_argument('--side', choices=['w', 'b'], default='w', help='FEN未指定走棋方时使用的走棋方（默认红方w）')
+    parser.add_argument('--ort-threads', type=int, help='识别图片时模型推理的线程数（默认按核数的1/4）')
+    parser.add_argument('--debug-images', default='off',
+                        help='识别图片时保存调试图像到 debug_images 目录: off（默认）、failures、every:N')
+    parser.add_argument('--image-batch', type=int, default=8, help='一次批量识别的图片数（默认8）')
+    args = parser.parse_args(argv)
+
+    if not Path(args.engine).exists():
+        print(f"✗ 引擎不存在: {args.engine}", file=sys.stderr)
+        return 1
+
+    source = sys.stdin if args.input == '-' else open(args.input, encoding='utf-8')
+    output = sys.stdout if not args.output else open(args.output, 'w', encoding='utf-8')
+    pool = EnginePool(args.engine, size=args.workers, threads=args.threads)
+    try:
+        print(f"✓ 引擎进程池已就绪（{pool.size}个进程，每个{pool.threads}线程）", file=sys.stderr)
+        recognizer_options = {'intra_op_num_threads': args.ort_threads} if args.ort_threads else None
+        analyzer = BatchAnalyzer(pool, args.depth, args.movetime, args.nodes, args.side, recognizer_options,
+                                 args.debug_images, args.image_batch)
+        start = time.perf_counter()
+        total, failed = analyzer.run(iter_inputs(source), output)
+        elapsed = time.perf_counter() - start
+        rate = total / elapsed if elapsed else 0.0
+        print(f"✓ 完成 {total} 个局面（失败{failed}个），用时{elapsed:.1f}秒，{rate:.1f}局面/秒", file=sys.stderr)
+    finally:
+        pool.close()
+        if source is not sys.stdin:
+            source.close()
+        if output is not sys.stdout:
+            output.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
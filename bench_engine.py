@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+引擎基准测试
+在固定的局面集上按不同深度、线程数运行引擎，记录进程启动耗时、到达各层的时间、NPS
+以及客户端开销（端到端耗时减去引擎报告的搜索时间），结果写入JSON
+
+用法:
+    python bench_engine.py --engine engine/pikafish.exe --depths 8 12 --threads 1 4
+    python bench_engine.py --fake        # 使用测试用引擎，只测客户端开销，结果可在任意平台复现
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pikafish_engine import PikafishEngine, GameHistory, parse_info_line, default_engine_path
+
+FAKE_ENGINE = Path(__file__).parent / "fake_uci_engine.py"
+
+# 固定局面集：开局、中局、残局
+SUITE = [
+    {'name': "初始局面", 'fen': "rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w"},
+    {'name': "中炮对屏风马", 'fen': "r1bakab1r/9/1cn3nc1/p1p1p1p1p/9/9/P1P1P1P1P/1C2C1N2/9/RNBAKAB1R w"},
+    {'name': "中局", 'fen': "2bakab2/9/2n1c1n2/p1p1p3p/6p2/2P6/P3P1P1P/2N1C1N2/9/2BAKAB2 w"},
+    {'name': "车兵残局", 'fen': "3ak4/4a4/9/9/9/9/4P4/9/4R4/4K4 w"},
+]
+
+
+def bench_engine_options(engine_path, threads, hash_mb=None):
+    """基准测试使用的引擎选项：指定线程数，置换表大小固定以便对比"""
+    options = {'Threads': threads, 'Hash': hash_mb or 64}
+    nnue = Path(engine_path).parent / "pikafish.nnue"
+    if nnue.exists():
+        options['EvalFile'] = str(nnue.absolute())
+    return options
+
+
+def measure_spawn(engine_path, options, engine_args=(), repeat=3):
+    """
+    测量启动引擎进程并完成UCI握手（含设置选项、isready）的耗时
+
+    Returns:
+        (每次耗时毫秒列表, 引擎名称)
+    """
+    times = []
+    name = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        engine = PikafishEngine(engine_path, engine_args, options=options)
+        times.append(round((time.perf_counter() - start) * 1000, 2))
+        name = engine.name
+        engine.close()
+    return times, name
+
+
+def measure_search(engine, fen, depth):
+    """
+    在清空置换表后搜索一个局面
+
+    Returns:
+        字典：到达各层的时间（客户端计时和引擎报告）、节点数、NPS、端到端耗时和客户端开销
+    """
+    engine.send("ucinewgame")
+    engine.history = GameHistory()
+    engine.is_ready()
+
+    depth_times = {}
+    start = time.perf_counter()
+
+    def on_info(info):
+        if info.get('multipv', 1) == 1 and info['depth'] not in depth_times:
+            depth_times[info['depth']] = round((time.perf_counter() - start) * 1000, 2)
+
+    lines = engine.analyze(fen, depth=depth, on_info=on_info)
+    wall_ms = (time.perf_counter() - start) * 1000
+
+    last = {}
+    for line in lines:
+        info = parse_info_line(line, require_pv=True)
+        if info and info.get('multipv', 1) == 1:
+            last = info
+    engine_ms = last.get('time', 0)
+    return {
+        'depth_reached': last.get('depth', 0),
+        'time_to_depth_ms': depth_times,
+        'engine_time_ms': engine_ms,
+        'wall_ms': round(wall_ms, 2),
+        'client_overhead_ms': round(wall_ms - engine_ms, 2),
+        'nodes': last.get('nodes', 0),
+        'nps': last.get('nps', 0),
+    }
+
+
+def run_benchmark(engine_path, depths, threads_list, repeat=3, suite=SUITE, engine_args=(), hash_mb=None):
+    """
+    运行完整的基准测试
+
+    Returns:
+        可直接写入JSON的结果字典
+    """
+    results = {
+        'engine_path': str(engine_path),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'depths': list(depths),
+        'repeat': repeat,
+        'runs': [],
+    }
+    for threads in threads_list:
+        options = bench_engine_options(engine_path, threads, hash_mb)
+        spawn_ms, name = measure_spawn(engine_path, options, engine_args, repeat)
+        results['engine_name'] = name
+        run = {'threads': threads, 'options': options, 'spawn_ms': spawn_ms, 'positions': []}
+
+        engine = PikafishEngine(engine_path, engine_args, options=options)
+        try:
+            for position in suite:
+                for depth in depths:
+                    samples = [measure_search(engine, position['fen'], depth) for _ in range(repeat)]
+                    overheads = sorted(sample['client_overhead_ms'] for sample in samples)
+                    run['positions'].append({
+                        'name': position['name'],
+                        'fen': position['fen'],
+                        'depth': depth,
+                        'median_wall_ms': sorted(s['wall_ms'] for s in samples)[len(samples) // 2],
+                        'median_client_overhead_ms': overheads[len(overheads) // 2],
+                        'samples': samples,
+                    })
+        finally:
+            engine.close()
+        results['runs'].append(run)
+    return results
+
+
+def print_summary(results):
+    """在终端输出简要结果"""
+    print(f"引擎: {results.get('engine_name')}（{results['engine_path']}）")
+    for run in results['runs']:
+        spawn = sorted(run['spawn_ms'])[len(run['spawn_ms']) // 2]
+        print(f"\n线程数 {run['threads']}，进程启动 {spawn:.1f} 毫秒（中位数）")
+        for entry in run['positions']:
+            nps = max(sample['nps'] for sample in entry['samples'])
+            print(f"  {entry['name']:<8} 深度{entry['depth']:>3}  耗时 {entry['median_wall_ms']:>9.1f} 毫秒  "
+                  f"客户端开销 {entry['median_client_overhead_ms']:>7.2f} 毫秒  NPS {nps:,}")
+
+
+def main(argv=None):
+    """主函数"""
+    parser = argparse.ArgumentParser(description='引擎基准测试')
+    parser.add_argument('--engine', help='引擎可执行文件路径（默认engine目录下的Pikafish）')
+    parser.add_argument('--fake', action='store_true', help='使用测试用引擎，只测客户端开销')
+    parser.add_argument('--depths', type=int, nargs='+', default=[6, 10], help='搜索深度（默认 6 10）')
+    parser.add_argument('--threads', type=int, nargs='+', default=[1], help='线程数（默认 1）')
+    parser.add_argument('--hash', type=int, help='置换表大小MB（默认64）')
+    parser.add_argument('--repeat', type=int, default=3, help='每项重复次数（默认3）')
+    parser.add_argument('-o', '--output', default='bench_results.json', help='结果JSON文件（默认bench_results.json）')
+    args = parser.parse_args(argv)
+
+    engine_path = FAKE_ENGINE if args.fake else Path(args.engine or default_engine_path())
+    if not engine_path.exists():
+        print(f"✗ 引擎不存在: {engine_path}")
+        return 1
+
+    results = run_benchmark(engine_path, args.depths, args.threads, args.repeat, hash_mb=args.hash)
+    print_summary(results)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"\n✓ 结果已写入 {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+info行解析微基准
+对高输出量的引擎日志计时：逐行解析全部info行 vs 先丢弃不订阅的行（require_pv）
+
+用法:
+    python bench_info_parser.py                    # 使用合成的MultiPV日志
+    python bench_info_parser.py --log engine.log   # 使用录制的引擎输出
+"""
+
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pikafish_engine import parse_info_line
+
+MOVES = ['h2e2', 'b2e2', 'b0c2', 'h0g2', 'c3c4', 'g3g4', 'h9g7', 'b9c7', 'h7e7', 'c6c5', 'a0a1', 'i0i1']
+
+
+def synthesize_log(depths=40, multipv=5, currmove_per_depth=40, seed=1):
+    """
+    合成一份接近Pikafish MultiPV搜索的高输出量日志：
+    每层有大量currmove进度行、少量边界分行和每个候选一条完整的pv行
+    """
+    rng = random.Random(seed)
+    lines = ["info string NNUE evaluation using pikafish.nnue enabled"]
+    nodes = 0
+    for depth in range(1, depths + 1):
+        for number in range(1, currmove_per_depth + 1):
+            lines.append(f"info depth {depth} currmove {rng.choice(MOVES)} currmovenumber {number}")
+        for index in range(1, multipv + 1):
+            nodes += rng.randint(5000, 50000)
+            score = rng.randint(-60, 60)
+            pv = ' '.join(rng.choice(MOVES) for _ in range(min(depth, 20)))
+            if index == 1 and depth > 5:
+                lines.append(f"info depth {depth} seldepth {depth + 6} multipv 1 score cp {score} lowerbound "
+                             f"nodes {nodes} nps 1200000 hashfull {depth * 10} tbhits 0 time {nodes // 1200} "
+                             f"pv {pv}")
+            lines.append(f"info depth {depth} seldepth {depth + 6} multipv {index} score cp {score} "
+                         f"wdl 120 850 30 nodes {nodes} nps 1200000 hashfull {depth * 10} tbhits 0 "
+                         f"time {nodes // 1200} pv {pv}")
+    lines.append(f"bestmove {MOVES[0]} ponder {MOVES[6]}")
+    return lines
+
+
+def bench(lines, repeat, **kwargs):
+    """返回每秒处理的行数"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            parse_info_line(line, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return len(lines) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='info行解析微基准')
+    parser.add_argument('--log', help='录制的引擎输出日志（每行一条引擎输出）')
+    parser.add_argument('--repeat', type=int, default=5, help='重复次数，取最快的一次（默认5）')
+    args = parser.parse_args()
+
+    if args.log:
+        with open(args.log, encoding='utf-8', errors='ignore') as f:
+            lines = [line.rstrip('\r\n') for line in f]
+        source = args.log
+    else:
+        lines = synthesize_log() * 20
+        source = "合成日志"
+
+    subscribed = sum(1 for line in lines if parse_info_line(line, require_pv=True))
+    print(f"日志: {source}，{len(lines)} 行，其中带pv的info行 {subscribed} 行")
+    print(f"全部解析:       {bench(lines, args.repeat):>12,.0f} 行/秒")
+    print(f"只解析pv行:     {bench(lines, args.repeat, require_pv=True):>12,.0f} 行/秒")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+走法生成基准测试
+在固定局面集上运行perft（统计各层走法序列数），初始局面与已知结果对照校验正确性，
+同时记录每秒生成的节点数
+
+用法:
+    python bench_movegen.py              # 默认3层
+    python bench_movegen.py --depth 4
+"""
+
+import sys
+import time
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from xiangqi_rules import Position
+from bench_engine import SUITE
+from pikafish_engine import START_BOARD
+
+# 初始局面各层的标准perft结果
+START_PERFT = {1: 44, 2: 1920, 3: 79666, 4: 3290240, 5: 133312995}
+
+
+def run_perft_benchmark(depth, suite=SUITE):
+    """
+    对每个局面依次计算1..depth层的perft
+
+    Returns:
+        结果列表，每项包含局面名称、层数、节点数、耗时和每秒节点数；
+        初始局面还带有 expected 字段（标准结果）
+    """
+    results = []
+    for position in suite:
+        board = Position.from_fen(position['fen'])
+        is_start = position['fen'].split()[0] == START_BOARD and board.side == 'w'
+        for ply in range(1, depth + 1):
+            start = time.perf_counter()
+            nodes = board.perft(ply)
+            elapsed = time.perf_counter() - start
+            entry = {
+                'name': position['name'],
+                'depth': ply,
+                'nodes': nodes,
+                'seconds': round(elapsed, 4),
+                'nps': int(nodes / elapsed) if elapsed else 0,
+            }
+            if is_start and ply in START_PERFT:
+                entry['expected'] = START_PERFT[ply]
+            results.append(entry)
+    return results
+
+
+def main(argv=None):
+    """主函数"""
+    parser = argparse.ArgumentParser(description='走法生成perft基准测试')
+    parser.add_argument('--depth', type=int, default=3, help='最大层数（默认3）')
+    args = parser.parse_args(argv)
+
+    failed = 0
+    for entry in run_perft_benchmark(args.depth):
+        status = ""
+        if 'expected' in entry:
+            ok = entry['nodes'] == entry['expected']
+            failed += not ok
+            status = "✓" if ok else f"✗ 应为 {entry['expected']}"
+        print(f"{entry['name']:<8} 深度{entry['depth']}  节点 {entry['nodes']:>10,}  "
+              f"耗时 {entry['seconds']:>8.3f} 秒  {entry['nps']:>9,} 节点/秒  {status}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
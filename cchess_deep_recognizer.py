@@ -4,10 +4,18 @@
 项目来源: https://github.com/TheOne1006/chinese-chess-recognition
 """
 
+import os
 import sys
+import json
+import time
+import threading
 import cv2
 import numpy as np
 from pathlib import Path
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from xiangqi_rules import validate_position
+from debug_sink import DebugSink
 
 # 设置UTF-8编码
 if sys.platform == "win32":
@@ -23,20 +31,230 @@ except ImportError:
     print("请安装 onnxruntime: pip install onnxruntime")
 
 
+# 会话参数的可选值，对应 onnxruntime 的枚举名
+GRAPH_OPTIMIZATION_LEVELS = {
+    'disable': 'ORT_DISABLE_ALL',
+    'basic': 'ORT_ENABLE_BASIC',
+    'extended': 'ORT_ENABLE_EXTENDED',
+    'all': 'ORT_ENABLE_ALL',
+}
+EXECUTION_MODES = {
+    'sequential': 'ORT_SEQUENTIAL',
+    'parallel': 'ORT_PARALLEL',
+}
+SESSION_OPTION_KEYS = ('graph_optimization_level', 'intra_op_num_threads', 'inter_op_num_threads',
+                       'execution_mode', 'enable_cpu_mem_arena', 'enable_mem_pattern', 'providers')
+MODEL_SECTIONS = ('pose', 'classifier')
+
+# 模型输入尺寸 (宽, 高) 和归一化参数（按0~255的像素值换算，形状 (3,1,1) 以便按通道广播）
+POSE_INPUT_SIZE = (256, 256)
+POSE_MEAN = (np.array([0.485, 0.456, 0.406], dtype=np.float32) * 255).reshape(3, 1, 1)
+POSE_INV_STD = (1 / (np.array([0.229, 0.224, 0.225], dtype=np.float32) * 255)).reshape(3, 1, 1)
+CLASSIFIER_INPUT_SIZE = (280, 315)  # Swin Transformer输入尺寸
+CLASSIFIER_MEAN = np.array([123.675, 116.28, 103.53], dtype=np.float32).reshape(3, 1, 1)  # ImageNet标准
+CLASSIFIER_INV_STD = (1 / np.array([58.395, 57.12, 57.375], dtype=np.float32)).reshape(3, 1, 1)
+ALIGNED_BOARD_SIZE = (400, 450)  # 对齐后的俯视棋盘，保持9:10比例
+
+# 跟踪模式：沿用上一次关键点检测得到的透视变换，每隔若干帧或网格对不齐时重新检测
+TRACKING_REFRESH_INTERVAL = 30  # 沿用的最大帧数
+TRACKING_MIN_ALIGNMENT = 0.7  # 网格投影相关系数低于此值视为棋盘已移动
+
+
+def default_session_options():
+    """
+    CPU上的默认会话参数
+
+    - intra_op_num_threads: CPU核数的1/4，限制在1~4之间。两个模型都很小，线程再多收益不大，
+      其余核心留给引擎搜索
+    - inter_op_num_threads / execution_mode: 模型是单链结构，顺序执行即可
+    - graph_optimization_level: 全部图优化
+    """
+    return {
+        'graph_optimization_level': 'all',
+        'intra_op_num_threads': max(1, min(4, (os.cpu_count() or 1) // 4)),
+        'inter_op_num_threads': 1,
+        'execution_mode': 'sequential',
+        'enable_cpu_mem_arena': True,
+        'enable_mem_pattern': True,
+        'providers': ['CPUExecutionProvider'],
+    }
+
+
+def merge_session_options(*sources):
+    """
+    依次合并会话参数，后面的同名项优先
+
+    每个来源是一个字典：顶层的参数对两个模型都生效，
+    "pose"/"classifier" 小节中的参数只对对应模型生效
+
+    Returns:
+        {'pose': {...}, 'classifier': {...}} 每个模型完整的会话参数
+    """
+    merged = {section: default_session_options() for section in MODEL_SECTIONS}
+    for source in sources:
+        if not source:
+            continue
+        for key, value in source.items():
+            if key in MODEL_SECTIONS:
+                continue
+            if key not in SESSION_OPTION_KEYS:
+                raise ValueError(f"未知的会话参数: {key}")
+            for section in MODEL_SECTIONS:
+                merged[section][key] = value
+        for section in MODEL_SECTIONS:
+            for key, value in (source.get(section) or {}).items():
+                if key not in SESSION_OPTION_KEYS:
+                    raise ValueError(f"未知的会话参数: {section}.{key}")
+                merged[section][key] = value
+    return merged
+
+
+def build_session_options(options):
+    """
+    把会话参数字典转换为 onnxruntime 的 SessionOptions 和执行提供者列表
+
+    本机没有的执行提供者会被忽略，全部不可用时退回CPU
+
+    Returns:
+        (ort.SessionOptions, providers)
+    """
+    level = options['graph_optimization_level']
+    mode = options['execution_mode']
+    if level not in GRAPH_OPTIMIZATION_LEVELS:
+        raise ValueError(f"无效的图优化级别: {level}（可选 {', '.join(GRAPH_OPTIMIZATION_LEVELS)}）")
+    if mode not in EXECUTION_MODES:
+        raise ValueError(f"无效的执行模式: {mode}（可选 {', '.join(EXECUTION_MODES)}）")
+
+    session_options = ort.SessionOptions()
+    session_options.graph_optimization_level = getattr(ort.GraphOptimizationLevel, GRAPH_OPTIMIZATION_LEVELS[level])
+    session_options.execution_mode = getattr(ort.ExecutionMode, EXECUTION_MODES[mode])
+    session_options.intra_op_num_threads = int(options['intra_op_num_threads'] or 0)  # 0 由onnxruntime自动决定
+    session_options.inter_op_num_threads = int(options['inter_op_num_threads'] or 0)
+    session_options.enable_cpu_mem_arena = bool(options['enable_cpu_mem_arena'])
+    session_options.enable_mem_pattern = bool(options['enable_mem_pattern'])
+
+    available = ort.get_available_providers()
+    providers = [provider for provider in options['providers'] if provider in available]
+    for provider in options['providers']:
+        if provider not in available:
+            print(f"⚠ 执行提供者不可用，已忽略: {provider}")
+    return session_options, providers or ['CPUExecutionProvider']
+
+
+def profile_correlation(a, b):
+    """两条投影曲线的相关系数（-1~1），任一条为常数时返回0"""
+    a = a - a.mean()
+    b = b - b.mean()
+    norm = float(np.sqrt(np.dot(a, a) * np.dot(b, b)))
+    return float(np.dot(a, b)) / norm if norm else 0.0
+
+
+def normalize_into(image, out, mean, inv_std):
+    """
+    (H,W,C) 图像按通道归一化后写入 (C,H,W) 的float32缓冲区，不分配新数组
+    
+    Args:
+        image: (H,W,C) 图像，通常为uint8
+        out: (C,H,W) float32 缓冲区
+        mean, inv_std: 形状 (C,1,1) 的均值和标准差倒数
+    """
+    np.subtract(image.transpose(2, 0, 1), mean, out=out, dtype=np.float32)
+    np.multiply(out, inv_std, out=out)
+    return out
+
+
+class BoundSession:
+    """
+    输入输出绑定到预分配缓冲区的推理会话
+    
+    输入张量 input 创建时分配，预处理直接写入其中；输出形状固定时同样预分配，
+    通过IOBinding由onnxruntime直接写入，每帧推理不再分配新数组。
+    输出含动态维度时由onnxruntime分配输出；会话不支持IOBinding时退回普通的run
+    """
+    
+    def __init__(self, session, input_shape):
+        """
+        Args:
+            session: 推理会话
+            input_shape: 输入张量形状 (N,C,H,W)
+        """
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+        self.input = np.zeros(input_shape, dtype=np.float32)
+        self.outputs = None  # 预分配的输出，每次run都会被覆盖
+        self.binding = None
+        if not hasattr(session, 'io_binding'):
+            return
+        
+        self.binding = session.io_binding()
+        self.binding.bind_input(self.input_name, 'cpu', 0, np.float32, list(input_shape), self.input.ctypes.data)
+        model_outputs = session.get_outputs()
+        shapes = [self.output_shape(output, input_shape[0]) for output in model_outputs]
+        if all(shape is not None for shape in shapes):
+            self.outputs = [np.zeros(shape, dtype=np.float32) for shape in shapes]
+            for output, buffer in zip(model_outputs, self.outputs):
+                self.binding.bind_output(output.name, 'cpu', 0, np.float32, list(buffer.shape), buffer.ctypes.data)
+        else:
+            for output in model_outputs:
+                self.binding.bind_output(output.name, 'cpu')
+    
+    @staticmethod
+    def output_shape(output, batch_size):
+        """输出的具体形状（batch维取输入的batch大小），含其他动态维度或不是float32时返回None"""
+        if output.type != 'tensor(float)':
+            return None
+        shape = list(output.shape)
+        if shape and not isinstance(shape[0], int):
+            shape[0] = batch_size
+        if not all(isinstance(dim, int) and dim > 0 for dim in shape):
+            return None
+        return shape
+    
+    def run(self):
+        """用 input 中已写好的数据推理，返回输出列表"""
+        if self.binding is None:
+            return self.session.run(None, {self.input_name: self.input})
+        self.session.run_with_iobinding(self.binding)
+        if self.outputs is None:
+            return self.binding.copy_outputs_to_cpu()
+        return self.outputs
+
+
 class CChessDeepRecognizer:
     """
     中国象棋深度学习识别器
     使用两步识别：1) 棋盘关键点检测 2) 棋子分类
     """
     
-    def __init__(self, models_dir='models/cchess_recognition'):
+    def __init__(self, models_dir='models/cchess_recognition', validate=True, session_options=None,
+                 load_in_background=False, debug_sink=None, track_board=False,
+                 refresh_interval=TRACKING_REFRESH_INTERVAL):
         """
         初始化识别器
         
         Args:
             models_dir: 模型文件目录
+            validate: 检查识别出的局面是否可能出现在对局中，不可能的局面视为识别失败
+            session_options: ONNX Runtime会话参数（见 default_session_options），
+                             与模型目录下 session_options.json 中的同名项合并，此处优先
+            load_in_background: 在后台线程加载模型，构造函数立即返回；
+                                加载结果通过 ready（Future，结果为是否加载成功）获取
+            debug_sink: 调试图像输出（DebugSink），保存输入图像和对齐后的棋盘；默认不保存
+            track_board: 跟踪模式（连续截图时使用）：沿用上一帧的棋盘透视变换，
+                         网格对得上时跳过关键点检测模型
+            refresh_interval: 跟踪模式下最多连续沿用的帧数，到期后重新检测关键点
         """
         self.models_dir = Path(models_dir)
+        self.session_options = merge_session_options(self.load_session_options(), session_options)
+        self.validate = validate
+        self.debug_sink = debug_sink or DebugSink()
+        self.track_board = track_board
+        self.refresh_interval = max(1, int(refresh_interval))
+        self.tracked = None  # 跟踪参考：透视变换矩阵、图像尺寸、网格投影、已沿用帧数
+        self.pose_runs = 0  # 运行关键点检测的次数
+        self.tracked_frames = 0  # 沿用透视变换、跳过关键点检测的帧数
+        self.last_problems = []  # 上一次识别被判为不合法局面的原因
+        self.last_batch_problems = []  # 上一次批量识别中每张图的不合法原因
         
         # 棋子类别映射（16类）
         self.piece_map = {
@@ -74,8 +292,48 @@ class CChessDeepRecognizer:
         
         self.pose_model = None
         self.classifier_model = None
+        self.load_time = None  # 模型加载耗时（秒）
         
-        self.load_models()
+        # 逐帧复用的缓冲区：绑定输入输出的会话和resize/透视变换的中间结果
+        # 同一时间只能有一次识别使用它们，由lock保证
+        self.lock = threading.Lock()
+        self.bound_sessions = {}
+        self.buffers = {}
+        
+        if load_in_background:
+            self.ready = self.load_models_async()
+        else:
+            self.ready = Future()
+            self.ready.set_result(self.load_models())
+    
+    def load_session_options(self):
+        """读取模型目录下的 session_options.json，不存在或读取失败时返回None"""
+        options_file = self.models_dir / "session_options.json"
+        if not options_file.exists():
+            return None
+        try:
+            with open(options_file, encoding='utf-8') as f:
+                options = json.load(f)
+            merge_session_options(options)  # 提前检查参数名
+            print(f"已读取会话参数: {options_file}")
+            return options
+        except Exception as e:
+            print(f"⚠ 会话参数文件读取失败: {e}")
+            return None
+    
+    def create_session(self, model_path, section):
+        """按 self.session_options 中对应模型的参数创建推理会话"""
+        session_options, providers = build_session_options(self.session_options[section])
+        return ort.InferenceSession(str(model_path), sess_options=session_options, providers=providers)
+    
+    def describe_session(self, session, section):
+        """打印会话的参数和模型输入输出"""
+        options = self.session_options[section]
+        print(f"  会话参数: 图优化={options['graph_optimization_level']}, "
+              f"线程={options['intra_op_num_threads']}/{options['inter_op_num_threads']}, "
+              f"执行模式={options['execution_mode']}, 提供者={session.get_providers()}")
+        print(f"  输入: {[(inp.name, inp.shape) for inp in session.get_inputs()]}")
+        print(f"  输出: {[(out.name, out.shape) for out in session.get_outputs()]}")
     
     def load_models(self):
         """加载ONNX模型"""
@@ -100,27 +358,70 @@ class CChessDeepRecognizer:
             return False
         
         try:
-            # 加载模型
-            print("正在加载棋盘检测模型...")
-            self.pose_model = ort.InferenceSession(str(pose_model_path))
+            # 两个模型同时加载（创建会话时onnxruntime释放GIL，可以并行）
+            print("正在加载棋盘检测模型和棋子分类模型...")
+            start = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=2, thread_name_prefix="model-loader") as executor:
+                pose = executor.submit(self.create_session, pose_model_path, 'pose')
+                classifier = executor.submit(self.create_session, classifier_model_path, 'classifier')
+                pose_model = pose.result()
+                classifier_model = classifier.result()
+            self.load_time = time.perf_counter() - start
             
             # 打印模型输入输出信息
-            print(f"  输入: {[(inp.name, inp.shape) for inp in self.pose_model.get_inputs()]}")
-            print(f"  输出: {[(out.name, out.shape) for out in self.pose_model.get_outputs()]}")
+            self.describe_session(pose_model, 'pose')
             print("✓ 棋盘检测模型加载成功")
-            
-            print("正在加载棋子分类模型...")
-            self.classifier_model = ort.InferenceSession(str(classifier_model_path))
-            print(f"  输入: {[(inp.name, inp.shape) for inp in self.classifier_model.get_inputs()]}")
-            print(f"  输出: {[(out.name, out.shape) for out in self.classifier_model.get_outputs()]}")
+            self.describe_session(classifier_model, 'classifier')
             print("✓ 棋子分类模型加载成功")
+            print(f"  模型加载耗时: {self.load_time:.2f} 秒")
             
+            self.pose_model = pose_model
+            self.classifier_model = classifier_model
             return True
             
         except Exception as e:
             print(f"✗ 模型加载失败: {e}")
             return False
     
+    def load_models_async(self):
+        """
+        在后台线程加载模型
+        
+        Returns:
+            Future，结果为 load_models 的返回值（是否加载成功）
+        """
+        future = Future()
+        
+        def run():
+            try:
+                future.set_result(self.load_models())
+            except Exception as e:
+                future.set_exception(e)
+        
+        threading.Thread(target=run, name="model-loader", daemon=True).start()
+        return future
+    
+    def wait_ready(self, timeout=None):
+        """等待模型加载完成，返回是否加载成功（超时抛出TimeoutError）"""
+        return bool(self.ready.result(timeout))
+    
+    def bound_session(self, section):
+        """取得绑定了预分配缓冲区的会话（batch=1），模型更换后重新绑定"""
+        session = self.pose_model if section == 'pose' else self.classifier_model
+        bound = self.bound_sessions.get(section)
+        if bound is None or bound.session is not session:
+            width, height = POSE_INPUT_SIZE if section == 'pose' else CLASSIFIER_INPUT_SIZE
+            bound = BoundSession(session, (1, 3, height, width))
+            self.bound_sessions[section] = bound
+        return bound
+    
+    def buffer(self, name, shape, dtype=np.uint8):
+        """取得名为name的复用缓冲区，形状或类型变化时重新分配"""
+        buffer = self.buffers.get(name)
+        if buffer is None or buffer.shape != tuple(shape) or buffer.dtype != dtype:
+            buffer = self.buffers[name] = np.empty(shape, dtype=dtype)
+        return buffer
+    
     def recognize(self, image):
         """
         识别棋盘
@@ -129,69 +430,231 @@ class CChessDeepRecognizer:
             image: 输入图像 (numpy array)
         
         Returns:
-            FEN字符串
+            FEN字符串，识别失败或局面不合法时为None（原因见 last_problems）
         """
-        if self.pose_model is None or self.classifier_model is None:
+        self.last_problems = []
+        if not self.wait_ready():
             print("模型未加载")
             return None
         
-        try:
-            # 步骤1: 检测棋盘关键点
-            print("步骤1: 检测棋盘关键点...")
-            keypoints = self.detect_keypoints(image)
-            
-            if keypoints is None:
-                print("未检测到棋盘")
-                return None
-            
-            # 步骤2: 透视变换对齐棋盘
-            print("步骤2: 对齐棋盘...")
-            aligned_board = self.align_board(image, keypoints)
-            
-            if aligned_board is None:
-                print("棋盘对齐失败")
+        frame = self.debug_sink.frame()
+        frame.add('input', image)
+        fen = None
+        with self.lock:
+            try:
+                out = self.buffer('aligned', (ALIGNED_BOARD_SIZE[1], ALIGNED_BOARD_SIZE[0], 3), image.dtype)
+                aligned_board = None
+                
+                # 跟踪模式：棋盘没有移动时沿用上一帧的透视变换，省去关键点检测
+                matrix = self.tracked_homography(image)
+                if matrix is not None:
+                    print("步骤1-2: 沿用上一帧的棋盘位置...")
+                    aligned_board = cv2.warpPerspective(image, matrix, ALIGNED_BOARD_SIZE, dst=out)
+                    alignment = self.grid_alignment(aligned_board)
+                    if alignment >= TRACKING_MIN_ALIGNMENT:
+                        self.tracked['age'] += 1
+                        self.tracked_frames += 1
+                    else:
+                        print(f"  棋盘位置已变化（网格相关系数 {alignment:.2f}），重新检测关键点")
+                        aligned_board = None
+                        self.tracked = None
+                
+                if aligned_board is None:
+                    # 步骤1: 检测棋盘关键点
+                    print("步骤1: 检测棋盘关键点...")
+                    self.pose_runs += 1
+                    keypoints = self.detect_keypoints(image)
+                    
+                    if keypoints is None:
+                        print("未检测到棋盘")
+                        return None
+                    
+                    # 步骤2: 透视变换对齐棋盘
+                    print("步骤2: 对齐棋盘...")
+                    matrix = self.board_homography(keypoints)
+                    aligned_board = cv2.warpPerspective(image, matrix, ALIGNED_BOARD_SIZE, dst=out)
+                    print(f"✓ 棋盘对齐完成，尺寸: {aligned_board.shape}")
+                    if self.track_board:
+                        self.tracked = {'matrix': matrix, 'shape': image.shape,
+                                        'profile': self.grid_profile(aligned_board), 'age': 0}
+                
+                frame.add('aligned', aligned_board)
+                
+                # 步骤3: 识别棋子
+                print("步骤3: 识别棋子...")
+                fen = self.classify_pieces(aligned_board)
+                
+                # 步骤4: 丢弃不可能出现的局面（多出的棋子、越出九宫的士等），不交给引擎
+                if fen:
+                    self.last_problems = self.check_position(fen)
+                    if self.last_problems:
+                        return None
+                
+                return fen
+                
+            except Exception as e:
+                print(f"识别失败: {e}")
+                import traceback
+                traceback.print_exc()
                 return None
             
-            # 步骤3: 识别棋子
-            print("步骤3: 识别棋子...")
-            fen = self.classify_pieces(aligned_board)
-            
-            return fen
-            
-        except Exception as e:
-            print(f"识别失败: {e}")
-            import traceback
-            traceback.print_exc()
-            return None
+            finally:
+                failed = fen is None or bool(self.last_problems)
+                if failed:
+                    self.tracked = None  # 识别失败可能是棋盘位置不对，下一帧重新检测关键点
+                # 在释放lock前结束这一帧：对齐结果所在的缓冲区会被下一次识别覆盖
+                frame.close(failed=failed)
+    
+    def recognize_batch(self, images):
+        """
+        批量识别多张图片（离线图片目录、一屏中的多个棋盘）
+        
+        预处理后的图片沿batch维叠成一个张量，每个模型只调用一次；
+        模型的batch维固定时按固定大小分块调用
+        
+        Args:
+            images: 输入图像列表 (numpy array)
+        
+        Returns:
+            与images一一对应的FEN列表，识别失败或局面不合法的位置为None
+            （不合法的原因见 last_batch_problems 中的对应项）
+        """
+        images = list(images)
+        results = [None] * len(images)
+        self.last_batch_problems = [[] for _ in images]
+        if not images:
+            return results
+        if not self.wait_ready():
+            print("模型未加载")
+            return results
+        
+        frames = [self.debug_sink.frame() for _ in images]
+        for frame, image in zip(frames, images):
+            frame.add('input', image)
+        
+        with self.lock:
+            try:
+                # 步骤1: 批量检测棋盘关键点
+                print(f"步骤1: 检测{len(images)}张图片的棋盘关键点...")
+                width, height = POSE_INPUT_SIZE
+                pose_batch = np.empty((len(images), 3, height, width), dtype=np.float32)
+                for index, image in enumerate(images):
+                    self.preprocess_pose_image(image, out=pose_batch[index:index + 1])
+                simcc_x, simcc_y = self.run_batched(self.pose_model, pose_batch)[:2]
+                
+                # 步骤2: 逐张透视变换对齐棋盘
+                print("步骤2: 对齐棋盘...")
+                aligned_boards = []
+                indices = []
+                for index, image in enumerate(images):
+                    keypoints = self.decode_keypoints(simcc_x[index], simcc_y[index], image.shape)
+                    aligned_board = self.align_board(image, keypoints)
+                    if aligned_board is not None:
+                        frames[index].add('aligned', aligned_board)
+                        aligned_boards.append(aligned_board)
+                        indices.append(index)
+                
+                # 步骤3: 批量识别棋子
+                if aligned_boards:
+                    print(f"步骤3: 识别{len(aligned_boards)}个棋盘的棋子...")
+                    width, height = CLASSIFIER_INPUT_SIZE
+                    classifier_batch = np.empty((len(aligned_boards), 3, height, width), dtype=np.float32)
+                    for index, board in enumerate(aligned_boards):
+                        self.preprocess_classifier_image(board, out=classifier_batch[index:index + 1])
+                    predictions = self.run_batched(self.classifier_model, classifier_batch)[0]
+                    
+                    # 步骤4: 丢弃不可能出现的局面
+                    for index, board_predictions in zip(indices, predictions):
+                        fen = self.predictions_to_fen(board_predictions)
+                        self.last_batch_problems[index] = self.check_position(fen)
+                        if not self.last_batch_problems[index]:
+                            results[index] = fen
+                
+            except Exception as e:
+                print(f"批量识别失败: {e}")
+                import traceback
+                traceback.print_exc()
+        
+        for frame, fen in zip(frames, results):
+            frame.close(failed=fen is None)
+        print(f"✓ 批量识别完成: {sum(fen is not None for fen in results)}/{len(images)} 张成功")
+        return results
+    
+    def run_batched(self, session, batch):
+        """
+        按batch运行模型
+        
+        batch维可变时一次运行；固定时按模型的batch大小分块运行，最后一块不足时补零
+        
+        Args:
+            session: 推理会话
+            batch: 沿第0维叠好的输入张量
+        
+        Returns:
+            各输出沿第0维拼接后的列表，长度与batch一致
+        """
+        model_input = session.get_inputs()[0]
+        batch_size = model_input.shape[0]
+        if not isinstance(batch_size, int) or batch_size <= 0 or batch_size == len(batch):
+            return session.run(None, {model_input.name: batch})
+        
+        chunks = []
+        for start in range(0, len(batch), batch_size):
+            chunk = batch[start:start + batch_size]
+            count = len(chunk)
+            if count < batch_size:
+                padding = np.zeros((batch_size - count,) + chunk.shape[1:], dtype=chunk.dtype)
+                chunk = np.concatenate([chunk, padding])
+            outputs = session.run(None, {model_input.name: chunk})
+            chunks.append([output[:count] for output in outputs])
+        return [np.concatenate([chunk[i] for chunk in chunks]) for i in range(len(chunks[0]))]
     
-    def preprocess_pose_image(self, image):
-        """预处理图像用于关键点检测"""
-        # 调整大小到模型输入尺寸
-        img = cv2.resize(image, (256, 256))  # 模型需要256x256
+    def check_position(self, fen):
+        """
+        检查识别出的局面能否出现在对局中（validate关闭时不检查）
         
-        # 归一化
-        img = img.astype(np.float32) / 255.0
-        mean = np.array([0.485, 0.456, 0.406], dtype=np.float32)
-        std = np.array([0.229, 0.224, 0.225], dtype=np.float32)
-        img = (img - mean) / std
+        Returns:
+            问题说明列表，合法时为空列表
+        """
+        if not self.validate:
+            return []
+        problems = validate_position(fen.split()[0])
+        if problems:
+            print(f"⚠ 识别结果不是合法局面: {'；'.join(problems)}")
+        return problems
+    
+    def preprocess_pose_image(self, image, out=None):
+        """
+        预处理图像用于关键点检测
+        
+        Args:
+            image: 输入图像 (BGR)
+            out: 写入结果的 (1,3,256,256) float32 缓冲区，为None时新分配
         
-        # 调整维度 (H,W,C) -> (C,H,W)
-        img = np.transpose(img, (2, 0, 1))
+        Returns:
+            out
+        """
+        width, height = POSE_INPUT_SIZE
+        if out is None:
+            out = np.empty((1, 3, height, width), dtype=np.float32)
         
-        # 添加batch维度
-        img = np.expand_dims(img, axis=0)
+        # 调整大小到模型输入尺寸，写入复用的缓冲区
+        img = cv2.resize(image, POSE_INPUT_SIZE, dst=self.buffer('pose_resized', (height, width, 3), image.dtype))
         
-        return img
+        # 归一化并调整维度 (H,W,C) -> (C,H,W)，直接写入out
+        normalize_into(img, out[0], POSE_MEAN, POSE_INV_STD)
+        
+        return out
     
     def detect_keypoints(self, image):
         """检测棋盘4个角点"""
         try:
-            # 预处理图像
-            input_tensor = self.preprocess_pose_image(image)
+            # 预处理图像，直接写入绑定的输入缓冲区
+            session = self.bound_session('pose')
+            self.preprocess_pose_image(image, out=session.input)
             
             # 运行推理
-            input_name = self.pose_model.get_inputs()[0].name
-            outputs = self.pose_model.run(None, {input_name: input_tensor})
+            outputs = session.run()
             
             # 调试：打印输出信息
             print(f"  模型输出数量: {len(outputs)}")
@@ -204,21 +667,7 @@ class CChessDeepRecognizer:
                 print(f"✗ 模型输出格式异常，期望至少2个输出，实际: {len(outputs)}")
                 return None
             
-            simcc_x, simcc_y = outputs[0][0], outputs[1][0]
-            
-            # 获取4个关键点的坐标
-            keypoints = []
-            for i in range(4):  # 4个角点
-                x_coord = np.argmax(simcc_x[i])
-                y_coord = np.argmax(simcc_y[i])
-                
-                # 将坐标映射回原图
-                x = int(x_coord * image.shape[1] / simcc_x.shape[1])
-                y = int(y_coord * image.shape[0] / simcc_y.shape[1])
-                
-                keypoints.append([x, y])
-            
-            keypoints = np.array(keypoints, dtype=np.float32)
+            keypoints = self.decode_keypoints(outputs[0][0], outputs[1][0], image.shape)
             print(f"✓ 检测到4个角点: {keypoints.tolist()}")
             
             return keypoints
@@ -229,61 +678,38 @@ class CChessDeepRecognizer:
             traceback.print_exc()
             return None
     
-    def align_board(self, image, keypoints):
-        """透视变换对齐棋盘"""
+    def decode_keypoints(self, simcc_x, simcc_y, image_shape):
+        """
+        由一张图的SimCC输出得到4个角点在原图中的坐标
+        
+        Args:
+            simcc_x, simcc_y: 形状为 (4, 分箱数) 的x/y方向分类输出
+            image_shape: 原图的shape
+        """
+        # 每个角点取概率最大的分箱，映射回原图坐标
+        x_coords = np.argmax(simcc_x[:4], axis=1)
+        y_coords = np.argmax(simcc_y[:4], axis=1)
+        x = (x_coords * image_shape[1] / simcc_x.shape[1]).astype(np.int64)
+        y = (y_coords * image_shape[0] / simcc_y.shape[1]).astype(np.int64)
+        return np.stack([x, y], axis=1).astype(np.float32)
+    
+    def align_board(self, image, keypoints, out=None):
+        """
+        透视变换对齐棋盘
+        
+        Args:
+            image: 输入图像
+            keypoints: 4个角点
+            out: 写入结果的 (450,400,3) 缓冲区，为None时新分配
+        """
         try:
-            # 目标尺寸：标准俯视棋盘
-            target_width = 400
-            target_height = 450  # 保持9:10比例
-            
-            # 定义目标点（俯视图的四个角）
-            dst_points = np.array([
-                [0, 0],                      # 左上 (黑方左角)
-                [target_width, 0],           # 右上 (黑方右角)
-                [target_width, target_height], # 右下 (红方右角)
-                [0, target_height]           # 左下 (红方左角)
-            ], dtype=np.float32)
-            
-            # 对关键点进行排序：按照左上、右上、右下、左下的顺序
-            # 首先按y坐标排序，分出上下两组
-            points = keypoints.copy()
-            points_sorted_y = points[np.argsort(points[:, 1])]
-            
-            # 上面两个点（y较小）
-            top_points = points_sorted_y[:2]
-            # 下面两个点（y较大）
-            bottom_points = points_sorted_y[2:]
-            
-            # 在每组内按x坐标排序
-            top_points = top_points[np.argsort(top_points[:, 0])]  # 左上、右上
-            bottom_points = bottom_points[np.argsort(bottom_points[:, 0])]  # 左下、右下
-            
-            # 组合成正确的顺序：左上、右上、右下、左下
-            src_points = np.array([
-                top_points[0],      # 左上
-                top_points[1],      # 右上
-                bottom_points[1],   # 右下
-                bottom_points[0]    # 左下
-            ], dtype=np.float32)
-            
-            print(f"  排序后的角点:")
-            print(f"    左上: {src_points[0]}")
-            print(f"    右上: {src_points[1]}")
-            print(f"    右下: {src_points[2]}")
-            print(f"    左下: {src_points[3]}")
-            
-            # 计算透视变换矩阵
-            matrix = cv2.getPerspectiveTransform(src_points, dst_points)
+            matrix = self.board_homography(keypoints)
             
             # 应用透视变换
-            aligned = cv2.warpPerspective(image, matrix, (target_width, target_height))
+            aligned = cv2.warpPerspective(image, matrix, ALIGNED_BOARD_SIZE, dst=out)
             
             print(f"✓ 棋盘对齐完成，尺寸: {aligned.shape}")
             
-            # 保存调试图像
-            cv2.imwrite("debug_aligned_board.png", aligned)
-            print("  调试图像已保存: debug_aligned_board.png")
-            
             return aligned
             
         except Exception as e:
@@ -292,71 +718,132 @@ class CChessDeepRecognizer:
             traceback.print_exc()
             return None
     
-    def preprocess_classifier_image(self, aligned_board):
-        """预处理对齐的棋盘图像用于分类"""
-        # Swin Transformer输入尺寸
-        target_size = (280, 315)  # (width, height)
+    def board_homography(self, keypoints):
+        """由4个角点计算原图到标准俯视棋盘的透视变换矩阵"""
+        # 目标尺寸：标准俯视棋盘
+        target_width, target_height = ALIGNED_BOARD_SIZE
+        
+        # 定义目标点（俯视图的四个角）
+        dst_points = np.array([
+            [0, 0],                      # 左上 (黑方左角)
+            [target_width, 0],           # 右上 (黑方右角)
+            [target_width, target_height], # 右下 (红方右角)
+            [0, target_height]           # 左下 (红方左角)
+        ], dtype=np.float32)
+        
+        # 对关键点进行排序：按照左上、右上、右下、左下的顺序
+        # 首先按y坐标排序，分出上下两组
+        points = keypoints.copy()
+        points_sorted_y = points[np.argsort(points[:, 1])]
+        
+        # 上面两个点（y较小）
+        top_points = points_sorted_y[:2]
+        # 下面两个点（y较大）
+        bottom_points = points_sorted_y[2:]
+        
+        # 在每组内按x坐标排序
+        top_points = top_points[np.argsort(top_points[:, 0])]  # 左上、右上
+        bottom_points = bottom_points[np.argsort(bottom_points[:, 0])]  # 左下、右下
+        
+        # 组合成正确的顺序：左上、右上、右下、左下
+        src_points = np.array([
+            top_points[0],      # 左上
+            top_points[1],      # 右上
+            bottom_points[1],   # 右下
+            bottom_points[0]    # 左下
+        ], dtype=np.float32)
+        
+        print(f"  排序后的角点:")
+        print(f"    左上: {src_points[0]}")
+        print(f"    右上: {src_points[1]}")
+        print(f"    右下: {src_points[2]}")
+        print(f"    左下: {src_points[3]}")
+        
+        # 计算透视变换矩阵
+        return cv2.getPerspectiveTransform(src_points, dst_points)
+    
+    def tracked_homography(self, image):
+        """跟踪模式下可以沿用的透视变换矩阵；没有跟踪参考、图像尺寸变化或到了刷新时间时返回None"""
+        tracked = self.tracked
+        if not self.track_board or tracked is None:
+            return None
+        if tracked['shape'] != image.shape or tracked['age'] >= self.refresh_interval:
+            return None
+        return tracked['matrix']
+    
+    def reset_tracking(self):
+        """丢弃跟踪参考，下一次识别重新检测关键点（例如切换到另一张图片时）"""
+        self.tracked = None
+    
+    def grid_profile(self, aligned_board):
+        """
+        对齐后棋盘的网格投影：水平梯度按列求和、竖直梯度按行求和
         
-        # Resize
-        img = cv2.resize(aligned_board, target_size)
+        棋盘线在投影中形成等间距的尖峰，棋子增减只改变局部高度，
+        而棋盘移动几个像素尖峰就会错位，相关系数明显下降
         
-        # BGR to RGB
-        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+        Returns:
+            (列投影, 行投影)
+        """
+        height, width = aligned_board.shape[:2]
+        gray = cv2.cvtColor(aligned_board, cv2.COLOR_BGR2GRAY, dst=self.buffer('track_gray', (height, width)))
+        gradient = self.buffer('track_gradient', (height, width), np.int16)
+        cv2.Sobel(gray, cv2.CV_16S, 1, 0, dst=gradient)
+        columns = np.abs(gradient, out=gradient).sum(axis=0, dtype=np.float32)
+        cv2.Sobel(gray, cv2.CV_16S, 0, 1, dst=gradient)
+        rows = np.abs(gradient, out=gradient).sum(axis=1, dtype=np.float32)
+        return columns, rows
+    
+    def grid_alignment(self, aligned_board):
+        """当前画面与跟踪参考的网格投影相关系数（行、列取较小者），1表示完全对齐"""
+        columns, rows = self.grid_profile(aligned_board)
+        reference_columns, reference_rows = self.tracked['profile']
+        return min(profile_correlation(columns, reference_columns), profile_correlation(rows, reference_rows))
+    
+    def preprocess_classifier_image(self, aligned_board, out=None):
+        """
+        预处理对齐的棋盘图像用于分类
         
-        # 归一化 - ImageNet标准
-        mean = np.array([123.675, 116.28, 103.53], dtype=np.float32)
-        std = np.array([58.395, 57.12, 57.375], dtype=np.float32)
-        img = (img - mean) / std
+        Args:
+            aligned_board: 对齐后的棋盘图像 (BGR)
+            out: 写入结果的 (1,3,315,280) float32 缓冲区，为None时新分配
         
-        img = img.astype(np.float32)
+        Returns:
+            out
+        """
+        width, height = CLASSIFIER_INPUT_SIZE
+        if out is None:
+            out = np.empty((1, 3, height, width), dtype=np.float32)
+        shape = (height, width, 3)
         
-        # 调整维度 (H,W,C) -> (C,H,W)
-        img = np.transpose(img, (2, 0, 1))
+        # Resize 和 BGR to RGB，写入复用的缓冲区
+        img = cv2.resize(aligned_board, CLASSIFIER_INPUT_SIZE,
+                         dst=self.buffer('classifier_resized', shape, aligned_board.dtype))
+        img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB, dst=self.buffer('classifier_rgb', shape, aligned_board.dtype))
         
-        # 添加batch维度
-        img = np.expand_dims(img, axis=0)
+        # 归一化并调整维度 (H,W,C) -> (C,H,W)，直接写入out
+        normalize_into(img, out[0], CLASSIFIER_MEAN, CLASSIFIER_INV_STD)
         
-        return img
+        return out
     
     def classify_pieces(self, aligned_board):
         """识别棋子并返回FEN"""
         try:
-            # 预处理图像
-            input_tensor = self.preprocess_classifier_image(aligned_board)
+            # 预处理图像，直接写入绑定的输入缓冲区
+            session = self.bound_session('classifier')
+            self.preprocess_classifier_image(aligned_board, out=session.input)
             
             # 运行推理
-            input_name = self.classifier_model.get_inputs()[0].name
-            outputs = self.classifier_model.run(None, {input_name: input_tensor})
+            outputs = session.run()
             
             # 解析输出 - shape: (1, 90, 16)
             # 90个位置 (10行×9列)，每个位置16类
             predictions = outputs[0][0]  # shape: (90, 16)
-            
-            # 获取每个位置的最高概率类别
-            class_indices = np.argmax(predictions, axis=1)  # shape: (90,)
-            confidences = np.max(predictions, axis=1)  # shape: (90,)
-            
-            # 将类别索引转换为FEN字符
-            fen_chars = []
-            for i in range(90):
-                class_idx = class_indices[i]
-                conf = confidences[i]
-                class_name = self.class_names[class_idx]
-                fen_char = self.class_to_fen[class_name]
-                fen_chars.append(fen_char)
-            
-            # 生成FEN字符串
-            fen_rows = []
-            for row in range(10):
-                row_chars = fen_chars[row*9:(row+1)*9]
-                row_fen = self.compress_fen_row(row_chars)
-                fen_rows.append(row_fen)
-            
-            fen = '/'.join(fen_rows) + ' w'  # 使用简洁FEN格式
+            fen = self.predictions_to_fen(predictions)
             
             # 统计识别情况
-            recognized = sum(1 for c in fen_chars if c not in ['.', 'x'])
-            avg_conf = np.mean(confidences)
+            recognized = sum(1 for c in fen.split()[0] if c.isalpha())
+            avg_conf = np.mean(np.max(predictions, axis=1))
             print(f"✓ 识别完成: {recognized}/32 个棋子")
             print(f"  平均置信度: {avg_conf:.2%}")
             
@@ -368,6 +855,22 @@ class CChessDeepRecognizer:
             traceback.print_exc()
             return None
     
+    def predictions_to_fen(self, predictions):
+        """
+        一张棋盘的分类输出 (90, 16) 转换为FEN
+        """
+        # 获取每个位置的最高概率类别，转换为FEN字符
+        class_indices = np.argmax(predictions, axis=1)  # shape: (90,)
+        fen_chars = [self.class_to_fen[self.class_names[class_idx]] for class_idx in class_indices]
+        
+        # 生成FEN字符串
+        fen_rows = []
+        for row in range(10):
+            row_chars = fen_chars[row*9:(row+1)*9]
+            fen_rows.append(self.compress_fen_row(row_chars))
+        
+        return '/'.join(fen_rows) + ' w'  # 使用简洁FEN格式
+    
     def compress_fen_row(self, row_chars):
         """压缩FEN行表示（连续空格用数字表示）"""
         result = []
@@ -11,25 +11,52 @@ import pyautogui
 import keyboard
 import os
 import sys
+import json
+import asyncio
+import threading
 from pathlib import Path
-import subprocess
 import urllib.request
 import zipfile
-import threading
-import queue
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# Windows平台的subprocess标志
-if sys.platform == 'win32':
-    CREATE_NO_WINDOW = 0x08000000
-else:
-    CREATE_NO_WINDOW = 0
+from pikafish_engine import (get_engine_pool, build_go_command, extract_candidates, LiveAnalysis,
+                             default_engine_options, EngineTimeout, parse_board)
+from analysis_cache import AnalysisCache
+from analysis_result import AnalysisResult, AnalysisError
+from opening_book import OpeningBook
+from xiangqi_rules import Position, validate_position
+from async_engine import AsyncEngineService
+from debug_sink import DebugSink
 
 
 class ChineseChessAssistant:
-    def __init__(self):
+    def __init__(self, engine_options=None, use_async_engine=False, recognizer_options=None, load_detector=True,
+                 debug_images='off'):
+        """
+        参数:
+            engine_options: 覆盖默认值的引擎UCI选项，如 {'Threads': 4, 'Hash': 512}；
+                            也可写在 engine/options.json 中，此参数优先
+            use_async_engine: 启动时预热asyncio引擎服务（供界面通过submit_both_sides派发可取消的分析），
+                              而不是同步引擎进程池
+            recognizer_options: 识别模型的ONNX Runtime会话参数，如 {'intra_op_num_threads': 2}；
+                                也可写在 models/cchess_recognition/session_options.json 中，此参数优先
+            load_detector: 是否加载识别模型（界面自带识别器，只用本类做引擎分析时传False）
+            debug_images: 调试图像保存方式（见 DebugSink.from_spec），如 "failures"、"every:10"；
+                          默认不保存，图像写入 debug_images 目录
+        """
         self.running = False
         self.screenshot_interval = 2  # 截图间隔（秒）
         self.engine_path = None
+        self.engine_options = dict(engine_options or {})
+        self.recognizer_options = dict(recognizer_options or {})
+        self.debug_sink = DebugSink.from_spec(debug_images)
+        self.use_async_engine = use_async_engine
+        self.engine_pool = None  # 常驻引擎进程池
+        self.engine_service = None  # asyncio引擎服务（可取消的后台分析）
+        self.analysis_cache = AnalysisCache(max_size=256)  # 分析结果缓存
+        self.live_analyses = None  # 持续分析引擎 {'red': LiveAnalysis, 'black': LiveAnalysis}
+        self.live_lock = threading.Lock()  # 持续分析引擎的启动和停止互斥，避免重复启动
+        self.opening_book = None  # 开局库，命中时不调用引擎
         self.current_fen = None
         self.deep_learning_detector = None  # 深度学习识别器
         
@@ -37,7 +64,8 @@ class ChineseChessAssistant:
         self.setup_engine()
         
         # 加载深度学习检测器
-        self.setup_detector()
+        if load_detector:
+            self.setup_detector()
         
     def setup_engine(self):
         """设置Pikafish引擎"""
@@ -54,6 +82,7 @@ class ChineseChessAssistant:
         # 检查引擎是否存在
         engine_dir = base_path / "engine"
         engine_dir.mkdir(exist_ok=True)
+        self.load_opening_book(engine_dir / "book.bin")
         
         # Windows平台
         if sys.platform == "win32":
@@ -66,9 +95,110 @@ class ChineseChessAssistant:
             else:
                 self.engine_path = str(engine_file.absolute())
                 print(f"引擎路径: {self.engine_path}")
+                if self.use_async_engine:
+                    self.start_engine_service()
+                else:
+                    self.start_engine_pool()
         else:
             print("当前仅支持Windows平台")
     
+    def load_opening_book(self, book_file):
+        """加载开局库（engine/book.bin，可用 opening_book.py build 生成）"""
+        if not book_file.exists():
+            return
+        try:
+            self.opening_book = OpeningBook(book_file)
+            print(f"✓ 已加载开局库: {book_file}（{len(self.opening_book)} 条记录）")
+        except Exception as e:
+            print(f"⚠ 开局库加载失败: {e}")
+            self.opening_book = None
+    
+    def probe_opening_book(self, fen, side_to_move):
+        """
+        查询开局库
+        返回: 命中时为AnalysisResult（depth为0，score_cp为库中记录的评分），未命中返回None
+        """
+        if self.opening_book is None:
+            return None
+        entries = self.opening_book.lookup(fen, side_to_move)
+        if not entries:
+            return None
+        # 与引擎走法一样做合法性检查，跳过损坏或哈希碰撞得到的库内走法
+        position = self.rules_position(fen, side_to_move)
+        entry = next((entry for entry in entries if position is not None and position.is_legal(entry.move)), None)
+        if entry is None:
+            print(f"⚠ 开局库中的走法不合法: {', '.join(entry.move for entry in entries)}")
+            return None
+        print(f"📖 命中开局库: {entry.move}（权重{entry.weight}）")
+        return AnalysisResult(bestmove=entry.move, score_cp=entry.score, pv=[entry.move])
+    
+    def rules_position(self, fen, side_to_move):
+        """按走子规则解析局面，无法解析（如缺少将帅）时返回None"""
+        try:
+            return Position.from_fen(fen, side_to_move)
+        except ValueError:
+            return None
+    
+    def probe_rules(self, position):
+        """
+        不需要引擎搜索的局面：无合法走法、只有一个合法走法或有一步杀
+        返回: AnalysisResult，需要引擎搜索时返回None
+        """
+        moves = position.legal_moves()
+        if not moves:
+            return AnalysisResult.failure(AnalysisError.NO_BESTMOVE, "走棋方已无合法走法（被将死或困毙）")
+        if len(moves) == 1:
+            print(f"♟ 唯一合法走法: {moves[0]}")
+            return AnalysisResult(bestmove=moves[0], pv=moves)
+        mate = position.mate_in_one()
+        if mate:
+            print(f"♟ 一步杀: {mate}")
+            return AnalysisResult(bestmove=mate, score_mate=1, pv=[mate])
+        return None
+    
+    def check_engine_move(self, position, result):
+        """引擎给出的走法不合法时（局面识别有误或引擎异常）改为失败结果"""
+        if position is None or not result.ok or position.is_legal(result.bestmove):
+            return result
+        print(f"⚠ 引擎返回了非法走法: {result.bestmove}")
+        return AnalysisResult.failure(AnalysisError.ENGINE_FAILURE, f"非法走法 {result.bestmove}", result.elapsed)
+    
+    def load_engine_options(self):
+        """读取 engine/options.json 中的引擎参数，构造参数中的同名项优先"""
+        options_file = Path(self.engine_path).parent / "options.json"
+        if not options_file.exists():
+            return
+        try:
+            with open(options_file, encoding='utf-8') as f:
+                file_options = json.load(f)
+            file_options.update(self.engine_options)
+            self.engine_options = file_options
+            print(f"已读取引擎参数: {options_file}")
+        except Exception as e:
+            print(f"⚠ 引擎参数文件读取失败: {e}")
+    
+    def start_engine_pool(self):
+        """启动（或复用）常驻引擎进程池，引擎参数在每个进程启动时设置一次"""
+        self.load_engine_options()
+        try:
+            self.engine_pool = get_engine_pool(self.engine_path, options=self.engine_options)
+            options = ', '.join(f"{k}={v}" for k, v in self.engine_pool.options.items())
+            print(f"✓ 引擎进程池已就绪（{self.engine_pool.size}个进程，{options}）")
+        except Exception as e:
+            # 预热失败时不影响启动，分析时再尝试
+            print(f"⚠ 引擎进程池启动失败: {e}")
+            self.engine_pool = None
+    
+    def start_engine_service(self):
+        """启动asyncio引擎服务：一个后台事件循环复用全部引擎管道"""
+        self.load_engine_options()
+        try:
+            self.engine_service = AsyncEngineService(self.engine_path, options=self.engine_options)
+            print(f"✓ 异步引擎服务已就绪（{self.engine_service.pool.size}个进程）")
+        except Exception as e:
+            print(f"⚠ 异步引擎服务启动失败: {e}")
+            self.engine_service = None
+    
     def setup_detector(self):
         """设置深度学习检测器"""
         
@@ -80,7 +210,9 @@ class ChineseChessAssistant:
             # 检查模型文件是否存在
             if (models_dir / "rtmpose-t-cchess_4.onnx").exists() and \
                (models_dir / "swinv2-nano_cchess16.onnx").exists():
-                self.deep_learning_detector = CChessDeepRecognizer()
+                self.deep_learning_detector = CChessDeepRecognizer(session_options=self.recognizer_options,
+                                                                   debug_sink=self.debug_sink,
+                                                                   track_board=True)
                 if self.deep_learning_detector.pose_model and self.deep_learning_detector.classifier_model:
                     print("✓ 深度学习识别器已加载（准确率：85-90%）")
                 else:
@@ -137,7 +269,7 @@ class ChineseChessAssistant:
     def recognize_pieces(self, board_image):
         """
         使用深度学习识别棋盘上的棋子
-        返回FEN格式的棋局描述
+        返回FEN格式的棋局描述，识别失败或识别出的局面不合法时返回None（该帧丢弃，不再分析）
         """
         try:
             # 调整图像大小以便处理
@@ -146,9 +278,6 @@ class ChineseChessAssistant:
                 scale = min(900/w, 1000/h)
                 board_image = cv2.resize(board_image, (int(w*scale), int(h*scale)))
             
-            # 保存调试图像
-            cv2.imwrite("debug_board_original.png", board_image)
-            
             # 使用深度学习识别器
             if self.deep_learning_detector and self.deep_learning_detector.pose_model:
                 print("正在使用深度学习识别...")
@@ -159,240 +288,333 @@ class ChineseChessAssistant:
                         return fen
                     else:
                         print("⚠ 深度学习识别结果无效")
-                        # 返回初始局面作为后备
-                        return "rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w"
+                        return None
                 except Exception as e:
                     print(f"深度学习识别出错: {e}")
                     import traceback
                     traceback.print_exc()
-                    return "rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w"
+                    return None
             else:
                 print("✗ 深度学习识别器未加载")
-                return "rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w"
+                return None
             
         except Exception as e:
             print(f"棋子识别出错: {e}")
             import traceback
             traceback.print_exc()
-            # 返回初始局面作为后备
-            return "rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w"
+            return None
     
     def _validate_fen(self, fen):
-        """验证FEN的基本有效性"""
+        """验证FEN能否出现在实际对局中（格式、棋子数量和位置、将帅照面）"""
         if not fen:
             return False
-        # 检查是否包含将帅
-        fen_lower = fen.lower()
-        has_black_king = 'k' in fen_lower
-        has_red_king = 'K' in fen
-        return has_black_king and has_red_king
+        problems = validate_position(fen)
+        if problems:
+            print(f"⚠ 局面不合法: {'；'.join(problems)}")
+        return not problems
     
-    def analyze_position(self, fen, side_to_move='w', depth=8):
+    def analyze_position(self, fen, side_to_move='w', depth=8, on_info=None, movetime=None, nodes=None,
+                         multipv=1):
         """
         使用引擎分析局面
         参数:
             fen: 棋局的FEN格式
             side_to_move: 走棋方，'w'表示红方，'b'表示黑方
-            depth: 搜索深度
-        返回最佳走法
+            depth: 搜索深度（指定movetime或nodes时可为None）
+            on_info: 可选回调 on_info(info)，搜索中每完成一层即调用，
+                     info包含 depth、score_cp/score_mate、pv、nodes、nps 等字段，
+                     MultiPV搜索时还有 multipv 序号
+            movetime: 限时搜索（毫秒），到时即返回当前最佳走法
+            nodes: 限定节点数搜索
+            multipv: 同时搜索的候选走法数
+        返回: AnalysisResult，成功时 bestmove 为最佳走法，失败时 error 说明原因
+        """
+        return self._run_analysis(fen, side_to_move, depth, on_info, movetime, nodes, multipv)[0]
+    
+    def analyze_candidates(self, fen, side_to_move='w', depth=8, multipv=3, on_info=None,
+                           movetime=None, nodes=None):
+        """
+        一次MultiPV搜索得到前N个候选走法
+        返回: 按名次排列的候选列表，每项为info字典（move、pv、depth、score_cp/score_mate等），
+              分析失败时返回空列表
+        """
+        responses = self._run_analysis(fen, side_to_move, depth, on_info, movetime, nodes, multipv,
+                                       use_cache=False)[1]
+        return extract_candidates(responses)
+    
+    def _prepare_analysis(self, fen, side_to_move, depth, movetime, nodes, multipv, use_cache=True):
+        """
+        引擎搜索之前的检查和不需要引擎的快速路径（同步、异步分析共用）
+        依次为: FEN格式 → 局面合法性 → 开局库 → 规则（唯一走法、一步杀）→ 引擎就绪 → 分析缓存
+        返回: (AnalysisResult或None, 交给引擎的FEN, 规则局面或None)
+              第一项不为None时直接作为分析结果，不需要引擎搜索
         """
-        if not self.engine_path or not os.path.exists(self.engine_path):
-            return "引擎未就绪，请先下载Pikafish引擎"
-        
         # 简单验证FEN格式
         if not fen or len(fen) < 10:
-            return "FEN格式无效"
+            return AnalysisResult.failure(AnalysisError.INVALID_FEN), fen, None
         
-        # 修改FEN中的走棋方，使用简洁格式
-        fen_parts = fen.split()
-        if len(fen_parts) >= 1:
-            # 只保留位置和走棋方，不要其他附加信息
-            position = fen_parts[0]
-            fen = f"{position} {side_to_move}"
-        else:
-            # 如果FEN格式不完整
-            fen = f"{fen} {side_to_move}"
+        # 识别错误造成的不可能局面（缺将帅、棋子位置不可能等）直接丢弃，不占用引擎
+        problems = validate_position(fen, side_to_move)
+        if problems:
+            print(f"⚠ 局面不合法: {'；'.join(problems)}")
+            return AnalysisResult.failure(AnalysisError.ILLEGAL_POSITION, '；'.join(problems)), fen, None
         
-        # 检查是否有足够的棋子（至少要有将/帅）
-        if 'k' not in fen.lower() or 'K' not in fen:
-            print("警告: FEN中缺少将帅，可能识别不准确")
-            # 仍然尝试分析
+        # 开局阶段先查开局库，命中时不调用引擎（MultiPV需要多个候选，仍交给引擎）
+        if multipv <= 1:
+            book_result = self.probe_opening_book(fen, side_to_move)
+            if book_result is not None:
+                return book_result, fen, None
+        
+        # 唯一合法走法、一步杀等局面直接按规则给出走法
+        rules_pos = self.rules_position(fen, side_to_move)
+        if rules_pos is not None and multipv <= 1:
+            rules_result = self.probe_rules(rules_pos)
+            if rules_result is not None:
+                return rules_result, fen, rules_pos
+        
+        if not self.engine_path or not os.path.exists(self.engine_path):
+            return AnalysisResult.failure(AnalysisError.ENGINE_NOT_READY), fen, rules_pos
+        
+        # 只保留位置和走棋方，不要其他附加信息
+        fen = f"{fen.split()[0]} {side_to_move}"
+        
+        # 同一局面已分析到足够深度时直接使用缓存结果（限时/限节点搜索不查缓存）
+        # MultiPV搜索需要全部候选走法，也不查缓存
+        if use_cache and depth and not movetime and not nodes and multipv <= 1:
+            cached = self.analysis_cache.get(fen, side_to_move, depth)
+            if cached is not None:
+                print(f"✅ 命中分析缓存，最佳走法: {cached.bestmove}")
+                return cached, fen, rules_pos
+        
+        return None, fen, rules_pos
+    
+    def _finish_analysis(self, fen, side_to_move, rules_pos, lines, elapsed, multipv):
+        """
+        引擎搜索之后的处理（同步、异步分析共用）：检查走法是否合法，单PV结果按实际深度写入缓存
+        返回: AnalysisResult
+        """
+        result = self.check_engine_move(rules_pos, AnalysisResult.from_lines(lines, elapsed))
+        if result.ok and result.depth and multipv <= 1:
+            # 按实际达到的深度缓存，限时搜索的结果也能满足之后的定深请求
+            self.analysis_cache.put(fen, side_to_move, result.depth, result)
+        return result
+    
+    def _run_analysis(self, fen, side_to_move, depth, on_info, movetime, nodes, multipv, use_cache=True):
+        """
+        执行一次引擎分析
+        返回: (AnalysisResult, 引擎输出行列表)
+        """
+        result, fen, rules_pos = self._prepare_analysis(fen, side_to_move, depth, movetime, nodes, multipv,
+                                                        use_cache)
+        if result is not None:
+            return result, []
         
-        process = None
+        start = time.perf_counter()
         try:
-            # 启动引擎进程 - 使用更兼容的方式
-            startupinfo = None
-            creationflags = 0
-            
-            if sys.platform == 'win32':
-                # Windows下隐藏控制台窗口
-                startupinfo = subprocess.STARTUPINFO()
-                startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-                startupinfo.wShowWindow = subprocess.SW_HIDE
-                creationflags = CREATE_NO_WINDOW
-            
-            # 设置引擎工作目录为engine目录（重要！）
-            engine_dir = Path(self.engine_path).parent
-            
-            process = subprocess.Popen(
-                [self.engine_path],
-                stdin=subprocess.PIPE,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.STDOUT,  # 合并stderr到stdout
-                text=True,
-                bufsize=1,  # 行缓冲
-                cwd=str(engine_dir),
-                universal_newlines=True,
-                # 保持交互式环境，不隐藏窗口
-            )
-            
-            output_queue = queue.Queue()
-            
-            def read_output():
-                """持续读取引擎输出"""
-                while process.poll() is None:
-                    try:
-                        line = process.stdout.readline()
-                        if line:
-                            output_queue.put(line.rstrip('\n\r'))
-                    except:
-                        break
-            
-            # 启动输出读取线程
-            output_thread = threading.Thread(target=read_output, daemon=True)
-            output_thread.start()
-            
-            def send_command_and_collect(command, wait_time=5):
-                """发送命令并收集响应"""
-                # 发送命令
-                process.stdin.write(command + '\n')
-                process.stdin.flush()
-                
-                # 收集响应
-                responses = []
-                start_time = time.time()
-                
-                while time.time() - start_time < wait_time:
-                    try:
-                        line = output_queue.get(timeout=0.1)
-                        responses.append(line)
-                        
-                        # 如果收到bestmove，分析完成
-                        if line.startswith('bestmove'):
-                            break
-                            
-                    except queue.Empty:
-                        continue
-                
-                return responses
-            
-            # 等待引擎启动
-            time.sleep(0.2)
-            
-            # 清空启动消息
-            while True:
-                try:
-                    line = output_queue.get(timeout=0.1)
-                    if 'Pikafish' in line:
-                        break
-                except queue.Empty:
-                    break
-            
-            # 发送position命令
-            pos_responses = send_command_and_collect(f"position {fen}", 2)
-            
-            # 发送go depth命令
-            go_responses = send_command_and_collect(f"go depth {depth}", 15)
-            
-            # 汇总响应并解析
-            all_responses = pos_responses + go_responses
-            
-            info_depth_lines = [line for line in all_responses if line.startswith('info depth')]
-            bestmove_lines = [line for line in all_responses if line.startswith('bestmove')]
-            
-            if bestmove_lines:
-                bestmove_line = bestmove_lines[-1]
-                parts = bestmove_line.split()
-                best_move = parts[1] if len(parts) >= 2 else None
-                
-                print(f"✅ 交互式分析完成，最佳走法: {best_move}")
-                print(f"📊 分析深度: {len(info_depth_lines)} 层")
-                
-                # 显示分析过程（可选）
-                if info_depth_lines and len(info_depth_lines) > 2:
-                    print(f"📈 评分变化:")
-                    for line in info_depth_lines:
-                        if 'score cp' in line:
-                            try:
-                                cp_score = line.split('score cp')[1].split()[0]
-                                depth_num = line.split('depth')[1].split()[0]
-                                print(f"  深度{depth_num}: {cp_score}厘兵")
-                            except:
-                                pass
-                
-                return best_move
+            # 从常驻进程池借出一个已预热的引擎
+            pool = self.engine_pool or get_engine_pool(self.engine_path)
+            
+            def report_depth(info):
+                """逐层输出评分变化"""
+                if on_info:
+                    on_info(info)
+                if info.get('multipv', 1) != 1:
+                    return
+                if 'score_cp' in info:
+                    print(f"  深度{info['depth']}: {info['score_cp']}厘兵")
+                elif 'score_mate' in info:
+                    print(f"  深度{info['depth']}: {info['score_mate']}步杀")
+            
+            print(f"📈 评分变化:")
+            with pool.checkout(fen=fen) as engine:
+                all_responses = engine.analyze(fen, depth, on_info=report_depth,
+                                               movetime=movetime, nodes=nodes, multipv=multipv)
+            
+            result = self._finish_analysis(fen, side_to_move, rules_pos, all_responses,
+                                           time.perf_counter() - start, multipv)
+            if result.ok:
+                print(f"✅ 交互式分析完成，最佳走法: {result.bestmove}")
+                print(f"📊 分析深度: {result.depth} 层")
             else:
-                print("❌ 未找到最佳走法")
-                return "未找到最佳走法"
+                print(f"❌ {result.message}")
+            return result, all_responses
                 
-        except subprocess.TimeoutExpired:
-            print("引擎分析超时")
-            if process:
-                process.kill()
-            return "分析超时"
+        except EngineTimeout as e:
+            print(f"引擎分析超时: {e}")
+            return AnalysisResult.failure(AnalysisError.TIMEOUT, str(e), time.perf_counter() - start), []
         except Exception as e:
             print(f"引擎分析异常: {type(e).__name__}: {str(e)}")
             import traceback
             traceback.print_exc()
-            return f"引擎错误: {str(e)}"
-        finally:
-            # 清理进程
-            try:
-                if process and process.poll() is None:
-                    process.stdin.write("quit\n")
-                    process.stdin.flush()
-                    process.wait(timeout=3)
-            except:
-                if process:
-                    process.terminate()
+            return AnalysisResult.failure(AnalysisError.ENGINE_FAILURE, str(e), time.perf_counter() - start), []
     
-    def analyze_both_sides(self, fen, depth=8):
+    def analyze_both_sides(self, fen, depth=8, on_result=None, on_info=None, movetime=None, nodes=None,
+                           multipv=1):
         """
         同时分析红方和黑方的最佳走法
+        两方的搜索同时派发给进程池中的两个引擎，先完成的一方先返回
         参数:
             fen: 棋局的FEN格式  
             depth: 搜索深度
-        返回: {'red': 红方走法, 'black': 黑方走法}
+            on_result: 可选回调 on_result(side, result)，每方分析完成时立即调用，
+                       side为'red'或'black'，result为AnalysisResult
+            on_info: 可选回调 on_info(side, info)，搜索中每完成一层即调用
+            movetime: 每方的限时搜索（毫秒），两方并行，总耗时约为一个movetime
+            nodes: 每方的节点数限制
+            multipv: 每方的候选走法数，候选通过on_info回调的multipv序号区分
+        返回: {'red': 红方AnalysisResult, 'black': 黑方AnalysisResult}
         """
-        print(f"🔄 开始双方分析（深度: {depth}）...")
+        print(f"🔄 开始双方分析（{build_go_command(depth, movetime, nodes)}）...")
         
         result = {}
+        sides = {'red': ('w', "🔴 红方"), 'black': ('b', "⚫ 黑方")}
         
-        # 分析红方走法
-        print("🔴 分析红方...")
-        red_move = self.analyze_position(fen, 'w', depth)
-        result['red'] = red_move
-        print(f"🔴 红方走法: {red_move}")
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            futures = {}
+            for side, (side_to_move, _) in sides.items():
+                side_on_info = None
+                if on_info:
+                    side_on_info = lambda info, side=side: on_info(side, info)
+                future = executor.submit(self.analyze_position, fen, side_to_move, depth, side_on_info,
+                                         movetime, nodes, multipv)
+                futures[future] = side
+            for future in as_completed(futures):
+                side = futures[future]
+                side_result = future.result()
+                result[side] = side_result
+                print(f"{sides[side][1]}走法: {side_result}")
+                if on_result:
+                    on_result(side, side_result)
+        
+        return result
+    
+    def submit_both_sides(self, fen, depth=8, on_result=None, on_info=None, movetime=None, nodes=None,
+                          multipv=1):
+        """
+        在asyncio引擎服务上派发双方分析，立即返回
+        参数同 analyze_both_sides，回调在事件循环线程中调用
+        返回: concurrent.futures.Future，结果为 {'red': 红方AnalysisResult, 'black': 黑方AnalysisResult}；
+              新局面到来时调用 future.cancel()，两个引擎都会收到stop
+        """
+        if not self.engine_path or not os.path.exists(self.engine_path):
+            raise RuntimeError("引擎未就绪，请先下载Pikafish引擎")
+        if self.engine_service is None:
+            self.engine_service = AsyncEngineService(self.engine_path, options=self.engine_options)
+        return self.engine_service.submit(
+            self._analyze_both_sides_async(fen, depth, on_result, on_info, movetime, nodes, multipv))
+    
+    async def _analyze_both_sides_async(self, fen, depth, on_result, on_info, movetime, nodes, multipv):
+        """双方分析协程，被取消时两方的搜索一起停止"""
+        sides = {'red': ('w', "🔴 红方"), 'black': ('b', "⚫ 黑方")}
+        result = {}
         
-        # 分析黑方走法
-        print("⚫ 分析黑方...")
-        black_move = self.analyze_position(fen, 'b', depth)
-        result['black'] = black_move
-        print(f"⚫ 黑方走法: {black_move}")
+        async def analyse_side(side):
+            side_to_move, label = sides[side]
+            side_result, side_fen, rules_pos = self._prepare_analysis(fen, side_to_move, depth, movetime, nodes,
+                                                                      multipv)
+            if side_result is None:
+                side_on_info = None
+                if on_info:
+                    side_on_info = lambda info: on_info(side, info)
+                start = time.perf_counter()
+                try:
+                    async with self.engine_service.pool.checkout(fen=side_fen) as engine:
+                        lines = await engine.analyse(side_fen, depth, movetime, nodes, multipv,
+                                                     on_info=side_on_info)
+                    side_result = self._finish_analysis(side_fen, side_to_move, rules_pos, lines,
+                                                        time.perf_counter() - start, multipv)
+                except EngineTimeout as e:
+                    side_result = AnalysisResult.failure(AnalysisError.TIMEOUT, str(e), time.perf_counter() - start)
+                except Exception as e:
+                    print(f"引擎分析异常: {type(e).__name__}: {str(e)}")
+                    side_result = AnalysisResult.failure(AnalysisError.ENGINE_FAILURE, str(e),
+                                                         time.perf_counter() - start)
+            result[side] = side_result
+            print(f"{label}走法: {side_result}")
+            if on_result:
+                on_result(side, side_result)
         
+        await asyncio.gather(analyse_side('red'), analyse_side('black'))
         return result
     
+    def stop_engine_service(self):
+        """关闭asyncio引擎服务"""
+        if self.engine_service is not None:
+            self.engine_service.close()
+            self.engine_service = None
+    
+    def start_live_analysis(self, on_info=None):
+        """
+        启动红黑双方的持续分析引擎（各独占一个引擎进程）
+        参数:
+            on_info: 可选回调 on_info(side, fen, info)，每加深一层即调用；
+                fen 为该结果所属的局面，调用方据此丢弃已经过时的局面的结果
+        """
+        with self.live_lock:
+            if self.live_analyses:
+                return
+            if not self.engine_path or not os.path.exists(self.engine_path):
+                raise RuntimeError("引擎未就绪，请先下载Pikafish引擎")
+            
+            # 两个引擎同时搜索，平分CPU核心和置换表内存
+            options = default_engine_options(self.engine_path, engines=2)
+            options.update(self.engine_options)
+            live_analyses = {}
+            try:
+                for side in ('red', 'black'):
+                    side_on_info = None
+                    if on_info:
+                        side_on_info = lambda fen, info, side=side: on_info(side, fen, info)
+                    live_analyses[side] = LiveAnalysis(self.engine_path, options=options, on_info=side_on_info)
+            except Exception:
+                for live in live_analyses.values():
+                    live.close()
+                raise
+            # 两个引擎都启动后才发布，其他线程不会看到只有一方的字典
+            self.live_analyses = live_analyses
+        print("✓ 持续分析已启动")
+    
+    def live_update(self, fen):
+        """
+        向持续分析提交最新局面
+        同一局面返回目前搜得最深的结果，局面变化时重新开始搜索
+        返回: {'red': info或None, 'black': info或None}
+        """
+        live_analyses = self.live_analyses
+        if not live_analyses:
+            self.start_live_analysis()
+            live_analyses = self.live_analyses
+        if not live_analyses:
+            raise RuntimeError("持续分析已停止")
+        
+        position = fen.split()[0]
+        return {
+            'red': live_analyses['red'].update(f"{position} w"),
+            'black': live_analyses['black'].update(f"{position} b"),
+        }
+    
+    def stop_live_analysis(self):
+        """停止持续分析并关闭引擎"""
+        with self.live_lock:
+            live_analyses, self.live_analyses = self.live_analyses, None
+            if not live_analyses:
+                return
+            for live in live_analyses.values():
+                live.close()
+        print("持续分析已停止")
+    
     def format_move(self, move_uci, fen=None):
         """
         将UCI格式的走法转换为中文描述
-        例如: a3a4 -> 卒一进一
+        例如: h0g2 -> 马二进三
+        棋子和走棋方取自fen中起点上的棋子，没有fen时按红方走法、棋子记为"子"
         """
         if not move_uci or len(move_uci) < 4:
             return move_uci
         
         try:
             # 坐标映射
-            files = "abcdefghi"  # a-i 对应 1-9路
+            files = "abcdefghi"
             chinese_nums = "一二三四五六七八九"
             
             from_file = files.index(move_uci[0])
@@ -400,39 +622,29 @@ class ChineseChessAssistant:
             to_file = files.index(move_uci[2])
             to_rank = int(move_uci[3])
             
-            # 路数（列）转换
-            from_road = chinese_nums[from_file]
-            to_road = chinese_nums[to_file]
-            
-            # 根据行数判断是红方还是黑方棋子
-            is_red_move = from_rank >= 5  # 5-9行是红方区域
+            # 由起点上棋子的大小写判断是哪一方的走法
+            piece = parse_board(fen).get((from_file, from_rank)) if fen else None
+            piece_type = self._identify_piece_type(piece)
+            is_red_move = piece is None or piece.isupper()
             
-            # 尝试从FEN中识别棋子类型
-            piece_type = self._identify_piece_type(move_uci, fen)
-            
-            # 判断移动方向和距离
-            if from_file == to_file:
-                # 直行移动
-                if from_rank < to_rank:
-                    direction = "进"
-                    steps = to_rank - from_rank
-                else:
-                    direction = "退" 
-                    steps = from_rank - to_rank
-                step_chinese = chinese_nums[steps - 1] if steps <= 9 else str(steps)
-                move_desc = f"{piece_type}{from_road}{direction}{step_chinese}"
+            # 路数（列）转换：各自从己方右手边数起，红方用中文数字（a列为九路），黑方用阿拉伯数字（a列为1路）
+            if is_red_move:
+                from_road, to_road = chinese_nums[8 - from_file], chinese_nums[8 - to_file]
             else:
-                # 横移或斜移
-                if from_rank == to_rank:
-                    direction = "平"
-                    move_desc = f"{piece_type}{from_road}{direction}{to_road}"
-                else:
-                    # 斜移（如马、象）
-                    if from_rank < to_rank:
-                        direction = "进"
-                    else:
-                        direction = "退"
-                    move_desc = f"{piece_type}{from_road}{direction}{to_road}"
+                from_road, to_road = str(from_file + 1), str(to_file + 1)
+            
+            # 红方向行号增大的方向为进，黑方相反
+            direction = "进" if (to_rank > from_rank) == is_red_move else "退"
+            if from_rank == to_rank:
+                move_desc = f"{piece_type}{from_road}平{to_road}"
+            elif from_file == to_file:
+                # 直行记步数
+                steps = abs(to_rank - from_rank)
+                step_text = chinese_nums[steps - 1] if is_red_move else str(steps)
+                move_desc = f"{piece_type}{from_road}{direction}{step_text}"
+            else:
+                # 斜走（马、相、仕）记落点路数
+                move_desc = f"{piece_type}{from_road}{direction}{to_road}"
             
             # 完整描述
             coord_desc = f"{move_uci[0]}{move_uci[1]} -> {move_uci[2]}{move_uci[3]}"
@@ -444,75 +656,29 @@ class ChineseChessAssistant:
             # 如果转换失败，返回基本信息
             return f"{move_uci} (坐标: {move_uci[0]}{move_uci[1]} -> {move_uci[2]}{move_uci[3]})"
     
-    def _identify_piece_type(self, move_uci, fen):
-        """
-        根据FEN和移动位置识别棋子类型
-        """
-        if not fen:
-            return "子"  # 默认棋子名称
-        
-        try:
-            # 解析FEN获取棋盘状态
-            position_part = fen.split()[0]  # 只取位置部分
-            rows = position_part.split('/')
-            
-            # 确保有10行
-            if len(rows) != 10:
-                return "子"
-            
-            # 获取起始位置的棋子
-            from_file = ord(move_uci[0]) - ord('a')  # a=0, b=1, ...
-            from_rank = int(move_uci[1])
-            
-            # 从FEN中解析该位置的棋子
-            piece = self._get_piece_at_position(rows, from_rank, from_file)
-            
-            # 棋子类型映射
-            piece_names = {
-                # 黑方（小写）
-                'r': '車', 'n': '馬', 'b': '象', 'a': '士', 'k': '将',
-                'c': '炮', 'p': '卒',
-                # 红方（大写）
-                'R': '车', 'N': '马', 'B': '相', 'A': '仕', 'K': '帅',
-                'C': '砲', 'P': '兵'
-            }
-            
-            return piece_names.get(piece, '子')
-            
-        except Exception as e:
-            return "子"
-    
-    def _get_piece_at_position(self, rows, rank, file):
+    def _identify_piece_type(self, piece):
         """
-        从FEN行中获取指定位置的棋子
+        FEN棋子字母转换为中文棋子名称
         """
-        try:
-            if rank < 0 or rank >= len(rows):
-                return None
-                
-            row = rows[rank]
-            col = 0
-            
-            for char in row:
-                if char.isdigit():
-                    # 数字表示空格数
-                    col += int(char)
-                else:
-                    # 字母表示棋子
-                    if col == file:
-                        return char
-                    col += 1
-                    
-            return None
-        except:
-            return None
+        piece_names = {
+            # 黑方（小写）
+            'r': '車', 'n': '馬', 'b': '象', 'a': '士', 'k': '将',
+            'c': '炮', 'p': '卒',
+            # 红方（大写）
+            'R': '车', 'N': '马', 'B': '相', 'A': '仕', 'K': '帅',
+            'C': '砲', 'P': '兵'
+        }
+        return piece_names.get(piece, '子')  # 未知棋子记为"子"
     
-    def display_suggestion(self, move):
+    def display_suggestion(self, result, fen=None):
         """
         显示走法建议
         """
         print("\n" + "="*50)
-        print(f"建议走法: {self.format_move(move)}")
+        if result.ok:
+            print(f"建议走法: {self.format_move(result.bestmove, fen)}")
+        else:
+            print(f"分析失败: {result.message}")
         print("="*50 + "\n")
     
     def run(self):
@@ -546,23 +712,19 @@ class ChineseChessAssistant:
                             x, y, w, h = board_region
                             board_image = screen[y:y+h, x:x+w]
                             
-                            # 保存截图用于调试
-                            cv2.imwrite("debug_board.png", board_image)
-                            print("棋盘截图已保存到 debug_board.png")
-                            
                             # 识别棋子
                             print("正在识别棋局...")
                             fen = self.recognize_pieces(board_image)
                             
-                            # 如果局面发生变化，进行分析
-                            if fen != self.current_fen:
+                            # 识别失败的帧直接跳过；局面发生变化时进行分析
+                            if fen and fen != self.current_fen:
                                 self.current_fen = fen
                                 print(f"当前局面 FEN: {fen}")
                                 
                                 # 分析局面
                                 print("正在分析...")
-                                best_move = self.analyze_position(fen)
-                                self.display_suggestion(best_move)
+                                result = self.analyze_position(fen)
+                                self.display_suggestion(result, fen)
                         else:
                             print("未检测到棋盘")
                         
@@ -586,11 +748,20 @@ class ChineseChessAssistant:
     def stop(self):
         """停止程序"""
         print("\n正在退出...")
+        self.debug_sink.flush()
         os._exit(0)
 
 
 def main():
-    assistant = ChineseChessAssistant()
+    import argparse
+    
+    parser = argparse.ArgumentParser(description='中国象棋辅助程序')
+    parser.add_argument('--debug-images', default='off',
+                        help='保存调试图像到 debug_images 目录: off（默认）、failures（只保存识别失败的帧）、'
+                             'every:N（每N帧保存一帧）')
+    args = parser.parse_args()
+    
+    assistant = ChineseChessAssistant(debug_images=args.debug_images)
     assistant.run()
 
 
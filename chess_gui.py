@@ -23,6 +23,10 @@ sys.path.insert(0, str(project_root))
 # 导入项目模块
 from cchess_deep_recognizer import CChessDeepRecognizer
 from chess_assistant import ChineseChessAssistant
+from pikafish_engine import fit_movetime
+
+# 引擎搜索模式
+SEARCH_MODES = ["固定深度", "限时", "限节点", "适应截图间隔"]
 
 
 class ChessGUI:
@@ -31,49 +35,93 @@ class ChessGUI:
         self.root.title("中国象棋识别助手 - 简洁版")
         self.root.geometry("900x700")
         self.root.resizable(True, True)
+        self.start_time = time.perf_counter()  # 统计显示窗口和首次识别的耗时
+        self.first_recognition_reported = False
+        self.closing = False
         
         # 初始化变量
         self.current_image_path = None
         self.current_fen = None
         self.recognizer = None
         self.assistant = None
+        self.side_results = {'red': None, 'black': None}  # 双方分析结果 (走法, 说明)
+        self.side_progress = {'red': {}, 'black': {}}  # 双方搜索中的最新结果 {multipv序号: info}
+        self.pending_analysis = None  # 进行中的双方分析（concurrent.futures.Future），新局面到来时取消
+        self.analysis_generation = 0  # 双方分析的序号，回调只处理最新一次分析的结果
         
         # 自动截图相关变量
         self.auto_capture_running = False
         self.auto_capture_thread = None
         self.capture_interval = tk.DoubleVar(value=1.0)  # 默认1秒间隔
         self.engine_depth = tk.IntVar(value=8)  # 默认搜索深度8
+        self.search_mode = tk.StringVar(value=SEARCH_MODES[0])  # 搜索模式
+        self.engine_movetime = tk.IntVar(value=1000)  # 限时模式的搜索时间（毫秒）
+        self.engine_nodes = tk.IntVar(value=1000000)  # 限节点模式的节点数
+        self.engine_multipv = tk.IntVar(value=1)  # 每方显示的候选走法数（MultiPV）
         self.auto_analyze = tk.BooleanVar(value=True)  # 是否自动分析
+        self.live_analysis = tk.BooleanVar(value=False)  # 自动截图时是否持续分析
+        self.live_fen = None  # 持续分析中的局面
+        self.live_pending = None  # 等待持续分析工作线程处理的最新局面
+        self.live_worker_running = False
+        self.live_lock = threading.Lock()
         
-        # 初始化识别器
-        self.init_recognizers()
-        
-        # 创建界面
+        # 先创建界面，识别模型和引擎在后台加载，就绪后启用对应按钮
         self.create_widgets()
+        self.init_recognizers()
+        self.root.after_idle(self.report_window_shown)
         
     def init_recognizers(self):
-        """初始化识别器"""
+        """在后台初始化识别器和引擎，不阻塞窗口显示"""
+        try:
+            # 两个模型在后台线程并行加载，加载完成后回到主线程启用识别按钮
+            self.log_message("正在后台加载深度学习识别器...")
+            # 自动截图时棋盘位置基本不变，开启跟踪模式沿用上一帧的棋盘位置
+            recognizer = CChessDeepRecognizer(load_in_background=True, track_board=True)
+            recognizer.ready.add_done_callback(
+                lambda future: self.root.after(0, self.on_recognizer_ready, recognizer, future))
+        except Exception as e:
+            self.log_message(f"✗ 识别器初始化失败: {e}")
+        
+        threading.Thread(target=self.init_assistant, daemon=True).start()
+    
+    def on_recognizer_ready(self, recognizer, future):
+        """识别模型加载完成（主线程）"""
+        if future.exception() is None and future.result():
+            self.recognizer = recognizer
+            elapsed = time.perf_counter() - self.start_time
+            self.log_message(f"✓ 深度学习识别器初始化成功（模型加载 {recognizer.load_time:.2f} 秒，距启动 {elapsed:.2f} 秒）")
+            self.auto_capture_btn.config(state="normal")
+            if self.current_image_path:
+                self.recognize_btn.config(state="normal")
+        else:
+            self.log_message("✗ 深度学习识别器初始化失败，请检查模型文件")
+    
+    def init_assistant(self):
+        """初始化象棋助手（用于引擎分析，后台线程）"""
         try:
-            # 初始化深度学习识别器
-            self.log_message("正在初始化深度学习识别器...")
-            self.recognizer = CChessDeepRecognizer()
-            
-            if self.recognizer.pose_model and self.recognizer.classifier_model:
-                self.log_message("✓ 深度学习识别器初始化成功")
-            else:
-                self.log_message("✗ 深度学习识别器初始化失败")
-                self.recognizer = None
-            
-            # 初始化象棋助手（用于引擎分析）
             self.log_message("正在初始化引擎...")
-            self.assistant = ChineseChessAssistant()
-            if self.assistant.engine_path:
+            # 界面自带识别器，助手只负责引擎分析
+            assistant = ChineseChessAssistant(use_async_engine=True, load_detector=False)
+            if self.closing:
+                assistant.stop_engine_service()
+                return
+            self.assistant = assistant
+            if assistant.engine_path:
                 self.log_message("✓ Pikafish引擎初始化成功")
             else:
                 self.log_message("✗ Pikafish引擎未找到")
-                
         except Exception as e:
-            self.log_message(f"✗ 初始化失败: {e}")
+            self.log_message(f"✗ 引擎初始化失败: {e}")
+    
+    def report_window_shown(self):
+        """记录从启动到窗口显示的耗时"""
+        self.log_message(f"🪟 窗口已显示，距启动 {time.perf_counter() - self.start_time:.2f} 秒")
+    
+    def report_first_recognition(self):
+        """记录从启动到第一次识别成功的耗时"""
+        if not self.first_recognition_reported:
+            self.first_recognition_reported = True
+            self.log_message(f"⏱ 首次识别完成，距启动 {time.perf_counter() - self.start_time:.2f} 秒")
     
     def create_widgets(self):
         """创建界面组件"""
@@ -120,7 +168,8 @@ class ChessGUI:
         auto_btn_frame = ttk.Frame(file_frame)
         auto_btn_frame.grid(row=1, column=2, padx=(10, 0), pady=(10, 0))
         
-        self.auto_capture_btn = ttk.Button(auto_btn_frame, text="▶️ 开始自动截图", command=self.toggle_auto_capture)
+        self.auto_capture_btn = ttk.Button(auto_btn_frame, text="▶️ 开始自动截图", command=self.toggle_auto_capture,
+                                           state="disabled")
         self.auto_capture_btn.grid(row=0, column=0)
         
         ttk.Button(auto_btn_frame, text="📸 测试截图", command=self.test_single_capture).grid(row=0, column=1, padx=(5, 0))
@@ -144,6 +193,25 @@ class ChessGUI:
         self.engine_depth.trace('w', self.update_depth_display)
         
         ttk.Checkbutton(engine_frame, text="自动分析", variable=self.auto_analyze).grid(row=0, column=2, padx=(20, 0))
+        ttk.Checkbutton(engine_frame, text="持续分析", variable=self.live_analysis).grid(row=0, column=3, padx=(10, 0))
+        
+        # 搜索模式：固定深度 / 限时 / 限节点 / 适应截图间隔
+        ttk.Label(engine_frame, text="搜索模式:").grid(row=1, column=0, sticky=tk.W, pady=(10, 0))
+        
+        mode_frame = ttk.Frame(engine_frame)
+        mode_frame.grid(row=1, column=1, columnspan=2, sticky=(tk.W, tk.E), padx=(10, 0), pady=(10, 0))
+        
+        ttk.Combobox(mode_frame, textvariable=self.search_mode, values=SEARCH_MODES,
+                     state="readonly", width=12).grid(row=0, column=0)
+        ttk.Label(mode_frame, text="时间(毫秒):").grid(row=0, column=1, padx=(10, 0))
+        ttk.Spinbox(mode_frame, from_=100, to=30000, increment=100, textvariable=self.engine_movetime,
+                    width=7).grid(row=0, column=2, padx=(5, 0))
+        ttk.Label(mode_frame, text="节点数:").grid(row=0, column=3, padx=(10, 0))
+        ttk.Spinbox(mode_frame, from_=10000, to=100000000, increment=100000, textvariable=self.engine_nodes,
+                    width=10).grid(row=0, column=4, padx=(5, 0))
+        ttk.Label(mode_frame, text="候选数:").grid(row=0, column=5, padx=(10, 0))
+        ttk.Spinbox(mode_frame, from_=1, to=5, increment=1, textvariable=self.engine_multipv,
+                    width=3).grid(row=0, column=6, padx=(5, 0))
         
         # 3. 结果显示区域（全宽，无棋盘状态）
         result_frame = ttk.LabelFrame(main_frame, text="识别结果与分析", padding="5")
@@ -180,20 +248,13 @@ class ChessGUI:
         self.log_message("中国象棋识别助手 - 简洁版已启动")
         self.log_message("=" * 50)
         
-        if self.recognizer:
-            self.log_message("✓ 深度学习识别器已就绪")
-        else:
-            self.log_message("✗ 深度学习识别器未就绪，请检查模型文件")
-            
-        if self.assistant and self.assistant.engine_path:
-            self.log_message("✓ Pikafish引擎已就绪")
-        else:
-            self.log_message("✗ Pikafish引擎未就绪")
-            
+        self.log_message("⏳ 识别模型和引擎正在后台加载，就绪后自动启用识别按钮")
         self.log_message("=" * 50)
         self.log_message("✨ 增强功能:")
         self.log_message("- 自动截图：1-10秒间隔可调，实时识别")
         self.log_message("- 引擎深度：1-15级搜索深度，精度可调")  
+        self.log_message("- 搜索模式：固定深度、限时、限节点或适应截图间隔，延迟可控")
+        self.log_message("- 持续分析：局面停留越久分析越深，换局面时自动重新搜索")
         self.log_message("- 双方分析：红黑双方最佳走法同时显示")
         self.log_message("- 交互式引擎：获得完整分析过程和评分")
         self.log_message("💡 提示：点击'开始自动截图'后观察日志变化")
@@ -237,7 +298,8 @@ class ChessGUI:
         if filename:
             self.current_image_path = filename
             self.file_path_var.set(f"已选择: {Path(filename).name}")
-            self.recognize_btn.config(state="normal")
+            if self.recognizer:
+                self.recognize_btn.config(state="normal")
             self.log_message(f"已选择图片: {filename}")
     
     def toggle_auto_capture(self):
@@ -280,8 +342,9 @@ class ChessGUI:
             
             self.log_message("开始自动截图模式")
             self.log_message(f"截图间隔: {self.capture_interval.get():.1f}秒")
-            self.log_message(f"引擎深度: {self.engine_depth.get()}")
+            self.log_message(f"搜索模式: {self.describe_search_limits(self.get_search_limits())}")
             self.log_message(f"自动分析: {'开启' if self.auto_analyze.get() else '关闭'}")
+            self.log_message(f"持续分析: {'开启' if self.live_analysis.get() else '关闭'}")
             
             # 启动自动截图线程
             self.log_message("正在启动自动截图线程...")
@@ -302,7 +365,12 @@ class ChessGUI:
         self.root.title("中国象棋识别助手 - 简洁版")
         
         # 重新启用控件
-        self.recognize_btn.config(state="normal" if self.current_image_path else "disabled")
+        self.recognize_btn.config(state="normal" if self.current_image_path and self.recognizer else "disabled")
+        
+        # 停止持续分析，释放引擎
+        if self.assistant and self.assistant.live_analyses:
+            self.live_fen = None
+            threading.Thread(target=self.assistant.stop_live_analysis, daemon=True).start()
         
         self.log_message("⏹️ 已停止自动截图模式")
     
@@ -328,6 +396,7 @@ class ChessGUI:
                 self.log_message("🔍 开始测试识别...")
                 fen = self.recognizer.recognize(screenshot_cv)
                 if fen:
+                    self.report_first_recognition()
                     self.log_message(f"✅ 识别测试成功")
                     self.log_message(f"识别结果: {fen.strip()}")
                 else:
@@ -358,13 +427,8 @@ class ChessGUI:
                 screenshot_cv = cv2.cvtColor(np.array(screenshot), cv2.COLOR_RGB2BGR)
                 self.log_message(f"✓ 格式转换完成，OpenCV尺寸: {screenshot_cv.shape}")
                 
-                # 保存临时截图
-                temp_path = "temp_screenshot.png"
-                cv2.imwrite(temp_path, screenshot_cv)
-                self.log_message(f"✓ 临时文件已保存: {temp_path}")
-                
-                # 在主线程中处理识别
-                self.root.after(0, self.process_auto_capture, screenshot_cv, temp_path)
+                # 在主线程中处理识别（调试图像由识别器的DebugSink按设置保存）
+                self.root.after(0, self.process_auto_capture, screenshot_cv)
                 
                 # 等待指定间隔
                 interval = self.capture_interval.get()
@@ -381,7 +445,7 @@ class ChessGUI:
         
         self.log_message("📸 自动截图循环结束")
     
-    def process_auto_capture(self, image, temp_path):
+    def process_auto_capture(self, image):
         """处理自动截图的识别"""
         try:
             # 使用深度学习识别
@@ -389,6 +453,7 @@ class ChessGUI:
             fen = self.recognizer.recognize(image)
             
             if fen:
+                self.report_first_recognition()
                 fen = fen.strip()
                 self.current_fen = fen
                 self.log_message("✓ 识别成功")
@@ -398,21 +463,21 @@ class ChessGUI:
                 
                 # 如果开启自动分析
                 if self.auto_analyze.get() and self.assistant and self.assistant.engine_path:
-                    self.log_message("开始自动引擎分析（红/黑双方）...")
-                    # 在后台线程中进行分析
-                    threading.Thread(target=self.run_both_sides_analysis, daemon=True).start()
+                    if self.live_analysis.get():
+                        # 持续分析：局面不变时直接取目前最深的结果
+                        self.submit_live_analysis(fen)
+                    else:
+                        self.log_message("开始自动引擎分析（红/黑双方）...")
+                        # 派发到异步引擎服务，上一帧未完成的分析会被取消
+                        self.run_both_sides_analysis()
             else:
-                self.log_message("✗ 截图识别失败，未检测到有效棋盘")
+                if self.recognizer.last_problems:
+                    self.log_message(f"✗ 识别结果不合法，已丢弃: {'；'.join(self.recognizer.last_problems)}")
+                else:
+                    self.log_message("✗ 截图识别失败，未检测到有效棋盘")
                 
         except Exception as e:
             self.log_message(f"✗ 处理截图出错: {e}")
-        finally:
-            # 清理临时文件
-            try:
-                if os.path.exists(temp_path):
-                    os.remove(temp_path)
-            except:
-                pass
     
     def start_recognition(self):
         """开始识别（在后台线程中运行）"""
@@ -447,11 +512,13 @@ class ChessGUI:
             
             self.log_message(f"图片尺寸: {image.shape[1]}x{image.shape[0]}")
             
-            # 使用深度学习识别
+            # 使用深度学习识别（图片文件与屏幕截图无关，不沿用截图的棋盘位置）
             self.log_message("正在进行深度学习识别...")
+            self.recognizer.reset_tracking()
             fen = self.recognizer.recognize(image)
             
             if fen:
+                self.report_first_recognition()
                 self.current_fen = fen.strip()
                 self.log_message("✓ 识别成功！")
                 self.log_message(f"FEN: {self.current_fen}")
@@ -464,7 +531,10 @@ class ChessGUI:
                     self.log_message("开始自动引擎分析（红/黑双方）...")
                     self.run_both_sides_analysis()
             else:
-                self.log_message("✗ 识别失败")
+                if self.recognizer.last_problems:
+                    self.log_message(f"✗ 识别结果不合法: {'；'.join(self.recognizer.last_problems)}")
+                else:
+                    self.log_message("✗ 识别失败")
                 self.root.after(0, self.recognition_failed)
                 
         except Exception as e:
@@ -511,33 +581,77 @@ class ChessGUI:
         self.analysis_text.delete(1.0, tk.END)
         self.analysis_text.config(state="disabled")
         
-        # 在后台线程中运行分析
-        thread = threading.Thread(target=self.run_both_sides_analysis, daemon=True)
-        thread.start()
+        # 派发到异步引擎服务，不阻塞界面
+        self.run_both_sides_analysis()
     
     def run_both_sides_analysis(self):
-        """同时分析红方和黑方的最佳走法（后台线程）"""
+        """
+        派发红黑双方分析到异步引擎服务（立即返回），每方完成后立即更新显示
+        上一次分析尚未完成时先取消，引擎收到stop后立即开始新局面
+        """
         try:
-            depth = self.engine_depth.get()
-            self.log_message(f"开始双方引擎分析（深度: {depth}）...")
+            if self.pending_analysis is not None and not self.pending_analysis.done():
+                self.pending_analysis.cancel()
+                self.log_message("⏭️ 新局面到达，已停止上一帧的分析")
             
-            # 使用analyze_both_sides方法
-            both_moves = self.assistant.analyze_both_sides(self.current_fen, depth)
+            limits = self.get_search_limits()
+            limits_desc = self.describe_search_limits(limits)
+            fen = self.current_fen
+            self.log_message(f"开始双方引擎分析（{limits_desc}）...")
             
-            red_move = both_moves.get('red', '未找到最佳走法')
-            black_move = both_moves.get('black', '未找到最佳走法')
+            # 取消要等事件循环处理，上一帧的回调仍可能到达，按序号丢弃
+            self.analysis_generation += 1
+            generation = self.analysis_generation
             
-            if red_move != "未找到最佳走法" or black_move != "未找到最佳走法":
-                self.log_message(f"✓ 双方分析完成（深度{depth}）")
-                self.log_message(f"红方最佳走法: {red_move}")
-                self.log_message(f"黑方最佳走法: {black_move}")
-                
-                # 格式化走法
-                red_desc = self.assistant.format_move(red_move, self.current_fen) if red_move != "未找到最佳走法" else "未找到最佳走法"
-                black_desc = self.assistant.format_move(black_move, self.current_fen) if black_move != "未找到最佳走法" else "未找到最佳走法"
-                
-                # 在主线程中更新GUI
-                self.root.after(0, self.update_both_sides_results, red_move, red_desc, black_move, black_desc)
+            # 清空上一次的双方结果，显示"分析中"
+            self.root.after(0, self.reset_side_results)
+            
+            def on_side_done(side, result):
+                """单方分析完成回调（分析线程中调用）"""
+                if generation != self.analysis_generation:
+                    return
+                side_name = "红方" if side == 'red' else "黑方"
+                if result.ok:
+                    self.log_message(f"{side_name}最佳走法: {result.bestmove}（深度{result.depth}，"
+                                     f"用时{result.elapsed:.2f}秒）")
+                    desc = self.assistant.format_move(result.bestmove, fen)
+                else:
+                    self.log_message(f"{side_name}分析失败: {result.message}")
+                    desc = result.message
+                self.root.after(0, self.update_side_result, side, result, desc, generation)
+            
+            def on_side_info(side, info):
+                """单方每完成一层搜索的回调，先显示当前最好的走法再逐层细化"""
+                if generation == self.analysis_generation:
+                    self.root.after(0, self.update_side_progress, side, info, generation)
+            
+            def on_finished(future):
+                """双方分析结束回调（事件循环线程中调用）"""
+                if future.cancelled() or generation != self.analysis_generation:
+                    return
+                if future.exception() is not None:
+                    self.log_message(f"✗ 双方分析出错: {future.exception()}")
+                    self.root.after(0, self.analysis_failed)
+                    return
+                self.report_both_sides(future.result(), limits_desc)
+            
+            # 两方在同一个事件循环中并行搜索
+            self.pending_analysis = self.assistant.submit_both_sides(fen, on_result=on_side_done,
+                                                                     on_info=on_side_info, **limits)
+            self.pending_analysis.add_done_callback(on_finished)
+            
+        except Exception as e:
+            self.log_message(f"✗ 双方分析出错: {e}")
+            self.root.after(0, self.analysis_failed)
+    
+    def report_both_sides(self, both_moves, limits_desc):
+        """输出双方分析的汇总信息"""
+        try:
+            if any(result.ok for result in both_moves.values()):
+                self.log_message(f"✓ 双方分析完成（{limits_desc}）")
+                stats = self.assistant.analysis_cache.stats()
+                self.log_message(f"分析缓存: 命中{stats['hits']}次 / 未命中{stats['misses']}次"
+                                 f"（命中率{stats['hit_rate']:.0%}，{stats['size']}/{stats['max_size']}）")
             else:
                 self.log_message("✗ 双方分析均失败")
                 self.root.after(0, self.analysis_failed)
@@ -546,32 +660,158 @@ class ChessGUI:
             self.log_message(f"✗ 双方分析出错: {e}")
             self.root.after(0, self.analysis_failed)
     
-    def update_both_sides_results(self, red_move, red_desc, black_move, black_desc):
-        """更新双方分析结果显示"""
-        result_text = "═══ 双方最佳走法分析 ═══\n\n"
-        
-        # 红方分析结果
-        result_text += "🔴 红方（帅方）:\n"
-        if red_move != "未找到最佳走法":
-            result_text += f"  走法: {red_move}\n"
-            result_text += f"  说明: {red_desc.split(' | ')[1] if ' | ' in red_desc else red_desc}\n"
-            result_text += f"  坐标: {red_move[:2]} → {red_move[2:4]}\n"
+    def submit_live_analysis(self, fen):
+        """把局面交给持续分析工作线程；线程正忙时只保留最新的局面，不为每帧新开线程"""
+        with self.live_lock:
+            self.live_pending = fen
+            if self.live_worker_running:
+                return
+            self.live_worker_running = True
+        threading.Thread(target=self.live_worker, daemon=True).start()
+    
+    def live_worker(self):
+        """持续分析工作线程：依次处理最新提交的局面，处理完毕后退出"""
+        while True:
+            with self.live_lock:
+                fen, self.live_pending = self.live_pending, None
+                if fen is None:
+                    self.live_worker_running = False
+                    return
+            self.run_live_analysis(fen)
+    
+    def run_live_analysis(self, fen):
+        """持续分析（后台线程）：局面变化时重新搜索，局面不变时显示目前搜得最深的结果"""
+        try:
+            if not self.assistant.live_analyses:
+                self.log_message("正在启动持续分析引擎...")
+                self.assistant.start_live_analysis(on_info=self.on_live_info)
+            
+            changed = fen != self.live_fen
+            if changed:
+                self.live_fen = fen
+                self.root.after(0, self.reset_side_results)
+                self.log_message("局面变化，持续分析新局面...")
+            
+            results = self.assistant.live_update(fen)
+            for side, info in results.items():
+                if info:
+                    self.root.after(0, self.update_side_progress, side, info)
+            
+            if not changed:
+                depths = {side: (info['depth'] if info else 0) for side, info in results.items()}
+                self.log_message(f"局面未变化，持续分析深度: 红方{depths['red']} / 黑方{depths['black']}")
+                
+        except Exception as e:
+            self.log_message(f"✗ 持续分析出错: {e}")
+    
+    def on_live_info(self, side, fen, info):
+        """持续分析每加深一层的回调（引擎输出线程中调用）"""
+        self.root.after(0, self.update_live_progress, side, fen, info)
+    
+    def update_live_progress(self, side, fen, info):
+        """更新持续分析的阶段结果（主线程），忽略已经不是当前局面的结果"""
+        if self.live_fen is None or fen.split()[0] != self.live_fen.split()[0]:
+            return
+        self.update_side_progress(side, info)
+    
+    def get_search_limits(self):
+        """根据搜索模式返回 analyze_both_sides 的搜索限制参数"""
+        limits = {'depth': self.engine_depth.get(), 'multipv': self.engine_multipv.get()}
+        mode = self.search_mode.get()
+        if mode == "限时":
+            limits.update(depth=None, movetime=self.engine_movetime.get())
+        elif mode == "限节点":
+            limits.update(depth=None, nodes=self.engine_nodes.get())
+        elif mode == "适应截图间隔":
+            # 两方并行搜索，每方都可以用满一个间隔内的搜索预算
+            limits.update(depth=None, movetime=fit_movetime(self.capture_interval.get()))
+        return limits
+    
+    def describe_search_limits(self, limits):
+        """搜索限制的中文描述"""
+        if limits.get('movetime'):
+            desc = f"限时 {limits['movetime']} 毫秒"
+        elif limits.get('nodes'):
+            desc = f"限 {limits['nodes']} 节点"
         else:
-            result_text += "  暂无可行走法\n"
-        
-        result_text += "\n"
+            desc = f"深度 {limits['depth']}"
+        if limits.get('multipv', 1) > 1:
+            desc += f"，{limits['multipv']} 个候选"
+        return desc
+    
+    def reset_side_results(self):
+        """重置双方分析结果"""
+        self.side_results = {'red': None, 'black': None}
+        self.side_progress = {'red': {}, 'black': {}}
+        self.render_side_results()
+    
+    def update_side_progress(self, side, info, generation=None):
+        """
+        更新单方搜索中的阶段结果（主线程），按MultiPV序号分别记录
+        generation 不是最新一次双方分析的序号时忽略（上一帧迟到的结果）
+        """
+        if generation is not None and generation != self.analysis_generation:
+            return
+        if self.side_results.get(side) is not None:
+            return  # 最终结果已显示，忽略迟到的中间结果
+        self.side_progress[side][info.get('multipv', 1)] = info
+        self.render_side_results()
+    
+    def update_side_result(self, side, result, desc, generation=None):
+        """更新单方分析结果（主线程），result为AnalysisResult，过时的结果忽略"""
+        if generation is not None and generation != self.analysis_generation:
+            return
+        self.side_results[side] = (result, desc)
+        self.render_side_results()
         
-        # 黑方分析结果
-        result_text += "⚫ 黑方（将方）:\n"
-        if black_move != "未找到最佳走法":
-            result_text += f"  走法: {black_move}\n"
-            result_text += f"  说明: {black_desc.split(' | ')[1] if ' | ' in black_desc else black_desc}\n"
-            result_text += f"  坐标: {black_move[:2]} → {black_move[2:4]}\n"
-        else:
-            result_text += "  暂无可行走法\n"
+        # 双方都完成后重新启用分析按钮（如果不在自动截图模式）
+        if all(self.side_results.values()) and not self.auto_capture_running:
+            self.analyze_btn.config(state="normal")
+    
+    def format_score(self, info):
+        """info中评分的中文描述"""
+        if 'score_mate' in info:
+            return f"{info['score_mate']}步杀"
+        return f"{info.get('score_cp', 0)}厘兵"
+    
+    def render_side_results(self):
+        """根据当前双方结果刷新显示"""
+        result_text = "═══ 双方最佳走法分析 ═══\n\n"
         
-        result_text += "\n"
-        result_text += f"搜索深度: {self.engine_depth.get()}\n"
+        for side, title in (('red', "🔴 红方（帅方）:"), ('black', "⚫ 黑方（将方）:")):
+            result_text += f"{title}\n"
+            side_result = self.side_results.get(side)
+            progress = self.side_progress.get(side) or {}
+            best = progress.get(1)
+            if side_result is None and best and best.get('pv'):
+                result_text += f"  当前走法: {best['pv'][0]}（深度{best['depth']}，{self.format_score(best)}）\n"
+                result_text += "  分析中...\n"
+            elif side_result is None:
+                result_text += "  分析中...\n"
+            elif side_result[0].ok:
+                result, desc = side_result
+                move = result.bestmove
+                result_text += f"  走法: {move}\n"
+                result_text += f"  说明: {desc.split(' | ')[1] if ' | ' in desc else desc}\n"
+                result_text += f"  坐标: {move[:2]} → {move[2:4]}\n"
+                if result.score_mate is not None:
+                    result_text += f"  评分: {result.score_mate}步杀（深度{result.depth}）\n"
+                elif result.score_cp is not None:
+                    result_text += f"  评分: {result.score_cp}厘兵（深度{result.depth}）\n"
+            else:
+                result_text += f"  暂无可行走法（{side_result[0].message}）\n"
+            
+            # MultiPV候选走法
+            if len(progress) > 1:
+                result_text += "  候选走法:\n"
+                for index in sorted(progress):
+                    info = progress[index]
+                    if info.get('pv'):
+                        result_text += (f"    {index}. {info['pv'][0]}（{self.format_score(info)}）"
+                                        f" {' '.join(info['pv'][1:6])}\n")
+            result_text += "\n"
+        
+        result_text += f"搜索设置: {self.describe_search_limits(self.get_search_limits())}\n"
         result_text += "提示: 根据实际轮次选择对应走法\n\n"
         result_text += "💡 使用交互式引擎分析，获得完整的评分过程"
         
@@ -580,10 +820,6 @@ class ChessGUI:
         self.analysis_text.delete(1.0, tk.END)
         self.analysis_text.insert(1.0, result_text)
         self.analysis_text.config(state="disabled")
-        
-        # 重新启用分析按钮（如果不在自动截图模式）
-        if not self.auto_capture_running:
-            self.analyze_btn.config(state="normal")
     
     def analysis_failed(self):
         """分析失败处理"""
@@ -615,7 +851,11 @@ class ChessGUI:
         try:
             # 程序退出时停止自动截图
             def on_closing():
+                self.closing = True
                 self.auto_capture_running = False
+                if self.assistant:
+                    self.assistant.stop_live_analysis()
+                    self.assistant.stop_engine_service()
                 self.root.destroy()
             
             self.root.protocol("WM_DELETE_WINDOW", on_closing)
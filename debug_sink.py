@@ -0,0 +1,141 @@
+"""
+调试图像输出
+识别过程中的截图、对齐后的棋盘等调试图像统一交给 DebugSink，
+默认关闭；开启后按帧抽样或只保存识别失败的帧，PNG编码在后台线程进行，不占用识别时间
+"""
+
+import queue
+import threading
+from pathlib import Path
+
+import cv2
+
+DEBUG_MODES = ('off', 'every', 'failures')
+
+
+class DebugFrame:
+    """
+    一帧的调试图像
+
+    add 只保存引用；close 时如果这一帧需要保存，才复制图像交给后台线程编码，
+    因此在 close 之前调用方不能修改已添加的图像
+    """
+
+    def __init__(self, sink, index, wanted):
+        self.sink = sink
+        self.index = index
+        self.wanted = wanted  # 这一帧可能被保存（关闭或未抽中时为False，add不做任何事）
+        self.images = []
+        self.closed = False
+
+    def add(self, name, image):
+        """添加一张调试图像，name用于文件名"""
+        if self.wanted and image is not None:
+            self.images.append((name, image))
+
+    def close(self, failed=False):
+        """结束这一帧，failed 表示这一帧识别失败"""
+        if not self.closed:
+            self.closed = True
+            self.sink.submit(self, failed)
+            self.images = []
+
+
+class DebugSink:
+    """
+    调试图像输出（线程安全）
+
+    模式:
+        off: 不保存（默认）
+        every: 每 every 帧保存一帧（第1、every+1、2*every+1…帧）
+        failures: 只保存识别失败的帧
+
+    待写入的帧放入有界队列，由后台线程依次编码写入 directory；
+    队列已满时丢弃该帧（计入 dropped），不阻塞识别
+    """
+
+    def __init__(self, mode='off', every=10, directory='debug_images', max_pending=4):
+        """
+        Args:
+            mode: 'off'、'every' 或 'failures'
+            every: every 模式下的抽样间隔（帧数）
+            directory: 调试图像目录
+            max_pending: 等待写入的最大帧数
+        """
+        if mode not in DEBUG_MODES:
+            raise ValueError(f"未知的调试图像模式: {mode}（可选 {', '.join(DEBUG_MODES)}）")
+        self.mode = mode
+        self.every = max(1, int(every))
+        self.directory = Path(directory)
+        self.frames = 0
+        self.written = 0  # 已写入的帧数
+        self.dropped = 0  # 队列已满被丢弃的帧数
+        self._queue = queue.Queue(maxsize=max(1, int(max_pending)))
+        self._lock = threading.Lock()
+        self._writer = None
+
+    @classmethod
+    def from_spec(cls, spec, directory='debug_images'):
+        """
+        由命令行写法创建，如 "off"、"failures"、"every:10"
+
+        Raises:
+            ValueError: 写法不正确
+        """
+        mode, _, every = (spec or 'off').partition(':')
+        if mode != 'every' and every:
+            raise ValueError(f"调试图像模式 {mode} 不需要参数: {spec}")
+        try:
+            every = int(every) if every else 10
+        except ValueError:
+            raise ValueError(f"抽样间隔应为整数: {spec}") from None
+        return cls(mode, every, directory)
+
+    @property
+    def enabled(self):
+        return self.mode != 'off'
+
+    def frame(self):
+        """开始新的一帧"""
+        if not self.enabled:
+            return DebugFrame(self, 0, False)
+        with self._lock:
+            self.frames += 1
+            index = self.frames
+        wanted = self.mode == 'failures' or (index - 1) % self.every == 0
+        return DebugFrame(self, index, wanted)
+
+    def submit(self, frame, failed):
+        """DebugFrame.close 调用：需要保存时复制图像并放入写入队列"""
+        if not frame.images or (self.mode == 'failures' and not failed):
+            return
+        status = 'fail' if failed else 'ok'
+        item = [(f"{frame.index:06d}_{status}_{name}.png", image.copy()) for name, image in frame.images]
+        with self._lock:
+            if self._writer is None:
+                self.directory.mkdir(parents=True, exist_ok=True)
+                self._writer = threading.Thread(target=self._write_loop, name="debug-image-writer", daemon=True)
+                self._writer.start()
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+
+    def flush(self):
+        """等待队列中的图像全部写完"""
+        self._queue.join()
+
+    def _write_loop(self):
+        """后台线程：依次编码写入"""
+        while True:
+            item = self._queue.get()
+            try:
+                for filename, image in item:
+                    cv2.imwrite(str(self.directory / filename), image)
+                with self._lock:
+                    self.written += 1
+            except Exception as e:
+                print(f"⚠ 调试图像写入失败: {e}")
+            finally:
+                self._queue.task_done()
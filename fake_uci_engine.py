@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+用于测试的简易UCI引擎
+模拟Pikafish的输出格式，不做真正的搜索，便于在没有引擎的环境下测试引擎客户端
+
+用法:
+    python fake_uci_engine.py [--depth-delay 秒] [--crash-on-go] [--hang-on-go]
+"""
+
+import sys
+import time
+import argparse
+import threading
+
+MAX_DEPTH = 245
+
+# 各方的候选走法（按名次排列），MultiPV大于1时依次输出
+CANDIDATE_MOVES = {
+    'w': ['h2e2', 'b2e2', 'b0c2', 'h0g2', 'c3c4'],
+    'b': ['h7e7', 'b7e7', 'b9c7', 'h9g7', 'c6c5'],
+}
+
+output_lock = threading.Lock()
+
+
+def send(line):
+    with output_lock:
+        sys.stdout.write(line + '\n')
+        sys.stdout.flush()
+
+
+class FakeSearch(threading.Thread):
+    """
+    模拟一次搜索：逐层输出info行，满足搜索限制或收到stop后输出bestmove
+    """
+
+    def __init__(self, side, limits, depth_delay, multipv=1):
+        super().__init__(daemon=True)
+        self.side = side
+        self.multipv = multipv
+        self.limits = limits
+        self.depth_delay = depth_delay
+        self.stop_event = threading.Event()
+
+    def run(self):
+        limits = self.limits
+        moves = CANDIDATE_MOVES[self.side][:self.multipv]
+        best = moves[0]
+        start = time.monotonic()
+        depth = 0
+
+        while depth < limits.get('depth', MAX_DEPTH):
+            if self.stop_event.is_set():
+                break
+            if 'movetime' in limits and (time.monotonic() - start) * 1000 >= limits['movetime']:
+                break
+            if 'nodes' in limits and (depth + 1) * 1000 > limits['nodes']:
+                break
+            if self.depth_delay:
+                self.stop_event.wait(self.depth_delay)
+                if self.stop_event.is_set():
+                    break
+            depth += 1
+            elapsed = int((time.monotonic() - start) * 1000)
+            for index, move in enumerate(moves, 1):
+                send(f"info depth {depth} seldepth {depth + 2} multipv {index} score cp {10 + depth - 5 * (index - 1)} "
+                     f"nodes {depth * 1000} nps {depth * 100000} hashfull 0 tbhits 0 time {elapsed} pv {move}")
+
+        if limits.get('infinite'):
+            # go infinite 只在收到stop后才输出bestmove
+            self.stop_event.wait()
+        send(f"bestmove {best}")
+
+
+def parse_go(tokens):
+    """解析go命令的搜索限制"""
+    limits = {}
+    for i, token in enumerate(tokens):
+        if token in ('depth', 'movetime', 'nodes') and i + 1 < len(tokens):
+            limits[token] = int(tokens[i + 1])
+        elif token == 'infinite':
+            limits['infinite'] = True
+    if not limits:
+        limits['depth'] = 8
+    return limits
+
+
+def main():
+    parser = argparse.ArgumentParser(description='测试用UCI引擎')
+    parser.add_argument('--depth-delay', type=float, default=0.0, help='每层搜索的耗时（秒）')
+    parser.add_argument('--crash-on-go', action='store_true', help='收到go命令后直接退出，模拟引擎崩溃')
+    parser.add_argument('--hang-on-go', action='store_true', help='收到go命令后不再读取命令也不再输出，模拟引擎卡死')
+    args = parser.parse_args()
+
+    send("Pikafish (fake) by the Pikafish developers (see AUTHORS file)")
+
+    side = 'w'
+    options = {}
+    search = None
+    for raw in sys.stdin:
+        tokens = raw.split()
+        if not tokens:
+            continue
+        command = tokens[0]
+
+        if command == 'quit':
+            break
+        elif command == 'uci':
+            send("id name Pikafish (fake)")
+            send("id author the Pikafish developers")
+            send("option name Threads type spin default 1 min 1 max 1024")
+            send("option name Hash type spin default 16 min 1 max 33554432")
+            send("option name MultiPV type spin default 1 min 1 max 128")
+            send("option name EvalFile type string default pikafish.nnue")
+            send("uciok")
+        elif command == 'setoption':
+            # setoption name <名称> value <值>
+            if 'value' in tokens:
+                index = tokens.index('value')
+                options[' '.join(tokens[2:index])] = ' '.join(tokens[index + 1:])
+        elif command == 'isready':
+            send("readyok")
+        elif command == 'position':
+            # position fen <局面> <走棋方> [moves ...]
+            side = 'w'
+            if tokens[1:2] == ['fen'] and len(tokens) > 3:
+                side = tokens[3]
+            if 'moves' in tokens and (len(tokens) - tokens.index('moves') - 1) % 2:
+                side = 'b' if side == 'w' else 'w'
+        elif command == 'stop':
+            if search is not None:
+                search.stop_event.set()
+                search.join()
+                search = None
+        elif command == 'go':
+            if args.crash_on_go:
+                sys.exit(1)
+            if args.hang_on_go:
+                threading.Event().wait()
+            if options:
+                send("info string " + ' '.join(f"{k}={v}" for k, v in sorted(options.items())))
+            multipv = max(1, min(int(options.get('MultiPV', 1)), len(CANDIDATE_MOVES[side])))
+            search = FakeSearch(side, parse_go(tokens[1:]), args.depth_delay, multipv)
+            search.start()
+
+    if search is not None:
+        search.stop_event.set()
+
+
+if __name__ == "__main__":
+    main()
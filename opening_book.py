@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+开局库
+按局面哈希在排序好的磁盘表中二分查找，文件通过mmap映射，不需要整体读入内存；
+开局阶段命中开局库时直接给出走法，不再调用引擎
+
+文件格式（小端）:
+    头部 16 字节: 魔数 b"XQBK"、版本 u16、保留 u16、记录数 u32、保留 u32
+    记录 14 字节: 局面哈希 u64、走法 u16、评分 i16、权重 u16，按 (哈希, -权重) 排序
+
+用法:
+    python opening_book.py build -o engine/book.bin games.txt results.jsonl
+    python opening_book.py probe "rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w"
+"""
+
+import sys
+import json
+import mmap
+import struct
+import hashlib
+import argparse
+from pathlib import Path
+
+from analysis_cache import normalize_board
+from pikafish_engine import START_BOARD, FILES
+from xiangqi_rules import Position, is_legal_move
+
+MAGIC = b"XQBK"
+VERSION = 1
+HEADER = struct.Struct('<4sHHII')
+RECORD = struct.Struct('<QHhH')
+NO_SCORE = -32768  # 记录中没有评分（来自棋谱而非引擎分析）
+
+
+def position_key(fen, side_to_move=None):
+    """
+    局面哈希：规范化后的棋盘和走棋方的64位哈希
+
+    Args:
+        fen: FEN字符串（可带走棋方）
+        side_to_move: 走棋方，None时取FEN中的走棋方，缺省为红方
+    """
+    if side_to_move is None:
+        parts = fen.split()
+        side_to_move = parts[1] if len(parts) > 1 else 'w'
+    text = f"{normalize_board(fen)} {side_to_move}".encode()
+    return int.from_bytes(hashlib.blake2b(text, digest_size=8).digest(), 'little')
+
+
+def encode_move(move):
+    """UCI走法（如 "h2e2"）编码为 起点*90+终点"""
+    origin = int(move[1]) * 9 + FILES.index(move[0])
+    target = int(move[3]) * 9 + FILES.index(move[2])
+    return origin * 90 + target
+
+
+def decode_move(code):
+    """encode_move 的逆运算"""
+    origin, target = divmod(code, 90)
+    return f"{FILES[origin % 9]}{origin // 9}{FILES[target % 9]}{target // 9}"
+
+
+class BookEntry:
+    """开局库中的一个走法"""
+
+    __slots__ = ('move', 'weight', 'score')
+
+    def __init__(self, move, weight, score=None):
+        self.move = move
+        self.weight = weight  # 出现次数或人工设定的权重
+        self.score = score  # 引擎评分（厘兵），来自棋谱时为None
+
+    def __repr__(self):
+        return f"BookEntry({self.move!r}, weight={self.weight}, score={self.score!r})"
+
+
+class OpeningBook:
+    """
+    只读开局库（mmap映射，线程安全）
+
+    用法:
+        book = OpeningBook("engine/book.bin")
+        move = book.best_move(fen, 'w')   # 不在库中时返回None
+    """
+
+    def __init__(self, path):
+        self.path = str(path)
+        self._file = open(self.path, 'rb')
+        try:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, _, self.count, _ = HEADER.unpack_from(self._map, 0)
+        except Exception:
+            self._file.close()
+            raise
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"不是有效的开局库文件: {self.path}")
+        if len(self._map) < HEADER.size + self.count * RECORD.size:
+            self.close()
+            raise ValueError(f"开局库文件不完整: {self.path}")
+
+    def _key_at(self, index):
+        return RECORD.unpack_from(self._map, HEADER.size + index * RECORD.size)[0]
+
+    def lookup(self, fen, side_to_move=None):
+        """
+        查询局面的全部库内走法
+
+        Returns:
+            按权重从高到低排列的 BookEntry 列表，不在库中时为空列表
+        """
+        key = position_key(fen, side_to_move)
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+
+        entries = []
+        offset = HEADER.size + lo * RECORD.size
+        for _ in range(lo, self.count):
+            record_key, move, score, weight = RECORD.unpack_from(self._map, offset)
+            if record_key != key:
+                break
+            entries.append(BookEntry(decode_move(move), weight, None if score == NO_SCORE else score))
+            offset += RECORD.size
+        return entries
+
+    def best_move(self, fen, side_to_move=None):
+        """权重最高的库内走法，不在库中时返回None"""
+        entries = self.lookup(fen, side_to_move)
+        return entries[0] if entries else None
+
+    def __len__(self):
+        return self.count
+
+    def close(self):
+        """解除映射并关闭文件"""
+        if getattr(self, '_map', None) is not None:
+            self._map.close()
+            self._map = None
+        self._file.close()
+
+
+class BookBuilder:
+    """
+    开局库生成器：从棋谱走法序列或已有的分析结果汇总 (局面, 走法) 的权重
+    """
+
+    def __init__(self, max_ply=30):
+        """
+        Args:
+            max_ply: 每盘棋最多收录的回合数（半回合），之后不再算开局
+        """
+        self.max_ply = max_ply
+        self._entries = {}  # (局面哈希, 走法编码) -> [权重, 评分]
+
+    def add(self, fen, side_to_move, move, weight=1, score=None):
+        """收录一个局面的走法，重复收录时累加权重，评分取最新的"""
+        entry = self._entries.setdefault((position_key(fen, side_to_move), encode_move(move)), [0, NO_SCORE])
+        entry[0] = min(entry[0] + weight, 0xFFFF)
+        if score is not None:
+            entry[1] = max(-32767, min(32767, int(score)))
+
+    def add_game(self, moves, start_fen=START_BOARD, side_to_move='w'):
+        """
+        按走法序列收录一盘棋的开局部分
+        遇到不合法的走法（棋谱记录有误）即停止，该走法及其后的局面都不收录
+
+        Args:
+            moves: UCI走法列表，如 ["h2e2", "h9g7", ...]
+            start_fen: 起始局面，默认初始局面
+            side_to_move: 起始局面的走棋方
+        """
+        try:
+            position = Position.from_fen(start_fen, side_to_move)
+        except ValueError:
+            return
+        for move in moves[:self.max_ply]:
+            if not position.is_legal(move):
+                break  # 走法与局面不符，其后的局面不可信
+            self.add(position.fen(), position.side, move)
+            position.push(move)
+
+    def add_analysis(self, record):
+        """
+        收录一条分析结果（如 batch_analyze.py 输出的JSONL记录）
+
+        Args:
+            record: 至少包含 fen 和 bestmove 的字典，可带 score_cp
+        """
+        if not record.get('fen') or not record.get('bestmove'):
+            return
+        if not is_legal_move(record['fen'], record['bestmove']):
+            return
+        self.add(record['fen'], None, record['bestmove'], score=record.get('score_cp'))
+
+    def write(self, path):
+        """写出排序好的开局库文件，返回记录数"""
+        records = sorted(((key, move, score, weight) for (key, move), (weight, score) in self._entries.items()),
+                         key=lambda record: (record[0], -record[3]))
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, 0, len(records), 0))
+            for record in records:
+                f.write(RECORD.pack(*record))
+        return len(records)
+
+
+def build_book(inputs, output, max_ply=30):
+    """
+    从输入文件生成开局库
+    每行可以是一盘棋的UCI走法序列（空格分隔），也可以是分析结果的JSON记录
+
+    Returns:
+        写出的记录数
+    """
+    builder = BookBuilder(max_ply)
+    for path in inputs:
+        with open(path, encoding='utf-8') as f:
+            for raw in f:
+                line = raw.strip()
+                if not line or line.startswith('#'):
+                    continue
+                if line.startswith('{'):
+                    builder.add_analysis(json.loads(line))
+                else:
+                    builder.add_game(line.split())
+    return builder.write(output)
+
+
+def main(argv=None):
+    """主函数"""
+    parser = argparse.ArgumentParser(description='开局库工具')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    build = commands.add_parser('build', help='从棋谱或分析结果生成开局库')
+    build.add_argument('inputs', nargs='+', help='输入文件：每行一盘棋的走法序列，或一条分析结果JSON')
+    build.add_argument('-o', '--output', default='engine/book.bin', help='开局库文件（默认engine/book.bin）')
+    build.add_argument('--max-ply', type=int, default=30, help='每盘棋收录的半回合数（默认30）')
+
+    probe = commands.add_parser('probe', help='查询局面')
+    probe.add_argument('fen', help='带走棋方的FEN')
+    probe.add_argument('--book', default='engine/book.bin', help='开局库文件')
+
+    args = parser.parse_args(argv)
+    if args.command == 'build':
+        count = build_book(args.inputs, args.output, args.max_ply)
+        print(f"✓ 开局库已生成: {args.output}（{count} 条记录）")
+    else:
+        book = OpeningBook(args.book)
+        try:
+            entries = book.lookup(args.fen)
+        finally:
+            book.close()
+        if not entries:
+            print("不在开局库中")
+        for entry in entries:
+            score = f"，评分{entry.score}" if entry.score is not None else ""
+            print(f"{entry.move}  权重{entry.weight}{score}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
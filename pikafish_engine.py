@@ -0,0 +1,973 @@
+"""
+Pikafish引擎进程管理
+维护常驻的引擎进程池，避免每次分析都重新启动引擎、重新加载NNUE
+"""
+
+import os
+import sys
+import time
+import queue
+import atexit
+import threading
+import subprocess
+from pathlib import Path
+from contextlib import contextmanager
+
+from xiangqi_rules import Position
+
+
+# info行中取整数值的字段
+INFO_INT_FIELDS = frozenset(('depth', 'seldepth', 'multipv', 'nodes', 'nps', 'time', 'hashfull', 'tbhits',
+                             'currmovenumber'))
+SCORE_BOUNDS = {'lowerbound': 'lower', 'upperbound': 'upper'}
+
+
+def parse_info_line(line, require_pv=False):
+    """
+    解析引擎的info输出行（单次遍历）
+
+    例如 "info depth 6 seldepth 8 score cp 35 nodes 6000 nps 600000 pv h2e2 h9g7"
+    解析为 {'depth': 6, 'seldepth': 8, 'score_cp': 35, 'nodes': 6000,
+            'nps': 600000, 'pv': ['h2e2', 'h9g7']}
+
+    其他字段：score mate -> score_mate，lowerbound/upperbound -> bound ('lower'/'upper')，
+    wdl -> (胜, 和, 负)，currmove -> 字符串，string -> 其后的全部文本
+
+    Args:
+        line: 引擎输出行
+        require_pv: 只关心带主要变化的行；为True时不带pv的行（如currmove进度行）在分词前即被丢弃
+
+    Returns:
+        字段字典；不是info行（或require_pv时不带pv）时返回None
+    """
+    if require_pv and ' pv ' not in line:
+        return None
+    if not line.startswith('info'):
+        return None
+    tokens = line.split()
+    if tokens[0] != 'info':
+        return None
+
+    info = {}
+    count = len(tokens)
+    i = 1
+    try:
+        while i < count:
+            key = tokens[i]
+            if key in INFO_INT_FIELDS:
+                info[key] = int(tokens[i + 1])
+                i += 2
+            elif key == 'pv':
+                info['pv'] = tokens[i + 1:]
+                break
+            elif key == 'score':
+                info['score_' + tokens[i + 1]] = int(tokens[i + 2])  # score_cp 或 score_mate
+                i += 3
+                if i < count and tokens[i] in SCORE_BOUNDS:
+                    info['bound'] = SCORE_BOUNDS[tokens[i]]
+                    i += 1
+            elif key == 'wdl':
+                info['wdl'] = (int(tokens[i + 1]), int(tokens[i + 2]), int(tokens[i + 3]))
+                i += 4
+            elif key == 'currmove':
+                info['currmove'] = tokens[i + 1]
+                i += 2
+            elif key == 'string':
+                info['string'] = ' '.join(tokens[i + 1:])
+                break
+            else:
+                i += 1
+    except (IndexError, ValueError):
+        pass  # 行被截断或格式异常时保留已解析的字段
+    return info
+
+
+def extract_candidates(lines):
+    """
+    从一次搜索的输出行中取出MultiPV候选走法
+
+    每个multipv序号取最后一条带pv的info行（即该候选搜得最深的结果）
+
+    Returns:
+        按名次排列的info字典列表，每项额外带有 'move' 字段（pv的第一步）
+    """
+    latest = {}
+    for line in lines:
+        info = parse_info_line(line, require_pv=True)
+        if info and info.get('pv'):
+            latest[info.get('multipv', 1)] = info
+
+    candidates = []
+    for index in sorted(latest):
+        info = latest[index]
+        info['move'] = info['pv'][0]
+        candidates.append(info)
+    return candidates
+
+
+def total_memory_mb():
+    """本机物理内存大小（MB），无法获取时返回None"""
+    try:
+        if sys.platform == 'win32':
+            import ctypes
+
+            class MEMORYSTATUSEX(ctypes.Structure):
+                _fields_ = [
+                    ('dwLength', ctypes.c_ulong),
+                    ('dwMemoryLoad', ctypes.c_ulong),
+                    ('ullTotalPhys', ctypes.c_ulonglong),
+                    ('ullAvailPhys', ctypes.c_ulonglong),
+                    ('ullTotalPageFile', ctypes.c_ulonglong),
+                    ('ullAvailPageFile', ctypes.c_ulonglong),
+                    ('ullTotalVirtual', ctypes.c_ulonglong),
+                    ('ullAvailVirtual', ctypes.c_ulonglong),
+                    ('ullAvailExtendedVirtual', ctypes.c_ulonglong),
+                ]
+
+            status = MEMORYSTATUSEX()
+            status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+            ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status))
+            return status.ullTotalPhys // (1024 * 1024)
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except Exception:
+        return None
+
+
+def default_engine_path():
+    """engine目录下的Pikafish可执行文件"""
+    name = "pikafish.exe" if sys.platform == "win32" else "pikafish"
+    return str(Path(__file__).parent / "engine" / name)
+
+
+def default_engine_options(engine_path, engines=1):
+    """
+    按本机CPU和内存自动确定引擎参数
+
+    - Threads: CPU核数在同时运行的引擎间平分
+    - Hash: 物理内存的1/16在引擎间平分，取2的幂，限制在16~1024MB
+    - EvalFile: 引擎目录下存在pikafish.nnue时使用其绝对路径
+
+    Args:
+        engine_path: 引擎可执行文件路径
+        engines: 同时运行的引擎进程数
+    """
+    engines = max(1, int(engines))
+    options = {'Threads': max(1, (os.cpu_count() or 1) // engines)}
+
+    memory = total_memory_mb()
+    hash_mb = 16
+    if memory:
+        budget = memory // 16 // engines
+        while hash_mb * 2 <= min(budget, 1024):
+            hash_mb *= 2
+    options['Hash'] = hash_mb
+
+    nnue_path = Path(engine_path).absolute().parent / "pikafish.nnue"
+    if nnue_path.exists():
+        options['EvalFile'] = str(nnue_path)
+    return options
+
+
+# 限时搜索超过movetime多久仍未返回时，客户端主动发送stop（秒）
+STOP_GRACE = 0.2
+
+
+def build_go_command(depth=None, movetime=None, nodes=None):
+    """
+    根据搜索限制生成go命令，可组合使用，先达到的限制生效
+
+    例如 build_go_command(movetime=800) -> "go movetime 800"
+    """
+    parts = ["go"]
+    if depth:
+        parts += ["depth", str(int(depth))]
+    if movetime:
+        parts += ["movetime", str(int(movetime))]
+    if nodes:
+        parts += ["nodes", str(int(nodes))]
+    if len(parts) == 1:
+        parts += ["depth", "8"]
+    return ' '.join(parts)
+
+
+def fit_movetime(interval, margin=0.3, minimum=100):
+    """
+    计算能放进截图间隔内的单次搜索时间（毫秒）
+
+    Args:
+        interval: 截图间隔（秒）
+        margin: 预留给截图、识别和界面刷新的比例
+        minimum: 最短搜索时间（毫秒）
+    """
+    return max(minimum, int(interval * 1000 * (1 - margin)))
+
+
+START_BOARD = "rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR"
+FILES = "abcdefghi"
+
+
+def parse_board(fen):
+    """
+    解析FEN的棋盘部分
+
+    Returns:
+        {(列, 行): 棋子} 字典，列0-8对应a-i，行0为红方底线（FEN的最后一行）
+    """
+    squares = {}
+    rows = fen.split()[0].split('/')
+    for row_index, row in enumerate(rows):
+        rank = len(rows) - 1 - row_index
+        file = 0
+        for char in row:
+            if char.isdigit():
+                file += int(char)
+            else:
+                squares[(file, rank)] = char
+                file += 1
+    return squares
+
+
+def find_move(before, after, side):
+    """
+    判断after是否为before中side方走一步（可吃子）之后的局面
+
+    Args:
+        before, after: parse_board 返回的棋盘
+        side: 走棋方 'w' 或 'b'
+
+    Returns:
+        该步的UCI走法（如 "h2e2"），不是一步之差时返回None
+    """
+    changed = [square for square in set(before) | set(after) if before.get(square) != after.get(square)]
+    if len(changed) != 2:
+        return None
+    origins = [square for square in changed if square not in after]
+    if len(origins) != 1:
+        return None
+    origin = origins[0]
+    target = changed[1] if changed[0] == origin else changed[0]
+    piece = before[origin]
+    if piece.isupper() != (side == 'w') or after.get(target) != piece:
+        return None
+    captured = before.get(target)
+    if captured and captured.isupper() == piece.isupper():
+        return None
+    move = f"{FILES[origin[0]]}{origin[1]}{FILES[target[0]]}{target[1]}"
+    # 按走子规则确认这一步确实可以走（识别错误造成的位移不当作延续）
+    try:
+        if not Position.from_squares(before, side).is_legal(move):
+            return None
+    except ValueError:
+        return None
+    return move
+
+
+class GameHistory:
+    """
+    引擎会话中的对局记录
+
+    连续两帧只差一步时以 "position fen <起始局面> moves ..." 延续，
+    引擎的置换表保持有效，长将、长捉判定所需的重复局面历史也完整；
+    识别到新对局时才发送 ucinewgame
+    """
+
+    def __init__(self):
+        self.root = None  # 本段走法的起始局面 "<局面> <走棋方>"
+        self.moves = []  # 起始局面之后的走法
+        self.board = None  # 当前局面
+        self.side = None  # 当前走棋方
+
+    def next_move(self, fen):
+        """fen为当前局面走一步之后的局面时返回该走法，否则返回None"""
+        board, side = fen.split()[:2]
+        if self.board is None or side == self.side:
+            return None
+        return find_move(self.board, parse_board(board), self.side)
+
+    def continues(self, fen):
+        """fen是否为当前局面本身或其后一步"""
+        board, side = fen.split()[:2]
+        if self.board is not None and side == self.side and parse_board(board) == self.board:
+            return True
+        return self.next_move(fen) is not None
+
+    def is_new_game(self, board):
+        """回到初始局面或棋子数比当前局面多（被吃的子不会复活）时视为新对局"""
+        if self.board is None or board == parse_board(START_BOARD):
+            return True
+        for piece in set(board.values()):
+            before = sum(1 for p in self.board.values() if p == piece)
+            if sum(1 for p in board.values() if p == piece) > before:
+                return True
+        return False
+
+    def position_commands(self, fen):
+        """
+        更新对局记录，返回设置该局面需要发送给引擎的命令
+
+        Args:
+            fen: 带走棋方的FEN，如 "<局面> w"
+        """
+        board_text, side = fen.split()[:2]
+        board = parse_board(board_text)
+        commands = []
+        if board != self.board or side != self.side:
+            move = self.next_move(fen)
+            if move:
+                self.moves.append(move)
+            else:
+                if self.is_new_game(board):
+                    commands.append("ucinewgame")
+                self.root = f"{board_text} {side}"
+                self.moves = []
+            self.board = board
+            self.side = side
+
+        command = f"position fen {self.root}"
+        if self.moves:
+            command += " moves " + ' '.join(self.moves)
+        commands.append(command)
+        return commands
+
+
+class EngineError(Exception):
+    """引擎通信异常（进程退出、响应超时等）"""
+
+
+class EngineTimeout(EngineError):
+    """等待引擎响应超时"""
+
+
+class EngineHung(EngineError):
+    """引擎在搜索中不响应isready心跳，进程已被结束"""
+
+
+class SearchWatchdog:
+    """
+    等待bestmove时的期限和心跳探测（同步和asyncio客户端共用，不做I/O）
+
+    引擎超过heartbeat秒没有输出时由调用方发送isready探测，
+    探测后probe_timeout秒内没有readyok即判定引擎卡死
+    """
+
+    def __init__(self, timeout, heartbeat, probe_timeout, now):
+        """
+        Args:
+            timeout: 等待bestmove的总期限（秒）
+            heartbeat: 无输出多少秒后探测，None表示不探测
+            probe_timeout: 等待readyok的时间（秒）
+            now: 当前时间（调用方的单调时钟）
+        """
+        self.timeout = timeout
+        self.deadline = now + timeout
+        self.heartbeat = heartbeat
+        self.probe_timeout = probe_timeout
+        self.probe_sent = None  # 未收到readyok的isready发送时间
+
+    @property
+    def probing(self):
+        """已发送isready但还没有收到readyok"""
+        return self.probe_sent is not None
+
+    def consume(self, line):
+        """处理搜索中的输出行，readyok由看门狗消费（返回True），其余行交给调用方"""
+        if line == 'readyok':
+            self.probe_sent = None
+            return True
+        return False
+
+    def next_wait(self, now):
+        """下一次等待输出的时长（秒）"""
+        wait = self.deadline - now
+        if self.heartbeat:
+            if self.probe_sent is None:
+                wait = min(wait, self.heartbeat)
+            else:
+                wait = min(wait, self.probe_sent + self.probe_timeout - now)
+        return max(wait, 0)
+
+    def expired(self, now, kill):
+        """
+        一次等待超时后的处理
+
+        Args:
+            kill: 判定卡死时调用，结束引擎进程
+
+        Returns:
+            是否需要发送isready探测
+
+        Raises:
+            EngineTimeout: 超过总期限
+            EngineHung: 探测无响应（已调用kill）
+        """
+        if now >= self.deadline:
+            raise EngineTimeout(f"等待 bestmove 超时（{self.timeout}秒）")
+        if self.probe_sent is not None and now >= self.probe_sent + self.probe_timeout:
+            kill()
+            raise EngineHung(f"引擎{self.probe_timeout}秒内未响应isready，已结束进程")
+        if self.probe_sent is None:
+            self.probe_sent = now
+            return True
+        return False
+
+
+def pick_idle_engine(idle, fen=None):
+    """
+    从空闲引擎列表中选出要借出的引擎的下标（同步和asyncio进程池共用）
+
+    优先选择能以走法延续到fen的引擎（最近归还的优先），否则选最近归还的
+    """
+    if fen is not None:
+        for index in range(len(idle) - 1, -1, -1):
+            if idle[index].history.continues(fen):
+                return index
+    return len(idle) - 1
+
+
+def take_spare(standby):
+    """
+    从备用引擎列表中取出一个仍在运行的引擎（同步和asyncio进程池共用）
+
+    Returns:
+        (备用引擎或None, 取出的已退出引擎列表)，已退出的由调用方关闭
+    """
+    dead = []
+    while standby:
+        spare = standby.pop()
+        if spare.is_alive():
+            return spare, dead
+        dead.append(spare)
+    return None, dead
+
+
+class PikafishEngine:
+    """
+    单个常驻的Pikafish引擎进程
+    进程启动时完成UCI握手（uci/uciok、isready/readyok），之后可反复用于多次分析
+    """
+
+    def __init__(self, engine_path, engine_args=(), options=None, handshake_timeout=10, heartbeat=None,
+                 probe_timeout=1.0):
+        """
+        Args:
+            engine_path: 引擎可执行文件路径（.py脚本会用当前Python解释器运行）
+            engine_args: 附加的命令行参数
+            options: 启动时通过setoption设置的UCI选项，如 {'Threads': 2}
+            handshake_timeout: UCI握手的最长等待时间（秒）
+            heartbeat: 搜索中引擎超过这么多秒没有输出时发送isready探测，None表示不探测
+            probe_timeout: 探测后等待readyok的时间（秒），超时即判定引擎卡死并结束进程
+        """
+        self.engine_path = str(Path(engine_path).absolute())
+        self.engine_args = list(engine_args)
+        self.options = dict(options or {})
+        self.handshake_timeout = handshake_timeout
+        self.heartbeat = heartbeat
+        self.probe_timeout = probe_timeout
+        self.process = None
+        self.output_queue = queue.Queue()
+        self.name = None  # 引擎在 "id name" 中报告的名称
+        self.broken = False  # 进程状态异常（如分析未正常结束），不应再复用
+        self.history = GameHistory()  # 已发送给引擎的对局记录
+
+        self.start()
+
+    def start(self):
+        """启动引擎进程并完成UCI握手"""
+        # 设置引擎工作目录为engine目录（重要！）
+        engine_dir = Path(self.engine_path).parent
+
+        command = [self.engine_path]
+        if self.engine_path.endswith('.py'):
+            command.insert(0, sys.executable)
+
+        self.process = subprocess.Popen(
+            command + self.engine_args,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,  # 合并stderr到stdout
+            text=True,
+            bufsize=1,  # 行缓冲
+            cwd=str(engine_dir),
+            universal_newlines=True,
+        )
+
+        # 启动输出读取线程
+        self.reader_thread = threading.Thread(target=self._read_output, daemon=True)
+        self.reader_thread.start()
+
+        try:
+            self.send("uci")
+            for line in self.wait_for("uciok", self.handshake_timeout):
+                if line.startswith("id name "):
+                    self.name = line[len("id name "):]
+            for name, value in self.options.items():
+                self.send(f"setoption name {name} value {value}")
+            self.is_ready(self.handshake_timeout)
+        except Exception:
+            self.close()
+            raise
+
+    def _read_output(self):
+        """持续读取引擎输出，进程退出时放入None通知等待方"""
+        try:
+            for line in self.process.stdout:
+                self.output_queue.put(line.rstrip('\n\r'))
+        except Exception:
+            pass
+        finally:
+            self.output_queue.put(None)
+
+    def is_alive(self):
+        """引擎进程是否仍可用"""
+        return self.process is not None and self.process.poll() is None and not self.broken
+
+    def kill(self):
+        """强制结束无响应的引擎进程"""
+        self.broken = True
+        if self.process is not None and self.process.poll() is None:
+            self.process.kill()
+
+    def send(self, command):
+        """向引擎发送一条命令"""
+        self.process.stdin.write(command + '\n')
+        self.process.stdin.flush()
+
+    def wait_for(self, prefix, timeout=None, on_line=None):
+        """
+        读取引擎输出直到出现以prefix开头的行
+        每行到达即处理，不做轮询
+
+        Args:
+            prefix: 结束行的前缀，如 "bestmove"、"readyok"
+            timeout: 最长等待时间（秒），None表示一直等待
+            on_line: 可选回调 on_line(line)，每收到一行立即调用
+
+        Returns:
+            收到的全部输出行（包含结束行）
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        lines = []
+        while True:
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise EngineTimeout(f"等待 {prefix} 超时（{timeout}秒）")
+            try:
+                line = self.output_queue.get(timeout=remaining)
+            except queue.Empty:
+                raise EngineTimeout(f"等待 {prefix} 超时（{timeout}秒）")
+            if line is None:
+                self.broken = True
+                raise EngineError("引擎进程已退出")
+            lines.append(line)
+            if on_line is not None:
+                on_line(line)
+            if line.startswith(prefix):
+                return lines
+
+    def is_ready(self, timeout=5):
+        """发送isready并等待readyok"""
+        self.send("isready")
+        self.wait_for("readyok", timeout)
+
+    def set_option(self, name, value):
+        """设置UCI选项，值未变化时不重复发送"""
+        if self.options.get(name) == value:
+            return
+        self.send(f"setoption name {name} value {value}")
+        self.options[name] = value
+
+    def set_position(self, fen):
+        """设置局面：与上一局面只差一步时作为走法延续发送，新对局时先发送ucinewgame"""
+        for command in self.history.position_commands(fen):
+            self.send(command)
+
+    def analyze(self, fen, depth=None, timeout=None, on_info=None, movetime=None, nodes=None, multipv=1):
+        """
+        分析局面，收到bestmove即返回本次分析的全部引擎输出行
+
+        Args:
+            fen: 带走棋方的FEN，如 "<局面> w"
+            depth: 搜索深度；depth、movetime、nodes 都未指定时默认深度8
+            timeout: 等待bestmove的最长时间（秒），超时后发送stop；
+                     默认限时搜索为 movetime 加少量余量，其他为60秒
+            on_info: 可选回调 on_info(info)，搜索过程中每完成一层迭代加深即调用，
+                     info为 parse_info_line 返回的字典
+            movetime: 限时搜索（毫秒）
+            nodes: 限定节点数搜索
+            multipv: 同时搜索的候选走法数，大于1时info行带有multipv序号，
+                     可用 extract_candidates 从返回的输出行中取出前N个候选
+        """
+        go_command = build_go_command(depth, movetime, nodes)
+        if timeout is None:
+            timeout = movetime / 1000 + STOP_GRACE if movetime else 60
+
+        lines = []
+
+        def on_line(line):
+            lines.append(line)
+            if on_info is not None:
+                info = parse_info_line(line, require_pv=True)
+                if info and 'depth' in info:
+                    on_info(info)
+
+        self.set_option('MultiPV', max(1, int(multipv)))
+        self.set_position(fen)
+        self.send(go_command)
+        try:
+            self._wait_bestmove(timeout, on_line)
+        except EngineTimeout:
+            if self.process is None or self.process.poll() is not None:
+                raise
+            # 超时：要求引擎立即给出当前最佳走法，仍无响应则结束该进程
+            try:
+                self.send("stop")
+                self.wait_for("bestmove", 1, on_line)
+            except Exception:
+                self.kill()
+                raise
+        return lines
+
+    def _wait_bestmove(self, timeout, on_line):
+        """
+        等待bestmove；设置了heartbeat时，引擎长时间没有输出就发送isready探测，
+        探测无响应则结束进程并抛出EngineHung，不必等到搜索期限
+        """
+        watchdog = SearchWatchdog(timeout, self.heartbeat, self.probe_timeout, time.monotonic())
+
+        def on_search_line(line):
+            if not watchdog.consume(line):
+                on_line(line)
+
+        while True:
+            try:
+                self.wait_for("bestmove", watchdog.next_wait(time.monotonic()), on_search_line)
+                if watchdog.probing:
+                    # 读掉尚未到达的readyok，免得留给下一条命令
+                    try:
+                        self.wait_for("readyok", self.probe_timeout)
+                    except EngineError:
+                        self.kill()
+                return
+            except EngineTimeout:
+                if watchdog.expired(time.monotonic(), self.kill):
+                    self.send("isready")
+
+    def close(self):
+        """关闭引擎进程"""
+        process = self.process
+        if process is None:
+            return
+        try:
+            if process.poll() is None:
+                process.stdin.write("quit\n")
+                process.stdin.flush()
+                process.wait(timeout=3)
+        except Exception:
+            process.kill()
+        finally:
+            self.process = None
+
+
+class LiveAnalysis:
+    """
+    持续分析
+    独占一个引擎对最新局面一直执行 go infinite：
+    同一局面再次查询时立即返回目前搜得最深的结果，局面变化时停止并改为搜索新局面
+    """
+
+    def __init__(self, engine_path, engine_args=(), options=None, on_info=None):
+        """
+        Args:
+            engine_path: 引擎可执行文件路径
+            engine_args: 附加的引擎命令行参数
+            options: 引擎启动时设置的UCI选项
+            on_info: 可选回调 on_info(fen, info)，当前局面每完成一层搜索即调用
+        """
+        self.engine = PikafishEngine(engine_path, engine_args, options)
+        self.on_info = on_info
+        self.fen = None  # 正在搜索的局面
+        self.latest = None  # 当前局面搜得最深的info
+        self._searching = False
+        self._lock = threading.Lock()  # 保护 fen/latest
+        self._command_lock = threading.Lock()  # 保证换局面的命令序列不交错
+        self._bestmove = threading.Event()  # stop后收到bestmove
+
+        self._consumer = threading.Thread(target=self._consume_output, daemon=True)
+        self._consumer.start()
+
+    def _consume_output(self):
+        """后台读取引擎输出，记录当前局面最深的结果"""
+        while True:
+            line = self.engine.output_queue.get()
+            if line is None:
+                self.engine.broken = True
+                self._bestmove.set()
+                break
+            if line.startswith('bestmove'):
+                self._bestmove.set()
+            else:
+                info = parse_info_line(line, require_pv=True)
+                if not info or 'depth' not in info or info.get('multipv', 1) != 1:
+                    continue
+                with self._lock:
+                    if self.latest is None or info['depth'] >= self.latest['depth']:
+                        self.latest = info
+                    fen = self.fen
+                if self.on_info is not None:
+                    self.on_info(fen, info)
+
+    def update(self, fen):
+        """
+        提交最新局面
+
+        Args:
+            fen: 带走棋方的FEN，如 "<局面> w"
+
+        Returns:
+            局面未变化时返回目前搜得最深的info（可能为None）；
+            局面变化时重新开始搜索并返回None
+        """
+        fen = ' '.join(fen.split()[:2])
+        with self._lock:
+            if fen == self.fen:
+                return self.latest
+
+        with self._command_lock:
+            if self._searching:
+                self._bestmove.clear()
+                self.engine.send("stop")
+                if not self._bestmove.wait(5):
+                    self.engine.broken = True
+                    raise EngineError("引擎未响应stop")
+            if not self.engine.is_alive():
+                raise EngineError("引擎进程已退出")
+            with self._lock:
+                self.fen = fen
+                self.latest = None
+            self.engine.set_position(fen)
+            self.engine.send("go infinite")
+            self._searching = True
+        return None
+
+    def close(self):
+        """停止搜索并关闭引擎"""
+        with self._command_lock:
+            if self._searching and self.engine.is_alive():
+                try:
+                    self.engine.send("stop")
+                except Exception:
+                    pass
+            self._searching = False
+            self.engine.close()
+
+
+class EnginePool:
+    """
+    引擎进程池
+    持有N个预热的引擎进程，每次分析时借出一个，用完归还
+
+    看门狗：搜索中引擎长时间无输出时发送isready心跳，无响应即结束进程；
+    空闲引擎定期探测；失效的引擎立即换成预先启动的备用进程，备用进程在后台补充
+    """
+
+    def __init__(self, engine_path, size=2, engine_args=(), threads=None, options=None, standby=1,
+                 heartbeat=1.0, probe_timeout=1.0, watchdog_interval=5.0):
+        """
+        Args:
+            engine_path: 引擎可执行文件路径
+            size: 进程池大小
+            engine_args: 附加的引擎命令行参数
+            threads: 每个引擎的搜索线程数，None表示按CPU核数在池内平分，
+                     避免多个引擎同时搜索时抢占核心
+            options: 覆盖默认值的UCI选项，如 {'Hash': 256}；
+                     默认值见 default_engine_options，每个进程启动时设置一次
+            standby: 预先启动的备用进程数，引擎失效时直接换上，不用等待启动和加载NNUE
+            heartbeat: 搜索中引擎超过这么多秒没有输出时发送isready探测，None表示不探测
+            probe_timeout: 等待readyok的时间（秒），超时即结束该引擎进程
+            watchdog_interval: 探测空闲引擎的间隔（秒），None表示不启动看门狗线程
+        """
+        self.engine_path = str(engine_path)
+        self.engine_args = list(engine_args)
+        self.size = max(1, int(size))
+        self.options = default_engine_options(engine_path, self.size)
+        self.options.update(options or {})
+        if threads is not None:
+            self.options['Threads'] = threads
+        self.threads = self.options['Threads']
+        self.heartbeat = heartbeat
+        self.probe_timeout = probe_timeout
+        self.standby_size = max(0, int(standby))
+        self.restarts = 0  # 因失效被替换的引擎数
+        self._idle = []  # 空闲引擎，最近归还的在末尾
+        self._standby = []  # 备用引擎
+        self._available = threading.Condition()
+        self._closed = False
+        self._stopped = threading.Event()
+
+        # 预热：启动时就拉起全部引擎进程和备用进程
+        for _ in range(self.size):
+            self._idle.append(self._spawn())
+        for _ in range(self.standby_size):
+            self._standby.append(self._spawn())
+
+        if watchdog_interval:
+            self._watchdog = threading.Thread(target=self._watch, args=(watchdog_interval,), daemon=True)
+            self._watchdog.start()
+
+    def _spawn(self):
+        return PikafishEngine(self.engine_path, self.engine_args, options=self.options,
+                              heartbeat=self.heartbeat, probe_timeout=self.probe_timeout)
+
+    def _replace(self, engine):
+        """结束失效的引擎，换上备用进程（没有备用时现场启动），并在后台补充备用进程"""
+        engine.kill()
+        engine.close()
+        with self._available:
+            spare, dead = take_spare(self._standby)
+        for engine in dead:
+            engine.close()
+        if spare is None:
+            spare = self._spawn()
+        with self._available:  # 看门狗线程和借出引擎的线程都会调用
+            self.restarts += 1
+        if self.standby_size:
+            threading.Thread(target=self._refill_standby, daemon=True).start()
+        return spare
+
+    def _refill_standby(self):
+        """补足备用进程"""
+        with self._available:
+            missing = self.standby_size - len(self._standby)
+        for _ in range(missing):
+            try:
+                engine = self._spawn()
+            except Exception:
+                return
+            with self._available:
+                if self._closed or len(self._standby) >= self.standby_size:
+                    engine.close()
+                    return
+                self._standby.append(engine)
+
+    def _watch(self, interval):
+        """
+        看门狗：定期用isready探测空闲引擎，无响应或已退出的换成备用进程
+        每次只从池中取出正在探测的一个引擎，其余空闲引擎照常可以借出
+        """
+        while not self._stopped.wait(interval):
+            with self._available:
+                engines = list(self._idle)
+            for engine in engines:
+                with self._available:
+                    if self._closed:
+                        return
+                    if engine not in self._idle:
+                        continue  # 已被借出
+                    self._idle.remove(engine)
+                try:
+                    if not engine.is_alive():
+                        raise EngineError("引擎进程已退出")
+                    engine.is_ready(self.probe_timeout)
+                except Exception:
+                    try:
+                        engine = self._replace(engine)
+                    except Exception:
+                        pass  # 无法补充时放回失效的引擎，借出时 is_alive 检查会再次替换
+                with self._available:
+                    if self._closed:
+                        engine.close()
+                        return
+                    self._idle.insert(0, engine)
+                    self._available.notify()
+
+    def acquire(self, timeout=None, fen=None):
+        """
+        借出一个可用的引擎进程
+
+        Args:
+            timeout: 等待空闲引擎的最长时间（秒），None表示一直等待
+            fen: 将要分析的局面，优先借出能以走法延续到该局面的引擎
+        """
+        if self._closed:
+            raise RuntimeError("引擎进程池已关闭")
+
+        with self._available:
+            if not self._available.wait_for(lambda: self._idle, timeout):
+                raise queue.Empty
+            engine = self._idle.pop(pick_idle_engine(self._idle, fen))
+
+        if not engine.is_alive():
+            # 进程已退出或状态异常，换成备用进程
+            try:
+                engine = self._replace(engine)
+            except Exception:
+                self.release(engine)  # 放回失效的引擎，进程池不会因此变小
+                raise
+        return engine
+
+    def release(self, engine):
+        """归还引擎进程"""
+        if self._closed:
+            engine.close()
+            return
+        with self._available:
+            self._idle.append(engine)
+            self._available.notify()
+
+    @contextmanager
+    def checkout(self, timeout=None, fen=None):
+        """
+        借出引擎的上下文管理器
+
+        用法:
+            with pool.checkout(fen=fen) as engine:
+                engine.analyze(fen, depth)
+        """
+        engine = self.acquire(timeout, fen)
+        try:
+            yield engine
+        finally:
+            self.release(engine)
+
+    def close(self):
+        """关闭全部引擎进程"""
+        self._closed = True
+        self._stopped.set()
+        with self._available:
+            engines, self._idle = self._idle + self._standby, []
+            self._standby = []
+        for engine in engines:
+            engine.close()
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_engine_pool(engine_path, size=2, options=None):
+    """
+    获取指定引擎的共享进程池
+    同一进程内的GUI、助手和命令行共用一个池，程序退出时自动关闭
+
+    Args:
+        engine_path: 引擎可执行文件路径
+        size: 进程池大小（仅在首次创建时生效）
+        options: 覆盖默认值的UCI选项（仅在首次创建时生效）
+    """
+    key = str(Path(engine_path).absolute())
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None or pool._closed:
+            pool = EnginePool(engine_path, size, options=options)
+            _pools[key] = pool
+        return pool
+
+
+@atexit.register
+def close_all_pools():
+    """关闭所有共享进程池"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
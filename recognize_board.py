@@ -89,6 +89,7 @@ def main():
     parser = argparse.ArgumentParser(description='中国象棋棋盘识别')
     parser.add_argument('image', help='输入图片路径')
     parser.add_argument('--analyze', action='store_true', help='识别后进行引擎分析')
+    parser.add_argument('--multipv', type=int, default=1, help='分析时给出的候选走法数（默认1）')
     
     args = parser.parse_args()
     
@@ -128,11 +129,28 @@ def main():
                 print("="*60)
                 
                 assistant = ChineseChessAssistant()
-                if assistant.engine_path:
+                if assistant.engine_path and args.multipv > 1:
                     print("正在分析...")
-                    best_move = assistant.analyze_position(fen)
-                    print(f"\n最佳走法: {best_move}")
-                    print(f"走法说明: {assistant.format_move(best_move)}")
+                    candidates = assistant.analyze_candidates(fen, multipv=args.multipv)
+                    if candidates:
+                        print(f"\n候选走法（前{len(candidates)}个）:")
+                        for candidate in candidates:
+                            if 'score_mate' in candidate:
+                                score = f"{candidate['score_mate']}步杀"
+                            else:
+                                score = f"{candidate.get('score_cp', 0)}厘兵"
+                            print(f"  {candidate['multipv']}. {assistant.format_move(candidate['move'], fen)}")
+                            print(f"     评分: {score}  深度: {candidate['depth']}  变化: {' '.join(candidate['pv'])}")
+                    else:
+                        print("\n✗ 未找到候选走法")
+                elif assistant.engine_path:
+                    print("正在分析...")
+                    result = assistant.analyze_position(fen)
+                    if result.ok:
+                        print(f"\n最佳走法: {result.bestmove}")
+                        print(f"走法说明: {assistant.format_move(result.bestmove, fen)}")
+                    else:
+                        print(f"\n✗ {result.message}")
                 else:
                     print("⚠ 引擎未安装")
                     
@@ -165,6 +183,7 @@ if __name__ == "__main__":
         print("  python recognize_board.py images/1.png --analyze")
         print("\n选项:")
         print("  --analyze               识别后进行引擎分析")
+        print("  --multipv N             分析时给出前N个候选走法")
         print("\n说明:")
         print("  本程序使用深度学习ONNX模型进行识别")
         print("  首次使用请运行: python download_nnue.py")
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+分析缓存测试
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from analysis_cache import AnalysisCache, normalize_board
+
+START_FEN = "rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w"
+
+
+def test_normalize_board():
+    """去掉走棋方等字段并合并空位数字"""
+    assert normalize_board("4k4/9/9/9/9/9/9/9/9/4K4 b - - 0 1") == "4k4/9/9/9/9/9/9/9/9/4K4"
+    assert normalize_board("22k4/9") == "4k4/9"
+
+
+def test_deeper_result_satisfies_shallower_request():
+    cache = AnalysisCache()
+    cache.put(START_FEN, 'w', 10, "h2e2")
+
+    assert cache.get(START_FEN, 'w', 8) == "h2e2"
+    assert cache.get(START_FEN, 'w', 12) is None
+    assert cache.get(START_FEN, 'b', 8) is None
+    assert cache.stats()['hits'] == 1
+    assert cache.stats()['misses'] == 2
+
+
+def test_shallower_result_does_not_replace_deeper():
+    cache = AnalysisCache()
+    cache.put(START_FEN, 'w', 10, "h2e2")
+    cache.put(START_FEN, 'w', 4, "b2e2")
+    assert cache.get(START_FEN, 'w', 10) == "h2e2"
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = AnalysisCache(max_size=2)
+    fens = ["4k4/9/9/9/9/9/9/9/9/4K4", "3k5/9/9/9/9/9/9/9/9/4K4", "5k3/9/9/9/9/9/9/9/9/4K4"]
+    cache.put(fens[0], 'w', 8, "e0e1")
+    cache.put(fens[1], 'w', 8, "e0d0")
+    cache.get(fens[0], 'w', 8)  # 使第一个局面变为最近使用
+    cache.put(fens[2], 'w', 8, "e0f0")
+
+    assert len(cache) == 2
+    assert cache.get(fens[0], 'w', 8) == "e0e1"
+    assert cache.get(fens[1], 'w', 8) is None
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+分析结果对象测试
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from analysis_result import AnalysisResult, AnalysisError
+
+LINES = [
+    "info depth 1 seldepth 2 multipv 1 score cp 11 nodes 1000 nps 100000 hashfull 0 time 1 pv h2e2",
+    "info depth 2 seldepth 5 multipv 1 score cp 24 wdl 120 850 30 nodes 2000 nps 200000 hashfull 3 time 2 "
+    "pv h2e2 h9g7",
+    "info depth 2 seldepth 4 multipv 2 score cp 7 nodes 2000 nps 200000 hashfull 3 time 2 pv b2e2",
+    "bestmove h2e2 ponder h9g7",
+]
+
+
+def test_from_lines_reads_deepest_principal_variation():
+    result = AnalysisResult.from_lines(LINES, elapsed=0.5)
+    assert result.ok
+    assert result.bestmove == "h2e2"
+    assert result.ponder == "h9g7"
+    assert (result.depth, result.seldepth, result.score_cp) == (2, 5, 24)
+    assert result.score_mate is None
+    assert result.wdl == (120, 850, 30)
+    assert result.pv == ["h2e2", "h9g7"]
+    assert (result.nodes, result.nps, result.hashfull) == (2000, 200000, 3)
+    assert str(result) == "h2e2"
+
+
+def test_missing_bestmove_is_typed_error():
+    result = AnalysisResult.from_lines(LINES[:2])
+    assert not result.ok
+    assert result.error is AnalysisError.NO_BESTMOVE
+    assert result.message == "未找到最佳走法"
+
+    timeout = AnalysisResult.failure(AnalysisError.TIMEOUT, "等待 bestmove 超时")
+    assert timeout.message == "分析超时: 等待 bestmove 超时"
+    data = timeout.to_dict()
+    assert data['error'] == 'TIMEOUT'
+    assert 'bestmove' not in data and 'pv' not in data
+
+
+def test_slots_and_serialization():
+    result = AnalysisResult.from_lines(LINES)
+    assert not hasattr(result, '__dict__')
+    data = result.to_dict()
+    assert data['bestmove'] == "h2e2"
+    assert data['wdl'] == [120, 850, 30]
+    assert 'error' not in data and 'score_mate' not in data
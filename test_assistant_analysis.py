@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+助手分析测试
+使用 fake_uci_engine.py 模拟Pikafish，无需真实引擎
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+# chess_assistant 依赖截图和热键库
+pytest.importorskip("pyautogui")
+pytest.importorskip("keyboard")
+pytest.importorskip("PIL")
+
+from chess_assistant import ChineseChessAssistant
+from pikafish_engine import EnginePool
+
+FAKE_ENGINE = Path(__file__).parent / "fake_uci_engine.py"
+TEST_FEN = "rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w"
+
+
+@pytest.fixture
+def assistant():
+    assistant = ChineseChessAssistant(load_detector=False)
+    assistant.opening_book = None
+    assistant.engine_path = str(FAKE_ENGINE)
+    assistant.engine_pool = EnginePool(FAKE_ENGINE, size=1)
+    yield assistant
+    assistant.engine_pool.close()
+
+
+def test_analyze_position_returns_legal_engine_move(assistant):
+    result = assistant.analyze_position(TEST_FEN, 'w', depth=4)
+    assert result.ok, result.message
+    assert result.bestmove == "h2e2"
+    assert assistant.analyze_position(TEST_FEN, 'b', depth=4).bestmove == "h7e7"
+
+
+def test_analyze_candidates_multipv(assistant):
+    candidates = assistant.analyze_candidates(TEST_FEN, 'w', 4, multipv=3)
+    assert [candidate['move'] for candidate in candidates] == ["h2e2", "b2e2", "b0c2"]
+
+
+def test_illegal_engine_move_rejected(assistant):
+    """引擎给出的走法在规则上不合法时视为失败（模拟引擎总是走 h2e2，这里e2是红马）"""
+    result = assistant._run_analysis("rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C2N2C1/9/R1BAKABNR w",
+                                     'w', 4, None, None, None, 1)[0]
+    assert not result.ok
+    assert "h2e2" in result.message
+
+
+def test_concurrent_live_updates_start_one_engine_pair(assistant, monkeypatch):
+    """多个截图帧同时提交持续分析时只启动一对引擎"""
+    import chess_assistant
+    from concurrent.futures import ThreadPoolExecutor
+
+    started = []
+    live_analysis = chess_assistant.LiveAnalysis
+
+    def counting_live_analysis(*args, **kwargs):
+        live = live_analysis(*args, **kwargs)
+        started.append(live)
+        return live
+
+    monkeypatch.setattr(chess_assistant, 'LiveAnalysis', counting_live_analysis)
+    try:
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            results = list(executor.map(assistant.live_update, [TEST_FEN] * 8))
+        assert len(started) == 2
+        assert all(set(result) == {'red', 'black'} for result in results)
+    finally:
+        assistant.stop_live_analysis()
+    assert assistant.live_analyses is None
+    assert all(live.engine.process is None for live in started)  # 引擎都已关闭
+
+
+def test_illegal_book_move_skipped(assistant, tmp_path):
+    """开局库中不合法的走法被跳过，改用下一个库内走法或交给引擎"""
+    from opening_book import BookBuilder, OpeningBook
+    builder = BookBuilder()
+    builder.add(TEST_FEN, 'w', "a0a5", weight=5)  # 直接写入的损坏记录
+    builder.add(TEST_FEN, 'w', "b2e2", weight=1)
+    builder.add(TEST_FEN, 'b', "a9a4", weight=1)
+    builder.write(tmp_path / "book.bin")
+    assistant.opening_book = OpeningBook(tmp_path / "book.bin")
+    try:
+        assert assistant.probe_opening_book(TEST_FEN, 'w').bestmove == "b2e2"
+        assert assistant.probe_opening_book(TEST_FEN, 'b') is None
+        assert assistant.analyze_position(TEST_FEN, 'b', depth=4).bestmove == "h7e7"
+    finally:
+        assistant.opening_book.close()
+
+
+def test_async_both_sides_shares_sync_checks(assistant):
+    """异步双方分析与同步分析走同样的检查：格式错误、非法引擎走法，MultiPV结果不写缓存"""
+    from analysis_result import AnalysisError
+    try:
+        results = assistant.submit_both_sides("", depth=4).result(timeout=10)
+        assert {side: result.error for side, result in results.items()} == \
+            {'red': AnalysisError.INVALID_FEN, 'black': AnalysisError.INVALID_FEN}
+
+        results = assistant.submit_both_sides(
+            "rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C2N2C1/9/R1BAKABNR w", depth=4).result(timeout=10)
+        assert not results['red'].ok and "h2e2" in results['red'].message
+
+        results = assistant.submit_both_sides(TEST_FEN, depth=4, multipv=3).result(timeout=10)
+        assert results['red'].bestmove == "h2e2" and results['black'].bestmove == "h7e7"
+        assert assistant.analysis_cache.get(TEST_FEN, 'w', 4) is None
+    finally:
+        assistant.stop_engine_service()
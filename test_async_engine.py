@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+asyncio引擎客户端测试
+"""
+
+import sys
+import time
+import asyncio
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from async_engine import AsyncPikafishEngine, AsyncEnginePool, AsyncEngineService
+from pikafish_engine import EngineHung
+
+FAKE_ENGINE = Path(__file__).parent / "fake_uci_engine.py"
+TEST_FEN = "rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w"
+
+
+def bestmove(lines):
+    return [line for line in lines if line.startswith('bestmove')][-1].split()[1]
+
+
+def test_analyse_returns_bestmove():
+    """握手后定深搜索，逐层回调info"""
+    async def scenario():
+        engine = await AsyncPikafishEngine.start(FAKE_ENGINE)
+        try:
+            assert engine.name == "Pikafish (fake)"
+            depths = []
+            lines = await engine.analyse(TEST_FEN, depth=4, on_info=lambda info: depths.append(info['depth']))
+            assert bestmove(lines) == "h2e2"
+            assert depths == [1, 2, 3, 4]
+        finally:
+            await engine.quit()
+
+    asyncio.run(scenario())
+
+
+def test_cancel_sends_stop():
+    """取消等待中的任务会让引擎停止搜索，引擎随即可以分析下一个局面"""
+    async def scenario():
+        engine = await AsyncPikafishEngine.start(FAKE_ENGINE, ["--depth-delay", "0.05"])
+        try:
+            task = asyncio.create_task(engine.analyse(TEST_FEN, depth=200))
+            await asyncio.sleep(0.2)
+            start = time.monotonic()
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            assert task.cancelled()
+            assert time.monotonic() - start < 5  # 不取消需要 200 × 0.05 = 10 秒
+            assert engine.is_alive()
+
+            lines = await engine.analyse(TEST_FEN.replace(' w', ' b'), depth=2)
+            assert bestmove(lines) == "h7e7"
+        finally:
+            await engine.quit()
+
+    asyncio.run(scenario())
+
+
+def test_many_engines_share_one_loop():
+    """多个引擎在同一个事件循环中并行搜索"""
+    async def scenario():
+        pool = await AsyncEnginePool(FAKE_ENGINE, size=4, engine_args=["--depth-delay", "0.1"]).start()
+        try:
+            running = []
+            peak = 0
+
+            async def search(fen):
+                nonlocal peak
+                async with pool.checkout() as engine:
+                    running.append(engine)
+                    peak = max(peak, len(running))
+                    lines = await engine.analyse(fen, depth=5)
+                    running.remove(engine)
+                    return bestmove(lines)
+
+            moves = await asyncio.gather(*(search(TEST_FEN) for _ in range(4)))
+            assert moves == ["h2e2"] * 4
+            assert peak == 4  # 搜索不阻塞事件循环，四个引擎同时在搜索
+        finally:
+            await pool.close()
+
+    asyncio.run(scenario())
+
+
+def test_service_future_cancel():
+    """同步代码通过Future提交和取消搜索"""
+    service = AsyncEngineService(FAKE_ENGINE, size=1, engine_args=["--depth-delay", "0.05"])
+    try:
+        async def search(depth):
+            async with service.pool.checkout() as engine:
+                return bestmove(await engine.analyse(TEST_FEN, depth=depth))
+
+        future = service.submit(search(200))
+        time.sleep(0.2)
+        future.cancel()
+        assert service.run(search(2), timeout=2) == "h2e2"
+    finally:
+        service.close()
+
+
+def test_hung_engine_swapped_for_standby():
+    """卡死的引擎被心跳探测结束，下一次借出换上备用进程"""
+    async def scenario():
+        pool = await AsyncEnginePool(FAKE_ENGINE, size=1, engine_args=["--hang-on-go"], standby=1,
+                                     heartbeat=0.1, probe_timeout=0.2).start()
+        try:
+            async with pool.checkout() as engine:
+                hung = engine
+                with pytest.raises(EngineHung):  # 心跳探测先于搜索超时（EngineTimeout）触发
+                    await engine.analyse(TEST_FEN, depth=5, timeout=30)
+
+            async with pool.checkout() as engine:
+                assert engine is not hung and engine.is_alive()
+            assert pool.restarts == 1
+        finally:
+            await pool.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+批量分析测试
+"""
+
+import io
+import sys
+import json
+import threading
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pikafish_engine import EnginePool
+from batch_analyze import BatchAnalyzer, iter_inputs, main
+
+FAKE_ENGINE = Path(__file__).parent / "fake_uci_engine.py"
+TEST_FEN = "rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w"
+
+
+def test_iter_inputs_skips_comments():
+    stream = io.StringIO(f"# 注释\n\n{TEST_FEN}\n  images/1.png  \n")
+    assert list(iter_inputs(stream)) == [(0, TEST_FEN), (1, "images/1.png")]
+
+
+def test_batch_streams_jsonl_records():
+    """每个局面一条记录，包含走法、评分、变化、深度和耗时"""
+    pool = EnginePool(FAKE_ENGINE, size=2)
+    try:
+        inputs = [(0, TEST_FEN), (1, TEST_FEN.replace(' w', ' b')), (2, "4k4/9/9/9/9/9/9/9/9/9 w")]
+        output = io.StringIO()
+        total, failed = BatchAnalyzer(pool, depth=5).run(inputs, output)
+        records = {r['index']: r for r in map(json.loads, output.getvalue().splitlines())}
+
+        assert (total, failed) == (3, 1)
+        assert records[0]['bestmove'] == "h2e2"
+        assert records[0]['depth'] == 5
+        assert records[0]['score_cp'] == 15
+        assert records[0]['pv'] == ["h2e2"]
+        assert records[0]['time_ms'] >= 0
+        assert records[1]['bestmove'] == "h7e7"
+        assert records[2]['error'] == "局面不合法: 缺少红帅"
+    finally:
+        pool.close()
+
+
+def test_batch_runs_positions_in_parallel():
+    """多个引擎进程同时分析不同局面"""
+    pool = EnginePool(FAKE_ENGINE, size=4, engine_args=["--depth-delay", "0.1"])
+    lock = threading.Lock()
+    checked_out = set()
+    peak = 0
+    acquire, release = pool.acquire, pool.release
+
+    def counting_acquire(*args, **kwargs):
+        nonlocal peak
+        engine = acquire(*args, **kwargs)
+        with lock:
+            checked_out.add(engine)
+            peak = max(peak, len(checked_out))
+        return engine
+
+    def counting_release(engine, *args, **kwargs):
+        with lock:
+            checked_out.discard(engine)
+        return release(engine, *args, **kwargs)
+
+    pool.acquire, pool.release = counting_acquire, counting_release
+    try:
+        total, failed = BatchAnalyzer(pool, depth=4).run(((i, TEST_FEN) for i in range(4)), io.StringIO())
+        assert (total, failed) == (4, 0)
+        assert peak > 1
+    finally:
+        pool.close()
+
+
+class FakeRecognizer:
+    """记录每次批量识别的图片数，亮图识别为初始局面，暗图识别失败"""
+
+    def __init__(self):
+        self.batches = []
+        self.debug_sink = type('Sink', (), {'flush': lambda self: None})()
+
+    def recognize_batch(self, images):
+        self.batches.append(len(images))
+        return [TEST_FEN if image.mean() > 100 else None for image in images]
+
+
+def test_images_recognized_in_batches(tmp_path):
+    """图片按批识别，FEN输入不等待图片"""
+    cv2 = pytest.importorskip("cv2")
+    import numpy as np
+
+    paths = []
+    for i, value in enumerate([200, 200, 0, 200, 200]):
+        path = tmp_path / f"{i}.png"
+        cv2.imwrite(str(path), np.full((8, 8, 3), value, dtype=np.uint8))
+        paths.append(str(path))
+    inputs = [(0, paths[0]), (1, TEST_FEN), (2, paths[1]), (3, paths[2]), (4, paths[3]),
+              (5, paths[4]), (6, str(tmp_path / "missing.png"))]
+
+    pool = EnginePool(FAKE_ENGINE, size=2)
+    try:
+        analyzer = BatchAnalyzer(pool, depth=2, side='b', image_batch=3)
+        analyzer._recognizer = FakeRecognizer()
+        output = io.StringIO()
+        total, failed = analyzer.run(inputs, output)
+        records = {r['index']: r for r in map(json.loads, output.getvalue().splitlines())}
+
+        assert analyzer._recognizer.batches == [3, 2]  # 无法读取的图片不送去识别
+        assert (total, failed) == (7, 2)
+        assert records[0]['fen'] == TEST_FEN.replace(' w', ' b')
+        assert records[0]['bestmove'] == "h7e7"
+        assert records[1]['bestmove'] == "h2e2"
+        assert records[3]['error'] == "识别失败"
+        assert records[6]['error'].startswith("无法读取图片")
+    finally:
+        pool.close()
+
+
+def test_main_reads_file(tmp_path, capsys):
+    positions = tmp_path / "positions.txt"
+    positions.write_text(f"{TEST_FEN}\n{TEST_FEN.split()[0]}\n", encoding='utf-8')
+    output = tmp_path / "out.jsonl"
+    assert main([str(positions), "-o", str(output), "--engine", str(FAKE_ENGINE),
+                 "--workers", "2", "--depth", "3", "--side", "b"]) == 0
+    records = sorted(map(json.loads, output.read_text(encoding='utf-8').splitlines()), key=lambda r: r['index'])
+    assert [r['bestmove'] for r in records] == ["h2e2", "h7e7"]
+    assert "完成 2 个局面" in capsys.readouterr().err
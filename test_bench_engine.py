@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+引擎基准测试脚本的测试（使用测试用引擎）
+"""
+
+import sys
+import json
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from bench_engine import run_benchmark, main, SUITE, FAKE_ENGINE
+
+
+def test_benchmark_records_spawn_depths_and_overhead():
+    results = run_benchmark(FAKE_ENGINE, depths=[3, 5], threads_list=[1, 2], repeat=2, suite=SUITE[:2])
+    assert results['engine_name'] == "Pikafish (fake)"
+    assert [run['threads'] for run in results['runs']] == [1, 2]
+
+    run = results['runs'][1]
+    assert run['options']['Threads'] == 2
+    assert len(run['spawn_ms']) == 2 and all(ms > 0 for ms in run['spawn_ms'])
+    assert [(entry['name'], entry['depth']) for entry in run['positions']] == [
+        (SUITE[0]['name'], 3), (SUITE[0]['name'], 5), (SUITE[1]['name'], 3), (SUITE[1]['name'], 5)]
+
+    sample = run['positions'][1]['samples'][0]
+    assert sample['depth_reached'] == 5
+    assert sorted(sample['time_to_depth_ms']) == [1, 2, 3, 4, 5]
+    assert sample['nps'] == 500000
+    assert sample['client_overhead_ms'] >= 0
+    json.dumps(results)
+
+
+def test_main_writes_json(tmp_path):
+    output = tmp_path / "bench.json"
+    assert main(["--fake", "--depths", "2", "--repeat", "1", "-o", str(output)]) == 0
+    results = json.loads(output.read_text(encoding='utf-8'))
+    assert len(results['runs'][0]['positions']) == len(SUITE)
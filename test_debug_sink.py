@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+调试图像输出测试
+"""
+
+import sys
+import threading
+from pathlib import Path
+from concurrent.futures import Future
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+pytest.importorskip("cv2")
+
+import numpy as np
+
+import debug_sink
+from debug_sink import DebugSink
+
+
+def run_frames(sink, outcomes):
+    """每个元素代表一帧，值为这一帧是否识别失败"""
+    for failed in outcomes:
+        frame = sink.frame()
+        frame.add('input', np.zeros((8, 8, 3), dtype=np.uint8))
+        frame.close(failed)
+    sink.flush()
+
+
+def test_off_by_default(tmp_path):
+    sink = DebugSink(directory=tmp_path / "debug")
+    run_frames(sink, [False, True])
+    assert not sink.enabled
+    assert not (tmp_path / "debug").exists()
+
+
+def test_every_nth_frame(tmp_path):
+    sink = DebugSink.from_spec("every:3", tmp_path)
+    run_frames(sink, [False] * 7)
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "000001_ok_input.png", "000004_ok_input.png", "000007_ok_input.png"]
+
+
+def test_failures_only(tmp_path):
+    sink = DebugSink.from_spec("failures", tmp_path)
+    run_frames(sink, [False, True, False])
+    assert [path.name for path in tmp_path.iterdir()] == ["000002_fail_input.png"]
+
+
+def test_image_copied_when_frame_closes(tmp_path):
+    """缓冲区在close之后被复用，写出的仍是close时的内容"""
+    import cv2
+    sink = DebugSink('every', 1, tmp_path)
+    image = np.full((8, 8, 3), 200, dtype=np.uint8)
+    frame = sink.frame()
+    frame.add('aligned', image)
+    frame.close()
+    image[:] = 0
+    sink.flush()
+    assert cv2.imread(str(tmp_path / "000001_ok_aligned.png")).min() == 200
+
+
+def test_full_queue_drops_frames(tmp_path, monkeypatch):
+    """写入线程跟不上时丢弃新帧，不阻塞调用方"""
+    release = threading.Event()
+    monkeypatch.setattr(debug_sink.cv2, 'imwrite', lambda path, image: release.wait(5))
+    sink = DebugSink('every', 1, tmp_path, max_pending=1)
+    for _ in range(5):
+        frame = sink.frame()
+        frame.add('input', np.zeros((8, 8, 3), dtype=np.uint8))
+        frame.close()
+    assert sink.dropped >= 3
+    release.set()
+    sink.flush()
+    assert sink.written + sink.dropped == 5
+
+
+def test_invalid_spec():
+    with pytest.raises(ValueError):
+        DebugSink.from_spec("sometimes")
+    with pytest.raises(ValueError):
+        DebugSink.from_spec("every:x")
+    with pytest.raises(ValueError):
+        DebugSink.from_spec("failures:3")
+
+
+def test_recognizer_saves_failed_frames(tmp_path, monkeypatch):
+    """识别出不合法局面的帧保存输入图像和对齐后的棋盘"""
+    pytest.importorskip("onnxruntime")
+    from cchess_deep_recognizer import CChessDeepRecognizer
+    from test_recognizer import FakeSession, board_predictions
+
+    monkeypatch.chdir(tmp_path)
+    recognizer = CChessDeepRecognizer(tmp_path, debug_sink=DebugSink('failures', directory=tmp_path / "debug"))
+    simcc_x = np.zeros((1, 4, 512), dtype=np.float32)
+    simcc_y = np.zeros((1, 4, 512), dtype=np.float32)
+    simcc_x[:, [0, 1, 2, 3], [0, 511, 511, 0]] = 1.0
+    simcc_y[:, [0, 1, 2, 3], [0, 0, 511, 511]] = 1.0
+    empty = board_predictions("9/9/9/9/9/9/9/9/9/9 w", recognizer.class_names, recognizer.class_to_fen)[None]
+    recognizer.pose_model = FakeSession(1, lambda batch: [simcc_x, simcc_y])
+    recognizer.classifier_model = FakeSession(1, lambda batch: [empty])
+    recognizer.ready = Future()
+    recognizer.ready.set_result(True)
+
+    assert recognizer.recognize(np.zeros((200, 180, 3), dtype=np.uint8)) is None
+    recognizer.debug_sink.flush()
+    assert sorted(path.name for path in (tmp_path / "debug").iterdir()) == [
+        "000001_fail_aligned.png", "000001_fail_input.png"]
+    assert not (tmp_path / "debug_aligned_board.png").exists()
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+"""
+引擎进程池测试
+使用 fake_uci_engine.py 模拟Pikafish，无需真实引擎
+"""
+
+import sys
+import time
+import shutil
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pytest
+
+from pikafish_engine import EnginePool, EngineError, EngineHung, get_engine_pool, default_engine_options
+
+FAKE_ENGINE = Path(__file__).parent / "fake_uci_engine.py"
+TEST_FEN = "rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w"
+
+
+def test_pool_reuses_processes():
+    """多次分析复用同一批引擎进程"""
+    pool = EnginePool(FAKE_ENGINE, size=1)
+    try:
+        with pool.checkout() as engine:
+            pid = engine.process.pid
+            first = engine.analyze(TEST_FEN, 4)
+        with pool.checkout() as engine:
+            assert engine.process.pid == pid
+            second = engine.analyze(TEST_FEN.replace(' w', ' b'), 4)
+
+        assert first[-1] == "bestmove h2e2"
+        assert second[-1] == "bestmove h7e7"
+    finally:
+        pool.close()
+
+
+def test_pool_prefers_continuing_engine():
+    """借出时优先选择能以走法延续到新局面的引擎"""
+    pool = EnginePool(FAKE_ENGINE, size=2)
+    try:
+        with pool.checkout() as red, pool.checkout() as black:
+            red.analyze(TEST_FEN, 2)
+            black.analyze(TEST_FEN.replace(' w', ' b'), 2)
+        after = "rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C2C4/9/RNBAKABNR b"
+        with pool.checkout(fen=after) as engine:
+            assert engine is red
+            assert engine.analyze(after, 2)[-1] == "bestmove h7e7"
+            assert engine.history.moves == ["h2e2"]
+    finally:
+        pool.close()
+
+
+def test_pool_replaces_dead_engine():
+    """已退出的引擎进程在借出时被替换"""
+    pool = EnginePool(FAKE_ENGINE, size=1)
+    try:
+        with pool.checkout() as engine:
+            old_pid = engine.process.pid
+            engine.process.kill()
+            engine.process.wait()
+        with pool.checkout() as engine:
+            assert engine.process.pid != old_pid
+            assert engine.analyze(TEST_FEN, 2)[-1] == "bestmove h2e2"
+    finally:
+        pool.close()
+
+
+def test_shared_pool_per_engine_path():
+    """同一引擎路径共享同一个进程池"""
+    pool = get_engine_pool(FAKE_ENGINE, size=1)
+    assert get_engine_pool(str(FAKE_ENGINE)) is pool
+    pool.close()
+
+
+def test_pool_splits_threads_between_engines():
+    """每个引擎的Threads按池大小分配"""
+    pool = EnginePool(FAKE_ENGINE, size=2, threads=3)
+    try:
+        with pool.checkout() as engine:
+            lines = engine.analyze(TEST_FEN, 1)
+        assert any(line.startswith("info string") and "Threads=3" in line for line in lines)
+    finally:
+        pool.close()
+
+
+def test_two_sides_search_concurrently():
+    """红黑双方同时在两个引擎上搜索，两次搜索的时间区间互相重叠"""
+    pool = EnginePool(FAKE_ENGINE, size=2, engine_args=["--depth-delay", "0.1"])
+    intervals = []
+
+    def search(fen):
+        with pool.checkout() as engine:
+            start = time.perf_counter()
+            move = engine.analyze(fen, 6)[-1]
+            intervals.append((start, time.perf_counter()))
+            return move
+
+    try:
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            moves = list(executor.map(search, [TEST_FEN, TEST_FEN.replace(' w', ' b')]))
+
+        assert moves == ["bestmove h2e2", "bestmove h7e7"]
+        # 串行执行时后一次搜索在前一次结束后才开始
+        assert max(start for start, _ in intervals) < min(end for _, end in intervals)
+    finally:
+        pool.close()
+
+
+def test_default_options_follow_machine_size(tmp_path):
+    """Threads按核数平分，Hash为2的幂，存在NNUE文件时设置EvalFile"""
+    engine_path = tmp_path / "pikafish.exe"
+    options = default_engine_options(engine_path, engines=2)
+    assert options['Threads'] >= 1
+    assert 16 <= options['Hash'] <= 1024
+    assert options['Hash'] & (options['Hash'] - 1) == 0
+    assert 'EvalFile' not in options
+
+    (tmp_path / "pikafish.nnue").write_bytes(b"")
+    assert default_engine_options(engine_path)['EvalFile'] == str(tmp_path / "pikafish.nnue")
+
+
+def test_pool_applies_options_once_per_process(tmp_path):
+    """引擎参数在进程启动时设置，之后的分析不再重复发送"""
+    engine_path = tmp_path / "fake_uci_engine.py"
+    shutil.copy(FAKE_ENGINE, engine_path)
+    (tmp_path / "pikafish.nnue").write_bytes(b"")
+
+    pool = EnginePool(engine_path, size=1, options={'Hash': 64})
+    try:
+        with pool.checkout() as engine:
+            lines = engine.analyze(TEST_FEN, 1)
+            engine.analyze(TEST_FEN, 1)
+            assert engine.options['Hash'] == 64
+        info = next(line for line in lines if line.startswith("info string"))
+        assert "Hash=64" in info
+        assert f"EvalFile={tmp_path / 'pikafish.nnue'}" in info
+    finally:
+        pool.close()
+
+
+def test_hung_engine_swapped_for_standby():
+    """搜索中卡死的引擎由心跳探测结束，下一次借出立即换上备用进程"""
+    pool = EnginePool(FAKE_ENGINE, size=1, engine_args=["--hang-on-go"], standby=1,
+                      heartbeat=0.1, probe_timeout=0.2, watchdog_interval=None)
+    try:
+        with pool.checkout() as engine:
+            hung_pid = engine.process.pid
+            standby_pid = pool._standby[0].process.pid
+            with pytest.raises(EngineHung):  # 心跳探测先于搜索超时（EngineTimeout）触发
+                engine.analyze(TEST_FEN, depth=5, timeout=30)
+
+        with pool.checkout() as engine:
+            assert engine.process.pid == standby_pid != hung_pid
+            assert engine.is_alive()
+        assert pool.restarts == 1
+    finally:
+        pool.close()
+
+
+def test_heartbeat_keeps_slow_engine():
+    """搜索慢但响应isready的引擎不会被误杀"""
+    pool = EnginePool(FAKE_ENGINE, size=1, engine_args=["--depth-delay", "0.3"], standby=0,
+                      heartbeat=0.1, probe_timeout=0.5, watchdog_interval=None)
+    try:
+        with pool.checkout() as engine:
+            assert engine.analyze(TEST_FEN, depth=2)[-1] == "bestmove h2e2"
+            assert engine.is_alive()
+            engine.is_ready(1)
+        assert pool.restarts == 0
+    finally:
+        pool.close()
+
+
+def test_watchdog_replaces_dead_idle_engine():
+    """看门狗在借出之前就替换掉已退出的空闲引擎"""
+    pool = EnginePool(FAKE_ENGINE, size=1, standby=1, watchdog_interval=0.1)
+    try:
+        engine = pool.acquire()
+        pool.release(engine)
+        engine.process.kill()
+        engine.process.wait()
+
+        deadline = time.monotonic() + 2
+        while pool.restarts == 0 and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert pool.restarts == 1
+        with pool.checkout() as replacement:
+            assert replacement is not engine
+            assert replacement.is_alive()
+    finally:
+        pool.close()
+
+
+
+def test_watchdog_keeps_engine_it_cannot_replace():
+    """无法启动替换进程时失效的引擎留在池中，之后借出时再替换，进程池不会变小"""
+    pool = EnginePool(FAKE_ENGINE, size=1, standby=0, watchdog_interval=0.05)
+    spawn = pool._spawn
+    attempts = []
+
+    def failing_spawn():
+        attempts.append(1)
+        raise EngineError("无法启动引擎")
+
+    try:
+        engine = pool.acquire()
+        pool.release(engine)
+        pool._spawn = failing_spawn
+        engine.process.kill()
+        engine.process.wait()
+
+        deadline = time.monotonic() + 2
+        while len(attempts) < 2 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        assert len(attempts) >= 2  # 看门狗每轮都重新尝试
+        assert pool.restarts == 0
+
+        pool._spawn = spawn
+        with pool.checkout(timeout=2) as replacement:
+            assert replacement is not engine
+            assert replacement.is_alive()
+        assert pool.restarts >= 1
+    finally:
+        pool.close()
+
+def test_search_watchdog_probes_then_declares_hung():
+    """无输出超过heartbeat时请求探测，探测超时判定卡死"""
+    from pikafish_engine import SearchWatchdog, EngineTimeout
+    killed = []
+    watchdog = SearchWatchdog(timeout=10, heartbeat=1, probe_timeout=0.5, now=0)
+    assert watchdog.next_wait(0) == 1
+    assert watchdog.expired(1, lambda: killed.append(True)) is True  # 发送isready
+    assert watchdog.probing and watchdog.next_wait(1) == 0.5
+    assert watchdog.consume("readyok") and not watchdog.probing
+    assert not watchdog.consume("info depth 3")
+    assert watchdog.expired(2, lambda: killed.append(True)) is True
+    with pytest.raises(EngineHung):
+        watchdog.expired(2.5, lambda: killed.append(True))
+    assert killed == [True]
+    with pytest.raises(EngineTimeout):
+        SearchWatchdog(timeout=3, heartbeat=None, probe_timeout=1, now=0).expired(3, lambda: killed.append(True))
+
+
+def test_pick_idle_engine_and_take_spare():
+    from pikafish_engine import pick_idle_engine, take_spare, GameHistory
+
+    class Stub:
+        def __init__(self, alive=True):
+            self.history = GameHistory()
+            self.alive = alive
+
+        def is_alive(self):
+            return self.alive
+
+    red, black = Stub(), Stub()
+    red.history.position_commands(TEST_FEN)
+    after = "rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C2C4/9/RNBAKABNR b"
+    assert pick_idle_engine([red, black], after) == 0
+    assert pick_idle_engine([red, black]) == 1
+
+    live, dead = Stub(), Stub(alive=False)
+    standby = [live, dead]
+    assert take_spare(standby) == (live, [dead])
+    assert take_spare(standby) == (None, [])
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+持续分析测试
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pikafish_engine import LiveAnalysis
+
+FAKE_ENGINE = Path(__file__).parent / "fake_uci_engine.py"
+TEST_FEN = "rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w"
+
+
+def wait_for_depth(live, fen, depth, timeout=3):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        info = live.update(fen)
+        if info and info['depth'] >= depth:
+            return info
+        time.sleep(0.01)
+    raise AssertionError(f"持续分析未在{timeout}秒内达到深度{depth}")
+
+
+def test_same_position_gets_deeper():
+    """同一局面停留越久，返回的结果越深"""
+    live = LiveAnalysis(FAKE_ENGINE, ["--depth-delay", "0.01"])
+    try:
+        assert live.update(TEST_FEN) is None
+        first = wait_for_depth(live, TEST_FEN, 3)
+        second = wait_for_depth(live, TEST_FEN, first['depth'] + 5)
+        assert second['pv'][0] == "h2e2"
+    finally:
+        live.close()
+
+
+def test_position_change_retargets_search():
+    """局面变化时停止旧搜索，改为搜索新局面"""
+    seen = []
+    live = LiveAnalysis(FAKE_ENGINE, ["--depth-delay", "0.01"],
+                        on_info=lambda fen, info: seen.append((fen, info['pv'][0])))
+    try:
+        live.update(TEST_FEN)
+        wait_for_depth(live, TEST_FEN, 3)
+
+        black_fen = TEST_FEN.replace(" w", " b")
+        assert live.update(black_fen) is None
+        info = wait_for_depth(live, black_fen, 2)
+        assert info['pv'][0] == "h7e7"
+
+        # 换局面之后不再收到旧局面的结果
+        switch = seen.index((black_fen, "h7e7"))
+        assert all(fen == black_fen for fen, _ in seen[switch:])
+    finally:
+        live.close()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+开局库测试
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from opening_book import OpeningBook, BookBuilder, build_book, encode_move, decode_move, position_key
+
+TEST_FEN = "rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w"
+AFTER_CENTRAL_CANNON = "rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C2C4/9/RNBAKABNR b"
+
+
+def test_move_encoding_roundtrip():
+    for move in ("h2e2", "a0a1", "i9i8", "e3e4"):
+        assert decode_move(encode_move(move)) == move
+
+
+def test_position_key_depends_on_side():
+    assert position_key(TEST_FEN) == position_key(TEST_FEN.split()[0], 'w')
+    assert position_key(TEST_FEN) != position_key(TEST_FEN.replace(' w', ' b'))
+
+
+def test_games_build_weighted_book(tmp_path):
+    """同一局面的走法按出现次数排序，后续局面按走法推演"""
+    builder = BookBuilder()
+    builder.add_game(["h2e2", "h9g7"])
+    builder.add_game(["h2e2", "b9c7"])
+    builder.add_game(["b2e2"])
+    path = tmp_path / "book.bin"
+    assert builder.write(path) == 4
+
+    book = OpeningBook(path)
+    try:
+        entries = book.lookup(TEST_FEN)
+        assert [entry.move for entry in entries] == ["h2e2", "b2e2"]
+        assert [entry.weight for entry in entries] == [2, 1]
+        assert entries[0].score is None
+
+        replies = {entry.move for entry in book.lookup(AFTER_CENTRAL_CANNON)}
+        assert replies == {"h9g7", "b9c7"}
+        assert book.best_move(TEST_FEN.replace(' w', ' b')) is None
+    finally:
+        book.close()
+
+
+def test_illegal_moves_not_recorded(tmp_path):
+    """棋谱中不合法的走法（如走法与局面不符）及其后的局面都不收录"""
+    builder = BookBuilder()
+    builder.add_game(["h2e2", "h2e2", "h9g7"])  # 第二步红方又走一次，h2已经没有棋子
+    builder.add_game(["a0a5"])  # 车被兵挡住
+    builder.add_analysis({'fen': TEST_FEN, 'bestmove': "e0e2"})
+    path = tmp_path / "book.bin"
+    assert builder.write(path) == 1
+
+    book = OpeningBook(path)
+    try:
+        assert [entry.move for entry in book.lookup(TEST_FEN)] == ["h2e2"]
+        assert book.lookup(AFTER_CENTRAL_CANNON) == []
+    finally:
+        book.close()
+
+
+def test_build_from_analysis_output(tmp_path):
+    """batch_analyze 的JSONL输出可以直接作为开局库输入，评分一并保存"""
+    source = tmp_path / "results.jsonl"
+    source.write_text(
+        '{"index": 0, "fen": "%s", "bestmove": "h2e2", "score_cp": 35}\n'
+        '{"index": 1, "fen": "%s", "error": "FEN中缺少将帅"}\n'
+        '# 注释\n'
+        'h2e2 h9g7\n' % (TEST_FEN, TEST_FEN),
+        encoding='utf-8')
+    path = tmp_path / "book.bin"
+    assert build_book([source], path) == 2
+
+    book = OpeningBook(path)
+    try:
+        best = book.best_move(TEST_FEN)
+        assert best.move == "h2e2"
+        assert best.weight == 2
+        assert best.score == 35
+        assert len(book) == 2
+    finally:
+        book.close()
+
+
+def test_invalid_file_rejected(tmp_path):
+    path = tmp_path / "book.bin"
+    path.write_bytes(b"not a book file!")
+    with pytest.raises(ValueError):
+        OpeningBook(path)
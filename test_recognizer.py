@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+识别器测试（不需要模型文件的部分）
+"""
+
+import sys
+import threading
+import tracemalloc
+from pathlib import Path
+from concurrent.futures import Future
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+pytest.importorskip("cv2")
+pytest.importorskip("onnxruntime")
+
+import cv2
+import numpy as np
+import onnxruntime as ort
+
+from cchess_deep_recognizer import CChessDeepRecognizer, BoundSession
+
+
+def test_background_loading_returns_immediately(tmp_path, monkeypatch):
+    """后台加载时构造函数立即返回，加载结果通过ready获取"""
+    release = threading.Event()
+
+    def slow_load(self):
+        release.wait(5)
+        return False
+
+    monkeypatch.setattr(CChessDeepRecognizer, 'load_models', slow_load)
+    recognizer = CChessDeepRecognizer(tmp_path, load_in_background=True)
+    # 加载被阻塞时构造函数已经返回
+    assert not recognizer.ready.done()
+    release.set()
+    assert recognizer.wait_ready(timeout=5) is False
+
+
+def test_recognize_waits_for_models(tmp_path):
+    recognizer = CChessDeepRecognizer(tmp_path, load_in_background=True)
+    assert recognizer.recognize(np.zeros((100, 100, 3), dtype=np.uint8)) is None
+    assert recognizer.ready.done()
+    assert recognizer.pose_model is None and recognizer.classifier_model is None
+
+
+TEST_FEN = "rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w"
+
+
+class FakeInput:
+    def __init__(self, batch_size):
+        self.name = "input"
+        self.shape = [batch_size, 3, 0, 0]
+
+
+class FakeSession:
+    """记录每次调用的batch大小"""
+
+    def __init__(self, batch_size, compute):
+        self.inputs = [FakeInput(batch_size)]
+        self.compute = compute
+        self.calls = []
+
+    def get_inputs(self):
+        return self.inputs
+
+    def run(self, output_names, feeds):
+        batch = feeds["input"]
+        self.calls.append(len(batch))
+        return self.compute(batch)
+
+
+def board_predictions(fen, class_names, class_to_fen):
+    """FEN转换为分类模型的 (90, 16) 输出"""
+    index_of = {class_to_fen[name]: index for index, name in enumerate(class_names)}
+    chars = []
+    for row in fen.split()[0].split('/'):
+        for char in row:
+            chars.extend('.' * int(char) if char.isdigit() else char)
+    predictions = np.zeros((90, 16), dtype=np.float32)
+    predictions[np.arange(90), [index_of[char] for char in chars]] = 1.0
+    return predictions
+
+
+def test_run_batched_chunks_fixed_batch(tmp_path):
+    recognizer = CChessDeepRecognizer(tmp_path)
+    batch = np.arange(5 * 3, dtype=np.float32).reshape(5, 3)
+
+    fixed = FakeSession(2, lambda x: [x * 2, x.sum(axis=1)])
+    doubled, sums = recognizer.run_batched(fixed, batch)
+    assert fixed.calls == [2, 2, 2]  # 最后一块补零
+    np.testing.assert_array_equal(doubled, batch * 2)
+    np.testing.assert_array_equal(sums, batch.sum(axis=1))
+
+    dynamic = FakeSession('batch', lambda x: [x * 2])
+    np.testing.assert_array_equal(recognizer.run_batched(dynamic, batch)[0], batch * 2)
+    assert dynamic.calls == [5]
+
+
+def test_recognize_batch_returns_per_image_results(tmp_path, monkeypatch):
+    """亮图识别为初始局面，暗图识别为缺少将帅的空棋盘（不合法，返回None）"""
+    monkeypatch.chdir(tmp_path)
+    recognizer = CChessDeepRecognizer(tmp_path)
+    start = board_predictions(TEST_FEN, recognizer.class_names, recognizer.class_to_fen)
+    empty = board_predictions("9/9/9/9/9/9/9/9/9/9 w", recognizer.class_names, recognizer.class_to_fen)
+
+    def pose(batch):
+        # 4个角点依次为左上、右上、右下、左下
+        simcc_x = np.zeros((len(batch), 4, 512), dtype=np.float32)
+        simcc_y = np.zeros((len(batch), 4, 512), dtype=np.float32)
+        simcc_x[:, [0, 1, 2, 3], [0, 511, 511, 0]] = 1.0
+        simcc_y[:, [0, 1, 2, 3], [0, 0, 511, 511]] = 1.0
+        return [simcc_x, simcc_y]
+
+    def classify(batch):
+        return [np.stack([start if item.mean() > 0 else empty for item in batch])]
+
+    recognizer.pose_model = FakeSession('batch', pose)
+    recognizer.classifier_model = FakeSession(1, classify)
+    recognizer.ready = Future()
+    recognizer.ready.set_result(True)
+
+    bright = np.full((200, 180, 3), 255, dtype=np.uint8)
+    dark = np.zeros((200, 180, 3), dtype=np.uint8)
+    results = recognizer.recognize_batch([bright, dark, bright])
+
+    assert results == [TEST_FEN, None, TEST_FEN]
+    assert "缺少红帅" in recognizer.last_batch_problems[1]
+    assert recognizer.pose_model.calls == [3]
+    assert recognizer.classifier_model.calls == [1, 1, 1]
+    assert recognizer.recognize_batch([]) == []
+
+
+def varint(value):
+    encoded = bytearray()
+    while True:
+        byte, value = value & 0x7f, value >> 7
+        encoded.append(byte | (0x80 if value else 0))
+        if not value:
+            return bytes(encoded)
+
+
+def field(number, value):
+    """protobuf字段：int按varint编码，str/bytes按长度前缀编码"""
+    if isinstance(value, int):
+        return varint(number << 3) + varint(value)
+    if isinstance(value, str):
+        value = value.encode()
+    return varint(number << 3 | 2) + varint(len(value)) + value
+
+
+def identity_model(shape):
+    """直接编码一个 output = Identity(input) 的float32 ONNX模型（不依赖onnx包）"""
+    def tensor_info(name):
+        dims = b''.join(field(1, field(1, dim)) for dim in shape)
+        return field(1, name) + field(2, field(1, field(1, 1) + field(2, dims)))
+
+    node = field(1, 'input') + field(2, 'output') + field(4, 'Identity')
+    graph = field(1, node) + field(2, 'identity') + field(11, tensor_info('input')) + field(12, tensor_info('output'))
+    return field(1, 8) + field(7, graph) + field(8, field(2, 13))
+
+
+def peak_per_frame(run_frame, frames=5):
+    """预热后逐帧运行，返回单帧内tracemalloc记录的最大新增内存（字节）"""
+    run_frame()
+    tracemalloc.start()
+    try:
+        peak = 0
+        for _ in range(frames):
+            current = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            run_frame()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+        return peak
+    finally:
+        tracemalloc.stop()
+
+
+def test_preprocess_matches_reference(tmp_path):
+    recognizer = CChessDeepRecognizer(tmp_path)
+    image = np.random.default_rng(0).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+
+    img = cv2.resize(image, (256, 256)).astype(np.float32) / 255.0
+    img = (img - np.array([0.485, 0.456, 0.406])) / np.array([0.229, 0.224, 0.225])
+    expected = np.transpose(img, (2, 0, 1))[None]
+    np.testing.assert_allclose(recognizer.preprocess_pose_image(image), expected, atol=1e-4)
+
+    img = cv2.cvtColor(cv2.resize(image, (280, 315)), cv2.COLOR_BGR2RGB)
+    img = (img - np.array([123.675, 116.28, 103.53])) / np.array([58.395, 57.12, 57.375])
+    expected = np.transpose(img, (2, 0, 1))[None]
+    out = np.empty((1, 3, 315, 280), dtype=np.float32)
+    assert recognizer.preprocess_classifier_image(image, out=out) is out
+    np.testing.assert_allclose(out, expected, atol=1e-4)
+
+
+def test_bound_session_writes_into_preallocated_buffers(tmp_path):
+    """IOBinding绑定后，预处理和推理在稳定状态下几乎不分配内存"""
+    session = ort.InferenceSession(identity_model([1, 3, 256, 256]), providers=['CPUExecutionProvider'])
+    bound = BoundSession(session, (1, 3, 256, 256))
+    recognizer = CChessDeepRecognizer(tmp_path)
+    image = np.random.default_rng(0).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+
+    def frame():
+        recognizer.preprocess_pose_image(image, out=bound.input)
+        return bound.run()
+
+    outputs = frame()
+    assert outputs is bound.outputs
+    np.testing.assert_array_equal(outputs[0], bound.input)
+    # 旧实现每帧分配约4MB（resize、归一化、转置各一份float数组）
+    assert peak_per_frame(frame) < 64 * 1024
+
+
+def test_recognize_steady_state_allocation(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr('builtins.print', lambda *args, **kwargs: None)
+    recognizer = CChessDeepRecognizer(tmp_path)
+    simcc_x = np.zeros((1, 4, 512), dtype=np.float32)
+    simcc_y = np.zeros((1, 4, 512), dtype=np.float32)
+    simcc_x[:, [0, 1, 2, 3], [0, 511, 511, 0]] = 1.0
+    simcc_y[:, [0, 1, 2, 3], [0, 0, 511, 511]] = 1.0
+    predictions = board_predictions(TEST_FEN, recognizer.class_names, recognizer.class_to_fen)[None]
+    recognizer.pose_model = FakeSession(1, lambda batch: [simcc_x, simcc_y])
+    recognizer.classifier_model = FakeSession(1, lambda batch: [predictions])
+    recognizer.ready = Future()
+    recognizer.ready.set_result(True)
+    image = np.random.default_rng(0).integers(0, 256, (480, 640, 3), dtype=np.uint8)
+
+    assert recognizer.recognize(image) == TEST_FEN
+    assert peak_per_frame(lambda: recognizer.recognize(image)) < 128 * 1024
+
+
+def draw_board(shift=0):
+    """画一个简化的棋盘：10条横线、9条竖线和几个棋子"""
+    image = np.full((600, 560, 3), (90, 170, 220), dtype=np.uint8)
+    left, top = 60 + shift, 50 + shift
+    for col in range(9):
+        cv2.line(image, (left + col * 55, top), (left + col * 55, top + 9 * 55), (0, 0, 0), 2)
+    for row in range(10):
+        cv2.line(image, (left, top + row * 55), (left + 8 * 55, top + row * 55), (0, 0, 0), 2)
+    for col, row in [(1, 2), (4, 0), (4, 9), (7, 7)]:
+        cv2.circle(image, (left + col * 55, top + row * 55), 22, (30, 30, 200), -1)
+    return image
+
+
+def tracking_recognizer(tmp_path, classifier_fen=TEST_FEN, **kwargs):
+    """关键点模型固定输出 draw_board() 的4个角点"""
+    recognizer = CChessDeepRecognizer(tmp_path, **kwargs)
+    simcc_x = np.zeros((1, 4, 512), dtype=np.float32)
+    simcc_y = np.zeros((1, 4, 512), dtype=np.float32)
+    for index, (x, y) in enumerate([(60, 50), (500, 50), (500, 545), (60, 545)]):
+        simcc_x[0, index, round(x * 512 / 560)] = 1.0
+        simcc_y[0, index, round(y * 512 / 600)] = 1.0
+    predictions = board_predictions(classifier_fen, recognizer.class_names, recognizer.class_to_fen)[None]
+    recognizer.pose_model = FakeSession(1, lambda batch: [simcc_x, simcc_y])
+    recognizer.classifier_model = FakeSession(1, lambda batch: [predictions])
+    recognizer.ready = Future()
+    recognizer.ready.set_result(True)
+    return recognizer
+
+
+def test_tracking_skips_pose_model_until_refresh(tmp_path):
+    recognizer = tracking_recognizer(tmp_path, track_board=True, refresh_interval=3)
+    image = draw_board()
+    assert [recognizer.recognize(image) for _ in range(5)] == [TEST_FEN] * 5
+    # 第1帧检测关键点，第2~4帧沿用，第5帧到期刷新
+    assert recognizer.pose_model.calls == [1, 1]
+    assert recognizer.pose_runs == 2 and recognizer.tracked_frames == 3
+    assert recognizer.classifier_model.calls == [1] * 5
+
+
+def test_tracking_redetects_when_board_moves(tmp_path):
+    recognizer = tracking_recognizer(tmp_path, track_board=True)
+    recognizer.recognize(draw_board())
+    recognizer.recognize(draw_board())
+    assert recognizer.pose_runs == 1
+    recognizer.recognize(draw_board(shift=6))
+    assert recognizer.pose_runs == 2
+    recognizer.recognize(np.zeros((300, 300, 3), dtype=np.uint8))  # 尺寸变化
+    assert recognizer.pose_runs == 3
+
+
+def test_tracking_dropped_after_failed_recognition(tmp_path):
+    recognizer = tracking_recognizer(tmp_path, classifier_fen="9/9/9/9/9/9/9/9/9/9 w", track_board=True)
+    image = draw_board()
+    assert recognizer.recognize(image) is None
+    assert recognizer.recognize(image) is None
+    assert recognizer.pose_runs == 2 and recognizer.tracked is None
+
+
+def test_tracking_off_by_default(tmp_path):
+    recognizer = tracking_recognizer(tmp_path)
+    image = draw_board()
+    for _ in range(3):
+        recognizer.recognize(image)
+    assert recognizer.pose_runs == 3 and recognizer.tracked_frames == 0
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+识别模型会话参数测试
+"""
+
+import sys
+import json
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+pytest.importorskip("cv2")
+ort = pytest.importorskip("onnxruntime")
+
+from cchess_deep_recognizer import (CChessDeepRecognizer, default_session_options, merge_session_options,
+                                    build_session_options)
+
+
+def test_defaults_leave_cores_for_engine():
+    options = default_session_options()
+    assert 1 <= options['intra_op_num_threads'] <= 4
+    assert options['execution_mode'] == 'sequential'
+    assert options['providers'] == ['CPUExecutionProvider']
+
+
+def test_model_sections_override_shared_options():
+    merged = merge_session_options({'intra_op_num_threads': 2, 'classifier': {'intra_op_num_threads': 3}},
+                                   {'graph_optimization_level': 'basic'})
+    assert merged['pose']['intra_op_num_threads'] == 2
+    assert merged['classifier']['intra_op_num_threads'] == 3
+    assert merged['pose']['graph_optimization_level'] == 'basic'
+    assert merged['classifier']['graph_optimization_level'] == 'basic'
+
+
+def test_unknown_option_rejected():
+    with pytest.raises(ValueError):
+        merge_session_options({'intra_threads': 2})
+    with pytest.raises(ValueError):
+        merge_session_options({'pose': {'threads': 2}})
+
+
+def test_build_session_options():
+    options = dict(default_session_options(), graph_optimization_level='extended', execution_mode='parallel',
+                   intra_op_num_threads=2, enable_cpu_mem_arena=False,
+                   providers=['NoSuchExecutionProvider', 'CPUExecutionProvider'])
+    session_options, providers = build_session_options(options)
+    assert session_options.graph_optimization_level == ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED
+    assert session_options.execution_mode == ort.ExecutionMode.ORT_PARALLEL
+    assert session_options.intra_op_num_threads == 2
+    assert not session_options.enable_cpu_mem_arena
+    assert providers == ['CPUExecutionProvider']
+
+    with pytest.raises(ValueError):
+        build_session_options(dict(options, graph_optimization_level='max'))
+
+
+def test_settings_file_and_constructor(tmp_path):
+    """模型目录下的 session_options.json 生效，构造参数中的同名项优先"""
+    (tmp_path / "session_options.json").write_text(
+        json.dumps({'intra_op_num_threads': 3, 'pose': {'execution_mode': 'parallel'}}), encoding='utf-8')
+    recognizer = CChessDeepRecognizer(tmp_path, session_options={'intra_op_num_threads': 1})
+    assert recognizer.pose_model is None  # 没有模型文件
+    assert recognizer.session_options['pose']['intra_op_num_threads'] == 1
+    assert recognizer.session_options['pose']['execution_mode'] == 'parallel'
+    assert recognizer.session_options['classifier']['execution_mode'] == 'sequential'
+
+
+def test_invalid_settings_file_ignored(tmp_path):
+    (tmp_path / "session_options.json").write_text('{"threads": 8}', encoding='utf-8')
+    recognizer = CChessDeepRecognizer(tmp_path)
+    assert recognizer.session_options['pose'] == default_session_options()
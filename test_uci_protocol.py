@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+UCI协议客户端测试
+验证握手流程和以bestmove为准的搜索完成判断
+"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+import pytest
+
+from pikafish_engine import (PikafishEngine, EngineError, parse_info_line, build_go_command,
+                             fit_movetime, extract_candidates, GameHistory)
+
+FAKE_ENGINE = Path(__file__).parent / "fake_uci_engine.py"
+TEST_FEN = "rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w"
+
+
+def test_handshake_reads_engine_name():
+    """启动时完成uci/uciok和isready/readyok握手"""
+    engine = PikafishEngine(FAKE_ENGINE)
+    try:
+        assert engine.name == "Pikafish (fake)"
+        assert engine.is_alive()
+        engine.is_ready(timeout=1)
+    finally:
+        engine.close()
+
+
+def test_shallow_search_returns_immediately():
+    """浅层搜索在收到bestmove后立即返回，没有固定等待"""
+    engine = PikafishEngine(FAKE_ENGINE)
+    try:
+        start = time.perf_counter()
+        lines = engine.analyze(TEST_FEN, depth=4, timeout=10)
+        elapsed = time.perf_counter() - start
+
+        assert lines[-1] == "bestmove h2e2"
+        assert sum(1 for line in lines if line.startswith("info depth")) == 4
+        assert elapsed < 5  # 远小于超时时间，说明是收到bestmove返回而不是等到超时
+    finally:
+        engine.close()
+
+
+def test_search_uses_side_to_move():
+    """position fen 命令携带走棋方"""
+    engine = PikafishEngine(FAKE_ENGINE)
+    try:
+        lines = engine.analyze(TEST_FEN.replace(" w", " b"), depth=2)
+        assert lines[-1] == "bestmove h7e7"
+    finally:
+        engine.close()
+
+
+def test_engine_crash_fails_fast():
+    """引擎在搜索中退出时立即报错，而不是等到超时"""
+    engine = PikafishEngine(FAKE_ENGINE, ["--crash-on-go"])
+    try:
+        start = time.perf_counter()
+        with pytest.raises(EngineError):
+            engine.analyze(TEST_FEN, depth=4, timeout=10)
+        assert time.perf_counter() - start < 2
+        assert not engine.is_alive()
+    finally:
+        engine.close()
+
+
+def test_parse_info_line():
+    info = parse_info_line("info depth 6 seldepth 8 multipv 1 score cp 35 nodes 6000 "
+                           "nps 600000 hashfull 1 time 10 pv h2e2 h9g7")
+    assert info == {'depth': 6, 'seldepth': 8, 'multipv': 1, 'score_cp': 35, 'nodes': 6000,
+                    'nps': 600000, 'hashfull': 1, 'time': 10, 'pv': ['h2e2', 'h9g7']}
+    assert parse_info_line("info depth 3 score mate -2 pv a0a1")['score_mate'] == -2
+    assert parse_info_line("bestmove h2e2") is None
+
+
+def test_parse_info_line_all_fields():
+    """Pikafish输出的其他字段：边界分、WDL、当前走法、string"""
+    info = parse_info_line("info depth 12 seldepth 17 multipv 1 score cp 41 lowerbound wdl 153 830 17 "
+                           "nodes 81234 nps 950000 hashfull 12 tbhits 0 time 85 pv h2e2 h9g7 h0g2")
+    assert info['score_cp'] == 41 and info['bound'] == 'lower'
+    assert info['wdl'] == (153, 830, 17)
+    assert info['tbhits'] == 0 and info['pv'] == ['h2e2', 'h9g7', 'h0g2']
+
+    info = parse_info_line("info depth 20 currmove b2e2 currmovenumber 3")
+    assert info == {'depth': 20, 'currmove': 'b2e2', 'currmovenumber': 3}
+    assert parse_info_line("info depth 20 currmove b2e2 currmovenumber 3", require_pv=True) is None
+
+    assert parse_info_line("info string NNUE evaluation using pikafish.nnue") == \
+        {'string': "NNUE evaluation using pikafish.nnue"}
+    # 截断的行保留已解析的字段
+    assert parse_info_line("info depth 5 score cp") == {'depth': 5}
+
+
+def test_extract_candidates_keeps_last_line_per_index():
+    lines = [
+        "info depth 1 multipv 1 score cp 5 pv h2e2",
+        "info depth 1 multipv 2 score cp 3 pv b2e2",
+        "info depth 2 multipv 1 score cp 9 upperbound pv b0c2",
+        "info depth 2 multipv 1 score cp 8 pv h2e2 h9g7",
+        "info depth 3 currmove c3c4 currmovenumber 4",
+        "bestmove h2e2 ponder h9g7",
+    ]
+    candidates = extract_candidates(lines)
+    assert [(c['move'], c['depth']) for c in candidates] == [('h2e2', 2), ('b2e2', 1)]
+
+
+def test_search_streams_each_depth():
+    """搜索过程中逐层回调，而不是等搜索结束"""
+    engine = PikafishEngine(FAKE_ENGINE, ["--depth-delay", "0.05"])
+    try:
+        start = time.perf_counter()
+        arrivals = []
+
+        def on_info(info):
+            arrivals.append((info['depth'], info['pv'][0], time.perf_counter() - start))
+
+        lines = engine.analyze(TEST_FEN, depth=6, on_info=on_info)
+        total = time.perf_counter() - start
+
+        assert [depth for depth, _, _ in arrivals] == [1, 2, 3, 4, 5, 6]
+        assert all(move == "h2e2" for _, move, _ in arrivals)
+        assert arrivals[0][2] < total / 2  # 第一层结果远早于搜索结束
+        assert lines[-1] == "bestmove h2e2"
+    finally:
+        engine.close()
+
+
+def test_build_go_command():
+    assert build_go_command(8) == "go depth 8"
+    assert build_go_command(movetime=800) == "go movetime 800"
+    assert build_go_command(nodes=50000) == "go nodes 50000"
+    assert build_go_command(12, movetime=500) == "go depth 12 movetime 500"
+    assert build_go_command() == "go depth 8"
+
+
+def test_fit_movetime():
+    assert fit_movetime(1.0) == 700
+    assert fit_movetime(0.1) == 100
+
+
+def test_movetime_search_respects_budget():
+    """限时搜索在预算内返回最佳走法"""
+    engine = PikafishEngine(FAKE_ENGINE, ["--depth-delay", "0.02"])
+    try:
+        start = time.perf_counter()
+        lines = engine.analyze(TEST_FEN, movetime=200)
+        elapsed = time.perf_counter() - start
+
+        assert lines[-1] == "bestmove h2e2"
+        assert elapsed >= 0.2  # 引擎用满限时才返回
+        assert 1 < sum(1 for line in lines if line.startswith("info depth")) < 100
+    finally:
+        engine.close()
+
+
+def test_overrunning_search_is_stopped_at_deadline():
+    """超过时限仍未结束的搜索由客户端发送stop，并返回当前最佳走法"""
+    engine = PikafishEngine(FAKE_ENGINE, ["--depth-delay", "0.05"])
+    try:
+        lines = engine.analyze(TEST_FEN, depth=100, timeout=0.3)
+        depths = [parse_info_line(line)['depth'] for line in lines if line.startswith("info depth")]
+
+        assert lines[-1] == "bestmove h2e2"
+        assert 0 < len(depths) and max(depths) < 100  # 搜索被stop提前结束
+        assert engine.is_alive()
+    finally:
+        engine.close()
+
+
+def test_node_limited_search():
+    engine = PikafishEngine(FAKE_ENGINE)
+    try:
+        lines = engine.analyze(TEST_FEN, nodes=5000)
+        assert sum(1 for line in lines if line.startswith("info depth")) == 5
+    finally:
+        engine.close()
+
+
+def test_multipv_returns_ranked_candidates():
+    """一次MultiPV搜索得到多个候选走法"""
+    engine = PikafishEngine(FAKE_ENGINE)
+    try:
+        candidates = extract_candidates(engine.analyze(TEST_FEN, depth=5, multipv=3))
+        assert [c['move'] for c in candidates] == ['h2e2', 'b2e2', 'b0c2']
+        assert [c['multipv'] for c in candidates] == [1, 2, 3]
+        assert all(c['depth'] == 5 for c in candidates)
+        assert candidates[0]['score_cp'] > candidates[2]['score_cp']
+
+        # 恢复单PV后只有一个候选
+        assert len(extract_candidates(engine.analyze(TEST_FEN, depth=3))) == 1
+    finally:
+        engine.close()
+
+
+AFTER_H2E2 = "rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C2C4/9/RNBAKABNR b"
+AFTER_H7E7 = "rnbakabnr/9/1c2c4/p1p1p1p1p/9/9/P1P1P1P1P/1C2C4/9/RNBAKABNR w"
+
+
+def test_history_continues_with_moves():
+    """连续两帧只差一步时以走法延续，新对局才发送ucinewgame"""
+    history = GameHistory()
+    assert history.position_commands(TEST_FEN) == ["ucinewgame", f"position fen {TEST_FEN}"]
+    assert history.position_commands(AFTER_H2E2) == [f"position fen {TEST_FEN} moves h2e2"]
+    assert history.position_commands(AFTER_H7E7) == [f"position fen {TEST_FEN} moves h2e2 h7e7"]
+    # 同一局面重复提交不改变记录
+    assert history.position_commands(AFTER_H7E7) == [f"position fen {TEST_FEN} moves h2e2 h7e7"]
+
+    # 漏掉了中间的帧：同一对局内重新设置起始局面，不清空置换表
+    later = "rnbakabnr/9/1c2c4/p1p1p1p1p/9/9/P1P1P1P1P/1C2C4/9/RNBAKAB1R w"
+    assert history.position_commands(later) == [f"position fen {later}"]
+
+    # 棋子复活（回到初始局面）说明开始了新对局
+    assert history.position_commands(TEST_FEN)[0] == "ucinewgame"
+
+
+def test_history_rejects_non_moves():
+    """走棋方不对或棋子凭空变化时不当作一步"""
+    history = GameHistory()
+    history.position_commands(TEST_FEN)
+    # 红方走棋但黑子动了
+    assert history.next_move("rnbakabnr/9/1c2c4/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR b") is None
+    # 走棋方没有轮换
+    assert history.next_move(AFTER_H2E2.replace(' b', ' w')) is None
+    assert history.continues(AFTER_H2E2)
+    assert history.continues(TEST_FEN)
+
+
+def test_engine_follows_move_continuation():
+    """引擎按延续的走法推断走棋方"""
+    engine = PikafishEngine(FAKE_ENGINE)
+    try:
+        assert engine.analyze(TEST_FEN, depth=2)[-1] == "bestmove h2e2"
+        assert engine.analyze(AFTER_H2E2, depth=2)[-1] == "bestmove h7e7"
+        assert engine.history.moves == ["h2e2"]
+    finally:
+        engine.close()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+走子规则测试
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent))
+
+from xiangqi_rules import Position, is_legal_move, validate_position
+from pikafish_engine import GameHistory
+from bench_movegen import run_perft_benchmark
+
+TEST_FEN = "rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w"
+
+
+@pytest.mark.parametrize("depth, expected", [(1, 44), (2, 1920), (3, 79666)])
+def test_perft_start_position(depth, expected):
+    assert Position.from_fen(TEST_FEN).perft(depth) == expected
+
+
+def test_perft_benchmark_checks_start_position():
+    results = run_perft_benchmark(2)
+    start = [entry for entry in results if 'expected' in entry]
+    assert [entry['nodes'] for entry in start] == [44, 1920]
+    assert len(results) == 8
+
+
+def test_horse_leg_and_elephant_eye():
+    position = Position.from_fen(TEST_FEN)
+    assert position.is_legal("b0c2")
+    assert not position.is_legal("b0d1")  # 马腿c0被相挡住
+    assert position.is_legal("c0e2")
+    blocked = Position.from_fen("rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/3N5/RNBAKAB1R w")
+    assert not blocked.is_legal("c0e2")  # 塞象眼
+
+
+def test_elephant_cannot_cross_river():
+    position = Position.from_fen("3k5/9/9/9/9/2B6/9/9/9/4K4 w")
+    assert sorted(move for move in position.legal_moves() if move.startswith("c4")) == ["c4a2", "c4e2"]
+
+
+def test_cannon_needs_screen_to_capture():
+    position = Position.from_fen(TEST_FEN)
+    assert position.is_legal("b2b9")  # 隔b7炮吃马
+    assert not position.is_legal("b2b7")
+    assert not position.is_legal("b2b8")
+
+
+def test_pawn_moves_sideways_only_after_river():
+    position = Position.from_fen(TEST_FEN)
+    assert [move for move in position.legal_moves() if move.startswith("a3")] == ["a3a4"]
+    crossed = Position.from_fen("3k5/9/9/4P4/9/9/9/9/9/4K4 w")
+    assert sorted(move for move in crossed.legal_moves() if move.startswith("e6")) == ["e6d6", "e6e7", "e6f6"]
+
+
+def test_king_and_advisor_stay_in_palace():
+    position = Position.from_fen("3k5/9/9/9/9/9/9/5K3/9/3A5 w")
+    moves = position.legal_moves()
+    assert sorted(move for move in moves if move.startswith("d0")) == ["d0e1"]
+    assert sorted(move for move in moves if move.startswith("f2")) == ["f2e2", "f2f1"]
+
+
+def test_flying_general():
+    """将帅不能照面：唯一的隔子不能离开中线，帅也不能走到对方将所在的列"""
+    screened = Position.from_fen("4k4/9/9/9/9/9/9/9/4C4/4K4 w")
+    assert screened.is_legal("e1e2")
+    assert not screened.is_legal("e1d1")
+
+    position = Position.from_fen("3k5/9/9/9/9/9/9/9/9/4K4 w")
+    assert not position.is_legal("e0d0")
+    assert position.is_legal("e0e1")
+
+
+def test_single_legal_move_and_mate_in_one():
+    assert Position.from_fen("4k4/R8/9/9/9/9/9/9/9/3K5 b").legal_moves() == ["e9f9"]
+
+    position = Position.from_fen("4k4/9/4P4/9/9/9/9/9/9/R2K5 w")
+    mate = position.mate_in_one()
+    assert mate == "a0a9"
+    position.push(mate)
+    assert position.in_check() and not position.has_legal_move()
+    assert position.pop() == mate
+    assert position.fen() == "4k4/9/4P4/9/9/9/9/9/9/R2K5 w"
+    assert Position.from_fen(TEST_FEN).mate_in_one() is None
+
+
+def test_invalid_input():
+    with pytest.raises(ValueError):
+        Position.from_fen("rnbakabnr/9/9 w")
+    with pytest.raises(ValueError):
+        Position.from_fen("rnbaxabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w")
+    with pytest.raises(ValueError):
+        Position.from_fen("9/9/9/9/9/9/9/9/9/4K4 w")  # 缺少黑将
+    assert not is_legal_move(TEST_FEN, "h2e9")
+    assert not is_legal_move(TEST_FEN, "zz")
+    assert is_legal_move(TEST_FEN, "h7e7", 'b')
+
+
+def test_history_ignores_illegal_displacement():
+    """识别错误造成的一步之差（车越子）不当作对局延续"""
+    history = GameHistory()
+    history.position_commands(TEST_FEN)
+    jumped = "rnbakabnr/9/1c5c1/p1p1p1p1p/R8/9/P1P1P1P1P/1C5C1/9/1NBAKABNR b"
+    assert history.next_move(jumped) is None
+    assert history.next_move("rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C2C4/9/RNBAKABNR b") == "h2e2"
+
+
+def test_validate_accepts_real_positions():
+    assert validate_position(TEST_FEN) == []
+    assert validate_position(TEST_FEN, 'b') == []
+    assert validate_position("2bakab2/9/2n1c1n2/p1p1p3p/6p2/2P6/P3P1P1P/2N1C1N2/9/2BAKAB2 w") == []
+
+
+@pytest.mark.parametrize("fen, problem", [
+    ("4k4/9/9/9/9/9/9/9/9/9", "缺少红帅"),
+    ("rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/R8/RNBAKABNR", "红车超过2个"),
+    ("4k4/9/9/9/9/9/9/9/9/K8", "红帅位置不合法: a0"),
+    ("3k5/4a4/4a4/9/9/9/9/9/9/4K4", "黑士位置不合法: e7"),
+    ("3k5/9/9/9/9/4B4/9/9/9/4K4", "红相位置不合法: e4"),
+    ("3k5/9/9/9/9/9/9/9/P8/4K4", "红兵位置不合法: a1"),
+    ("3k5/9/9/9/9/9/1P7/9/9/4K4", "红兵位置不合法: b3"),
+    ("4k4/9/9/9/9/9/9/9/9/4K4", "将帅照面"),
+    ("rnbakabnr/9/9 w", "FEN应有10行，实际为3行"),
+])
+def test_validate_rejects_impossible_positions(fen, problem):
+    assert problem in validate_position(fen)
+
+
+def test_validate_side_not_to_move_in_check():
+    fen = "3k5/9/9/9/9/9/9/9/9/3RK4"
+    assert validate_position(fen) == []
+    assert validate_position(fen, 'b') == []
+    assert validate_position(fen, 'w') == ["黑方正被将军却轮到对方走棋"]
@@ -0,0 +1,498 @@
+"""
+中国象棋走子规则
+纯Python实现的合法走法生成：九宫、河界、塞象眼、蹩马腿、炮架、将帅不能照面
+
+棋盘为90格的列表，格子编号 行*9+列，列0-8对应a-i，行0为红方底线（FEN的最后一行），
+与Pikafish的UCI坐标一致；各棋子的走法表在导入时预先计算，生成走法时不做边界判断
+"""
+
+FILES = "abcdefghi"
+RED_PIECES = frozenset("RNBAKCP")
+BLACK_PIECES = frozenset("rnbakcp")
+# 部分软件用 H/E 表示马/象
+PIECE_ALIASES = {'H': 'N', 'E': 'B', 'h': 'n', 'e': 'b'}
+
+ORTHOGONAL = ((1, 0), (-1, 0), (0, 1), (0, -1))
+DIAGONAL = ((1, 1), (1, -1), (-1, 1), (-1, -1))
+# (列偏移, 行偏移, 马腿列偏移, 马腿行偏移)
+HORSE_STEPS = ((1, 2, 0, 1), (-1, 2, 0, 1), (1, -2, 0, -1), (-1, -2, 0, -1),
+               (2, 1, 1, 0), (2, -1, 1, 0), (-2, 1, -1, 0), (-2, -1, -1, 0))
+
+
+def _on_board(file, rank):
+    return 0 <= file < 9 and 0 <= rank < 10
+
+
+def _in_palace(red, file, rank):
+    return 3 <= file <= 5 and (0 <= rank <= 2 if red else 7 <= rank <= 9)
+
+
+def _own_half(red, rank):
+    return rank <= 4 if red else rank >= 5
+
+
+def _build_tables():
+    """预先计算每个格子上各棋子的走法"""
+    rays = []  # 车/炮四个方向上依次经过的格子
+    horse = []  # (目标格, 马腿)
+    for square in range(90):
+        file, rank = square % 9, square // 9
+        square_rays = []
+        for df, dr in ORTHOGONAL:
+            ray = []
+            f, r = file + df, rank + dr
+            while _on_board(f, r):
+                ray.append(r * 9 + f)
+                f, r = f + df, r + dr
+            square_rays.append(tuple(ray))
+        rays.append(tuple(square_rays))
+        horse.append(tuple((r * 9 + f, (rank + lr) * 9 + file + lf)
+                           for df, dr, lf, lr in HORSE_STEPS
+                           for f, r in [(file + df, rank + dr)] if _on_board(f, r)))
+
+    elephant, advisor, king, pawn = {}, {}, {}, {}
+    for red in (True, False):
+        elephant[red], advisor[red], king[red], pawn[red] = [], [], [], []
+        forward = 1 if red else -1
+        for square in range(90):
+            file, rank = square % 9, square // 9
+            elephant[red].append(tuple(((rank + 2 * dr) * 9 + file + 2 * df, (rank + dr) * 9 + file + df)
+                                       for df, dr in DIAGONAL
+                                       if _on_board(file + 2 * df, rank + 2 * dr) and _own_half(red, rank + 2 * dr)))
+            advisor[red].append(tuple((rank + dr) * 9 + file + df for df, dr in DIAGONAL
+                                      if _in_palace(red, file + df, rank + dr)))
+            king[red].append(tuple((rank + dr) * 9 + file + df for df, dr in ORTHOGONAL
+                                   if _in_palace(red, file + df, rank + dr)))
+            steps = [(0, forward)]
+            if not _own_half(red, rank):
+                steps += [(1, 0), (-1, 0)]  # 过河兵可以横走
+            pawn[red].append(tuple((rank + dr) * 9 + file + df for df, dr in steps
+                                   if _on_board(file + df, rank + dr)))
+
+    # 反查表：从哪些格子出发的马/兵可以走到（攻击）某格
+    horse_attackers = [[] for _ in range(90)]
+    for square in range(90):
+        for target, leg in horse[square]:
+            horse_attackers[target].append((square, leg))
+    pawn_attackers = {}
+    for red in (True, False):
+        pawn_attackers[red] = [[] for _ in range(90)]
+        for square in range(90):
+            for target in pawn[red][square]:
+                pawn_attackers[red][target].append(square)
+
+    return (rays, horse, elephant, advisor, king, pawn,
+            [tuple(a) for a in horse_attackers],
+            {red: [tuple(a) for a in table] for red, table in pawn_attackers.items()})
+
+
+(RAYS, HORSE_MOVES, ELEPHANT_MOVES, ADVISOR_MOVES, KING_MOVES, PAWN_MOVES,
+ HORSE_ATTACKERS, PAWN_ATTACKERS) = _build_tables()
+
+
+def square_name(square):
+    """格子编号转为UCI坐标，如 7 -> "h0" """
+    return f"{FILES[square % 9]}{square // 9}"
+
+
+def move_to_uci(origin, target):
+    return square_name(origin) + square_name(target)
+
+
+def parse_uci(move):
+    """UCI走法转为 (起点, 终点) 格子编号，格式不对时抛出ValueError"""
+    if len(move) < 4 or move[0] not in FILES or move[2] not in FILES \
+            or not move[1].isdigit() or not move[3].isdigit():
+        raise ValueError(f"无效的走法: {move}")
+    return int(move[1]) * 9 + FILES.index(move[0]), int(move[3]) * 9 + FILES.index(move[2])
+
+
+def board_from_fen(fen):
+    """FEN的棋盘部分转为90格列表（空格为None），格式错误时抛出ValueError"""
+    parts = fen.split()
+    if not parts:
+        raise ValueError("FEN为空")
+    rows = parts[0].split('/')
+    if len(rows) != 10:
+        raise ValueError(f"FEN应有10行，实际为{len(rows)}行")
+
+    board = [None] * 90
+    for row_index, row in enumerate(rows):
+        rank = 9 - row_index
+        file = 0
+        for char in row:
+            if char.isdigit():
+                file += int(char)
+                continue
+            char = PIECE_ALIASES.get(char, char)
+            if char not in RED_PIECES and char not in BLACK_PIECES:
+                raise ValueError(f"FEN中有无效的棋子: {char}")
+            if file >= 9:
+                raise ValueError(f"FEN第{row_index + 1}行超过9列: {row}")
+            board[rank * 9 + file] = char
+            file += 1
+        if file != 9:
+            raise ValueError(f"FEN第{row_index + 1}行不是9列: {row}")
+    return board
+
+
+class Position:
+    """
+    一个局面及其合法走法
+
+    用法:
+        position = Position.from_fen("rnbakabnr/9/1c5c1/p1p1p1p1p/9/9/P1P1P1P1P/1C5C1/9/RNBAKABNR w")
+        position.legal_moves()      # ['a0a1', 'a0a2', ...]
+        position.is_legal("h2e2")   # True
+        position.push("h2e2")       # 走一步，pop() 撤销
+    """
+
+    __slots__ = ('board', 'side', 'red_king', 'black_king', '_stack')
+
+    def __init__(self, board, side='w'):
+        """
+        Args:
+            board: 90格列表，空格为None
+            side: 走棋方 'w' 或 'b'
+        """
+        if len(board) != 90:
+            raise ValueError("棋盘必须为90格")
+        if side not in ('w', 'b'):
+            raise ValueError(f"无效的走棋方: {side}")
+        self.board = list(board)
+        self.side = side
+        self._stack = []
+        try:
+            self.red_king = self.board.index('K')
+            self.black_king = self.board.index('k')
+        except ValueError:
+            raise ValueError("局面中缺少将帅") from None
+
+    @classmethod
+    def from_fen(cls, fen, side_to_move=None):
+        """
+        从FEN构造局面，格式错误或缺少将帅时抛出ValueError
+
+        Args:
+            fen: FEN字符串，可带走棋方
+            side_to_move: 走棋方，None时取FEN中的走棋方，缺省为红方
+        """
+        parts = fen.split()
+        if side_to_move is None:
+            side_to_move = parts[1] if len(parts) > 1 else 'w'
+        return cls(board_from_fen(fen), side_to_move)
+
+    @classmethod
+    def from_squares(cls, squares, side='w'):
+        """从 pikafish_engine.parse_board 返回的 {(列, 行): 棋子} 字典构造局面"""
+        board = [None] * 90
+        for (file, rank), piece in squares.items():
+            board[rank * 9 + file] = PIECE_ALIASES.get(piece, piece)
+        return cls(board, side)
+
+    def fen(self):
+        """当前局面的FEN（带走棋方）"""
+        rows = []
+        for rank in range(9, -1, -1):
+            row = ''
+            empty = 0
+            for piece in self.board[rank * 9:rank * 9 + 9]:
+                if piece is None:
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                row += piece
+            if empty:
+                row += str(empty)
+            rows.append(row)
+        return f"{'/'.join(rows)} {self.side}"
+
+    def _piece_moves(self, square, red, moves):
+        """把square上棋子的伪合法走法（不检查走后是否被将军）追加到moves"""
+        board = self.board
+        own = RED_PIECES if red else BLACK_PIECES
+        kind = board[square].upper()
+
+        if kind == 'R':
+            for ray in RAYS[square]:
+                for target in ray:
+                    piece = board[target]
+                    if piece is None:
+                        moves.append((square, target))
+                        continue
+                    if piece not in own:
+                        moves.append((square, target))
+                    break
+        elif kind == 'C':
+            for ray in RAYS[square]:
+                screen = False
+                for target in ray:
+                    piece = board[target]
+                    if not screen:
+                        if piece is None:
+                            moves.append((square, target))
+                        else:
+                            screen = True
+                    elif piece is not None:
+                        if piece not in own:
+                            moves.append((square, target))
+                        break
+        elif kind == 'N':
+            for target, leg in HORSE_MOVES[square]:
+                if board[leg] is None:
+                    piece = board[target]
+                    if piece is None or piece not in own:
+                        moves.append((square, target))
+        elif kind == 'B':
+            for target, eye in ELEPHANT_MOVES[red][square]:
+                if board[eye] is None:
+                    piece = board[target]
+                    if piece is None or piece not in own:
+                        moves.append((square, target))
+        else:
+            table = PAWN_MOVES if kind == 'P' else ADVISOR_MOVES if kind == 'A' else KING_MOVES
+            for target in table[red][square]:
+                piece = board[target]
+                if piece is None or piece not in own:
+                    moves.append((square, target))
+
+    def _pseudo_moves(self, red):
+        own = RED_PIECES if red else BLACK_PIECES
+        moves = []
+        for square, piece in enumerate(self.board):
+            if piece is not None and piece in own:
+                self._piece_moves(square, red, moves)
+        return moves
+
+    def _king_attacked(self, red):
+        """red方的将（帅）是否被攻击，包括将帅照面"""
+        board = self.board
+        if red:
+            square = self.red_king
+            rook, cannon, horse, pawn, king = 'r', 'c', 'n', 'p', 'k'
+        else:
+            square = self.black_king
+            rook, cannon, horse, pawn, king = 'R', 'C', 'N', 'P', 'K'
+
+        for ray in RAYS[square]:
+            screened = False
+            for target in ray:
+                piece = board[target]
+                if piece is None:
+                    continue
+                if screened:
+                    if piece == cannon:
+                        return True
+                    break
+                # 九宫不在同一行，横向射线上不会碰到对方将帅，纵向碰到即为照面
+                if piece == rook or piece == king:
+                    return True
+                screened = True
+        for origin, leg in HORSE_ATTACKERS[square]:
+            if board[origin] == horse and board[leg] is None:
+                return True
+        for origin in PAWN_ATTACKERS[not red][square]:
+            if board[origin] == pawn:
+                return True
+        return False
+
+    def _make(self, origin, target):
+        board = self.board
+        piece = board[origin]
+        captured = board[target]
+        board[target] = piece
+        board[origin] = None
+        if piece == 'K':
+            self.red_king = target
+        elif piece == 'k':
+            self.black_king = target
+        return captured
+
+    def _unmake(self, origin, target, captured):
+        board = self.board
+        piece = board[target]
+        board[origin] = piece
+        board[target] = captured
+        if piece == 'K':
+            self.red_king = origin
+        elif piece == 'k':
+            self.black_king = origin
+
+    def _is_legal(self, origin, target, red):
+        captured = self._make(origin, target)
+        legal = not self._king_attacked(red)
+        self._unmake(origin, target, captured)
+        return legal
+
+    def _legal_moves(self):
+        red = self.side == 'w'
+        return [move for move in self._pseudo_moves(red) if self._is_legal(move[0], move[1], red)]
+
+    def legal_moves(self):
+        """走棋方的全部合法走法（UCI格式）"""
+        return [move_to_uci(origin, target) for origin, target in self._legal_moves()]
+
+    def has_legal_move(self):
+        """走棋方是否还有合法走法（找到一个即返回）"""
+        red = self.side == 'w'
+        own = RED_PIECES if red else BLACK_PIECES
+        moves = []
+        for square, piece in enumerate(self.board):
+            if piece is None or piece not in own:
+                continue
+            moves.clear()
+            self._piece_moves(square, red, moves)
+            for origin, target in moves:
+                if self._is_legal(origin, target, red):
+                    return True
+        return False
+
+    def is_legal(self, move):
+        """UCI走法在当前局面是否合法"""
+        try:
+            origin, target = parse_uci(move)
+        except ValueError:
+            return False
+        if origin >= 90 or target >= 90:
+            return False
+        piece = self.board[origin]
+        red = self.side == 'w'
+        if piece is None or piece not in (RED_PIECES if red else BLACK_PIECES):
+            return False
+        moves = []
+        self._piece_moves(origin, red, moves)
+        return (origin, target) in moves and self._is_legal(origin, target, red)
+
+    def in_check(self):
+        """走棋方是否被将军"""
+        return self._king_attacked(self.side == 'w')
+
+    def push(self, move):
+        """走一步（UCI格式，须为合法走法）"""
+        if not self.is_legal(move):
+            raise ValueError(f"非法走法: {move}")
+        origin, target = parse_uci(move)
+        self._stack.append((origin, target, self._make(origin, target)))
+        self.side = 'b' if self.side == 'w' else 'w'
+
+    def pop(self):
+        """撤销上一步"""
+        origin, target, captured = self._stack.pop()
+        self._unmake(origin, target, captured)
+        self.side = 'b' if self.side == 'w' else 'w'
+        return move_to_uci(origin, target)
+
+    def mate_in_one(self):
+        """
+        一步杀：走后对方无合法走法的走法（象棋中困毙也判负），没有时返回None
+        """
+        red = self.side == 'w'
+        mover = self.side
+        for origin, target in self._legal_moves():
+            captured = self._make(origin, target)
+            self.side = 'b' if red else 'w'
+            mated = not self.has_legal_move()
+            self.side = mover
+            self._unmake(origin, target, captured)
+            if mated:
+                return move_to_uci(origin, target)
+        return None
+
+    def perft(self, depth):
+        """统计depth层内的走法序列数，用于校验走法生成"""
+        if depth <= 0:
+            return 1
+        moves = self._legal_moves()
+        if depth == 1:
+            return len(moves)
+        mover = self.side
+        self.side = 'b' if mover == 'w' else 'w'
+        total = 0
+        for origin, target in moves:
+            captured = self._make(origin, target)
+            total += self.perft(depth - 1)
+            self._unmake(origin, target, captured)
+        self.side = mover
+        return total
+
+
+def is_legal_move(fen, move, side_to_move=None):
+    """FEN局面中的走法是否合法，FEN无法解析时返回False"""
+    try:
+        return Position.from_fen(fen, side_to_move).is_legal(move)
+    except ValueError:
+        return False
+
+
+PIECE_NAMES = {
+    'K': '红帅', 'A': '红仕', 'B': '红相', 'N': '红马', 'R': '红车', 'C': '红炮', 'P': '红兵',
+    'k': '黑将', 'a': '黑士', 'b': '黑象', 'n': '黑马', 'r': '黑车', 'c': '黑炮', 'p': '黑卒',
+}
+PIECE_LIMITS = {'K': 1, 'A': 2, 'B': 2, 'N': 2, 'R': 2, 'C': 2, 'P': 5}
+
+
+def _legal_squares():
+    """将（帅）、士、象、兵在对局中可能出现的格子，黑方由红方按行镜像得到"""
+    red = {
+        'K': {rank * 9 + file for rank in range(3) for file in range(3, 6)},
+        'A': {0 * 9 + 3, 0 * 9 + 5, 1 * 9 + 4, 2 * 9 + 3, 2 * 9 + 5},
+        'B': {0 * 9 + 2, 0 * 9 + 6, 2 * 9 + 0, 2 * 9 + 4, 2 * 9 + 8, 4 * 9 + 2, 4 * 9 + 6},
+        # 未过河的兵只能直走，停在原来的列上；过河后可以到达任意格
+        'P': {rank * 9 + file for rank in (3, 4) for file in (0, 2, 4, 6, 8)} | set(range(45, 90)),
+    }
+    squares = dict(red)
+    for kind, table in red.items():
+        squares[kind.lower()] = {(9 - square // 9) * 9 + square % 9 for square in table}
+    return squares
+
+
+LEGAL_SQUARES = _legal_squares()
+
+
+def validate_position(fen, side_to_move=None):
+    """
+    检查局面在实际对局中是否可能出现，用于在交给引擎之前丢弃识别错误的局面
+
+    检查项：FEN格式、各棋子数量、将帅各一且在九宫内、士在九宫斜线上、象在己方象位、
+    兵卒不在起始行之后（未过河时不离开原来的列）、将帅不照面；
+    指定side_to_move时还检查不走棋的一方没有被将军（否则走棋方可以直接吃将）
+
+    Returns:
+        问题说明列表，局面合法时为空列表
+    """
+    try:
+        board = board_from_fen(fen)
+    except ValueError as e:
+        return [str(e)]
+
+    problems = []
+    counts = {}
+    for piece in board:
+        if piece is not None:
+            counts[piece] = counts.get(piece, 0) + 1
+    for kind, limit in PIECE_LIMITS.items():
+        for piece in (kind, kind.lower()):
+            if counts.get(piece, 0) > limit:
+                problems.append(f"{PIECE_NAMES[piece]}超过{limit}个")
+    for piece in ('K', 'k'):
+        if piece not in counts:
+            problems.append(f"缺少{PIECE_NAMES[piece]}")
+
+    for square, piece in enumerate(board):
+        if piece in LEGAL_SQUARES and square not in LEGAL_SQUARES[piece]:
+            problems.append(f"{PIECE_NAMES[piece]}位置不合法: {square_name(square)}")
+    if problems:
+        return problems
+
+    red_king, black_king = board.index('K'), board.index('k')
+    if red_king % 9 == black_king % 9 and all(board[square] is None
+                                              for square in range(red_king + 9, black_king, 9)):
+        return ["将帅照面"]
+
+    if side_to_move is not None:
+        position = Position(board, side_to_move)
+        if position._king_attacked(side_to_move != 'w'):
+            problems.append(f"{'黑方' if side_to_move == 'w' else '红方'}正被将军却轮到对方走棋")
+    return problems